@@ -25,7 +25,6 @@ from circuit_simulator.proto_board.solve import combined_solve_layout
 from circuit_simulator.proto_board.visualization.visualization import (
     visualize_proto_board)
 from circuit_simulator.simulation.circuit import Robot_Connector
-from circuit_simulator.simulation.simulate import close_all_windows
 from constants import APP_NAME
 from constants import BOARD_HEIGHT
 from constants import BOARD_WIDTH
@@ -44,6 +43,8 @@ from core.gui.constants import CTRL_DOWN
 from core.gui.constants import LEFT
 from core.gui.constants import RIGHT
 from core.gui.constants import ERROR
+from plotters import close_all_windows
+from plotters import plot_simulation
 from sys import argv
 from Tkinter import Toplevel
 
@@ -81,6 +82,8 @@ if __name__ == '__main__':
     """
     # show label tooltips on board
     app_runner.board.show_label_tooltips()
+    if circuit.simulation:
+      plot_simulation(circuit.simulation)
   def proto_board_layout(circuit, plotters):
     """
     Finds a way to layout the given |circuit| on a proto board and displays the
@@ -10,7 +10,15 @@ from circuit_simulator.simulation.circuit import Signalled_Pot
 from circuit_simulator.simulation.constants import NUM_SAMPLES
 from circuit_simulator.simulation.constants import T
 from constants import T_SAMPLES
-from lib601.plotWindow import PlotWindow
+
+def _plot_window(title):
+  """
+  Returns a new lib601 PlotWindow with the given |title|. lib601 (and with it
+      Tk) is only imported once something is actually plotted, so that circuits
+      can be analyzed on machines without it.
+  """
+  from lib601.plotWindow import PlotWindow
+  return PlotWindow(title)
 
 class Plotter:
   """
@@ -33,10 +41,10 @@ class Motor_Plotter(Plotter):
     self._motor = motor
   def plot(self, data):
     # motor angle
-    angle_plot = PlotWindow('Motor %s angle' % self._motor.label)
+    angle_plot = _plot_window('Motor %s angle' % self._motor.label)
     angle_plot.stem(T_SAMPLES, self._motor.angle_samples[:-1])
     # motor speed
-    speed_plot = PlotWindow('Motor %s speed' % self._motor.label)
+    speed_plot = _plot_window('Motor %s speed' % self._motor.label)
     speed_plot.stem(T_SAMPLES, self._motor.speed_samples[:-1])
 
 class Head_Plotter(Plotter):
@@ -54,13 +62,13 @@ class Head_Plotter(Plotter):
       Motor_Plotter(self._head_connector.motor).plot(data)
     # lamp distance signal
     if self._head_connector.lamp_distance_signal:
-      distance_plot = PlotWindow('Lamp %s distance' %
+      distance_plot = _plot_window('Lamp %s distance' %
           self._head_connector.photo_label)
       distance_plot.stem(T_SAMPLES,
           self._head_connector.lamp_distance_signal.samples(0, T, NUM_SAMPLES))
     # lamp angle signal
     if self._head_connector.lamp_angle_signal:
-      angle_plot = PlotWindow('Lamp %s angle' %
+      angle_plot = _plot_window('Lamp %s angle' %
           self._head_connector.photo_label)
       angle_plot.stem(T_SAMPLES, self._head_connector.lamp_angle_signal.samples(
           0, T, NUM_SAMPLES))
@@ -70,7 +78,7 @@ class Signalled_Pot_Plotter(Plotter):
     assert isinstance(pot, Signalled_Pot), 'pot must be a Signalled_Pot'
     self._pot = pot
   def plot(self, data):
-    alpha_plot = PlotWindow('Pot %s alpha' % self._pot.label)
+    alpha_plot = _plot_window('Pot %s alpha' % self._pot.label)
     alpha_plot.stem(T_SAMPLES, self._pot.signal.samples(0, T, NUM_SAMPLES))
 
 class Probe_Plotter(Plotter):
@@ -94,5 +102,39 @@ class Probe_Plotter(Plotter):
       t_samples.append(t)
       probe_samples.append(
           solution[self._probe_plus] - solution[self._probe_minus])
-    probe_plot = PlotWindow('Probe voltage difference')
+    probe_plot = _plot_window('Probe voltage difference')
     probe_plot.stem(t_samples, probe_samples)
+
+# plot windows opened for simulation results, see close_all_windows
+_simulation_windows = set()
+
+def plot_simulation(result):
+  """
+  Opens a plot window for each of the output signals in the given CMax
+      simulation |result|. Each plot starts from the signal's default vertical
+      range, and an end of the range is moved to the extreme sample if the
+      samples reach past 90% of the range.
+  """
+  if result.nSamples <= 1:
+    return
+  for title, samples, y0, y1 in result.signals:
+    low, high = min(samples), max(samples)
+    if float(high - y0) / float(y1 - y0 + .001) > 0.9:
+      y1 = high
+    if float(y1 - low) / float(y1 - y0 + .001) > 0.9:
+      y0 = low
+    plot = _plot_window(title)
+    plot.stem(range(result.nSamples), samples)
+    plot.axis([0, result.nSamples, y0, y1])
+    _simulation_windows.add(plot)
+
+def close_all_windows():
+  """
+  Closes all the plot windows opened by plot_simulation.
+  """
+  for window in _simulation_windows:
+    try:
+      window.destroy()
+    except:
+      pass
+  _simulation_windows.clear()
@@ -16,6 +16,8 @@ class Mock_Board:
   def __init__(self):
     self._canvas = Mock_Canvas()
     self._drawables = []
+    # messages displayed on this board, in order
+    self.messages = []
   def _connector_centered_at(self, center):
     """
     Returns the connector on this Mock_Board centered at the given |center|
@@ -51,6 +53,7 @@ class Mock_Board:
       drawable.label = ''
     return self._drawables
   def display_message(self, message, *args, **kwargs):
+    self.messages.append(message)
     print message
   def remove_message(self):
     pass
@@ -0,0 +1,116 @@
+"""
+Batch simulation of a directory of schematic files, for regression runs.
+Each schematic is loaded through a Mock_Board (no Tk windows) and simulated in
+    a pool of worker processes. Results are written to the output file as soon
+    as each file is done, one ';'-separated line per file, so the output file
+    can be followed while the batch runs. Simulations are deterministic, so
+    that the outputs of two runs can be compared. Results are shared with the
+    GUI's on-disk cache, so schematics that have not changed since the last run
+    are not simulated again.
+Usage: python -m circuit_simulator.simulation.batch directory output_file
+    [num_processes]
+"""
+
+__author__ = 'mikemeko@mit.edu (Michael Mekonnen)'
+
+from circuit import RESULT_CACHE
+from circuit_simulator.main.analyze_board import run_analysis
+from circuit_simulator.main.constants import FILE_EXTENSION
+from circuit_simulator.proto_board.automated_testing.constants import (
+    DESERIALIZERS)
+from circuit_simulator.proto_board.automated_testing.mock_board import (
+    Mock_Board)
+from core.save.save import open_board_from_file
+from multiprocessing import cpu_count
+from multiprocessing import Pool
+from os import walk
+from os.path import join
+from simulate import SimulationError
+from sys import argv
+from time import time
+from traceback import format_exc
+
+HEADER = (
+    'file',
+    'status',
+    'time',
+    'num_nodes',
+    'num_samples',
+    'mean_iterations',
+    'max_iterations',
+    'unconverged_samples',
+    'error',
+    'probe_traces')
+
+def schematic_files(directory):
+  """
+  Returns a sorted list of the paths of all the schematic files in the given
+      |directory| and its subdirectories.
+  """
+  return sorted(join(dir_path, file_name) for dir_path, dir_names, file_names
+      in walk(directory) for file_name in file_names if file_name.endswith(
+      FILE_EXTENSION))
+
+def simulate_file(file_name):
+  """
+  Loads and simulates the schematic in the given |file_name|. Returns a tuple
+      of values, one for each of the entries in |HEADER|. Never raises, errors
+      are reported in the returned tuple.
+  """
+  start_time = time()
+  result, error = None, ''
+  try:
+    board = Mock_Board()
+    open_board_from_file(board, file_name, DESERIALIZERS, FILE_EXTENSION)
+    circuit = run_analysis(board, lambda circuit, plotters: circuit)
+    if circuit is None:
+      error = '; '.join(board.messages) or 'Could not analyze schematic'
+    else:
+      result = circuit.simulate(cache=RESULT_CACHE, deterministic=True)
+  except SimulationError, e:
+    error = e.messages[-1] if e.messages else str(e)
+  except:
+    error = format_exc().strip().split('\n')[-1]
+  total_time = time() - start_time
+  if result is None:
+    return (file_name, 'error', '%.3f' % total_time, None, None, None, None,
+        None, error.replace(';', ','), None)
+  iterations = result.iterations
+  return (file_name, 'ok', '%.3f' % total_time, len(result.nodeNames),
+      result.nSamples, '%.2f' % (float(sum(iterations)) / len(iterations)) if
+      iterations else None, max(iterations) if iterations else None,
+      result.converged.count(False), None,
+      '|'.join(','.join('%.6g' % v for v in trace) for trace in
+      result.probes))
+
+def run_batch(file_names, output_file_name, num_processes=None):
+  """
+  Simulates all of the given |file_names| across |num_processes| worker
+      processes (one per core by default) and streams the results to the file
+      with the given |output_file_name|. Returns the number of files that could
+      not be simulated.
+  """
+  num_errors = 0
+  output_file = open(output_file_name, 'w')
+  output_file.write(';'.join(HEADER) + '\n')
+  pool = Pool(num_processes or cpu_count())
+  try:
+    for n, line in enumerate(pool.imap_unordered(simulate_file, file_names)):
+      print '%d/%d %s %s' % (n + 1, len(file_names), line[1], line[0])
+      if line[1] != 'ok':
+        num_errors += 1
+      output_file.write(';'.join(map(str, line)) + '\n')
+      output_file.flush()
+  finally:
+    pool.close()
+    pool.join()
+    output_file.close()
+  return num_errors
+
+if __name__ == '__main__':
+  start_time = time()
+  file_names = schematic_files(argv[1])
+  num_errors = run_batch(file_names, argv[2], int(argv[3]) if len(argv) > 3
+      else None)
+  print '%d files, %d errors' % (len(file_names), num_errors)
+  print 'Time elapsed: %.3f seconds' % (time() - start_time)
@@ -0,0 +1,74 @@
+"""
+Benchmark for the CMax simulator on large generated circuits.
+The generated circuit is a long resistor ladder driven by the power supply,
+    buffered by an op amp follower every few sections, so that it exercises
+    node discovery, matrix assembly, and the op amp iterations at scale.
+Usage: python -m circuit_simulator.simulation.benchmark [sections] [samples]
+    [stats_file]
+If a stats file is given, the timings and solver statistics of the simulation
+    are written to it as JSON, see instrumentation.py. The simulation is
+    deterministic, so the solver statistics of two runs can be compared.
+"""
+
+__author__ = 'mikemeko@mit.edu (Michael Mekonnen)'
+
+from circuit import Circuit
+from circuit import Op_Amp
+from circuit import Resistor
+from circuit import Voltage_Source
+from circuit_simulator.main.constants import GROUND
+from circuit_simulator.main.constants import POWER
+from circuit_simulator.main.constants import POWER_VOLTS
+from constants import PHASES
+from sys import argv
+from time import time
+
+# number of ladder sections between consecutive op amp followers
+BUFFER_SPACING = 10
+
+def ladder_circuit(sections):
+  """
+  Returns a Circuit made up of |sections| ladder sections (a series resistor
+      followed by a shunt resistor to ground), with an op amp follower after
+      every |BUFFER_SPACING| sections.
+  """
+  components = [Voltage_Source(POWER, GROUND, 'i_pwr', POWER_VOLTS)]
+  node = POWER
+  for k in xrange(sections):
+    next_node = 'n%d' % k
+    components.append(Resistor(node, next_node, 'i_s%d' % k, 1000))
+    components.append(Resistor(next_node, GROUND, 'i_p%d' % k, 100000))
+    node = next_node
+    if (k + 1) % BUFFER_SPACING == 0:
+      next_node = 'b%d' % k
+      components.append(Op_Amp(node, next_node, 'i_a%d' % k, next_node,
+          GROUND, 'i_b%d' % k))
+      node = next_node
+  return Circuit(components, GROUND, solve=False)
+
+def run_benchmark(sections, samples, stats_file_name=None):
+  """
+  Simulates a ladder circuit with |sections| sections for |samples| time steps
+      and prints how long each phase took. If |stats_file_name| is given, the
+      statistics of the simulation are also dumped to that file.
+  """
+  start = time()
+  circuit = ladder_circuit(sections)
+  lines = circuit.cmax_netlist()
+  netlist_time = time() - start
+  start = time()
+  result = circuit.simulate(samples, instrument=True, deterministic=True)
+  solve_time = time() - start
+  print 'components: %d' % len(circuit.components)
+  print 'netlist lines: %d' % len(lines)
+  print 'netlist: %.3fs' % netlist_time
+  print 'simulation (%d samples): %.3fs' % (samples, solve_time)
+  for phase in PHASES:
+    print '  %s: %.3fs' % (phase, result.stats.phase_times[phase])
+  if stats_file_name:
+    result.stats.dump_json(stats_file_name)
+
+if __name__ == '__main__':
+  sections = int(argv[1]) if len(argv) > 1 else 500
+  samples = int(argv[2]) if len(argv) > 2 else 100
+  run_benchmark(sections, samples, argv[3] if len(argv) > 3 else None)
@@ -22,6 +22,7 @@ from constants import MOTOR_B_LOADED
 from constants import MOTOR_B_UNLOADED
 from constants import MOTOR_INIT_ANGLE
 from constants import MOTOR_INIT_SPEED
+from constants import MOTOR_INTEGRATOR
 from constants import MOTOR_J
 from constants import MOTOR_KB
 from constants import MOTOR_KT
@@ -31,18 +32,30 @@ from constants import HEAD_POT_RESISTANCE
 from constants import NUM_SAMPLES
 from constants import OP_AMP_K
 from constants import PHOTODETECTOR_K
+from constants import SIMULATION_LOG_LEVEL
+from constants import SIMULATION_SOLVER
+from constants import SOLVER_RELAXATION
 from constants import T
 from core.math.CT_signal import CT_Signal
-from core.math.CT_signal import Function_CT_Signal
-from core.math.equation_solver import solve_equations
+from core.math.equation_solver import Equation_System
 from core.util.util import clip
 from core.util.util import in_bounds
 from core.util.util import is_number
 from math import cos
 from math import pi
+from monte_carlo import monte_carlo
+from netlist import Netlist_Line
+from result_cache import Result_Cache
+from result_cache import result_key
+from small_signal import ac_sweep
+from small_signal import operating_point
+from sweep import sweep
 from traceback import format_exc
 import simulate
 
+# results of the simulations run from the GUI, kept across sessions
+RESULT_CACHE = Result_Cache()
+
 class Component:
   """
   Abstract representation for circuit components.
@@ -90,7 +103,7 @@ class Component:
   def cmaxify(self, parts, k):
     """
     Should append to |parts| a tuple containing:
-        the cmax line corresponding to this component,
+        the Netlist_Line corresponding to this component,
         a tuple containing pairs (loc, node) where loc is a location
             corresponding to the output cmax line, and node the node in the
             circuit for that loc.
@@ -127,8 +140,8 @@ class One_Port(Component):
   def equations(self):
     return [self.equation()]
   def KCL_update(self, KCL):
-    KCL[self.n1] = KCL.get(self.n1, []) + [(1, self.i)]
-    KCL[self.n2] = KCL.get(self.n2, []) + [(-1, self.i)]
+    KCL.setdefault(self.n1, []).append((1, self.i))
+    KCL.setdefault(self.n2, []).append((-1, self.i))
 
 class Voltage_Source(One_Port):
   """
@@ -150,8 +163,8 @@ class Voltage_Source(One_Port):
     # n1 - n0 = v0
     return [(1, self.n1), (-1, self.n2), (-self.v0, None)]
   def cmaxify(self, parts, k):
-    parts.append(('+10: (%d,%d)' % (k, 0), (((k, 0), self.n1),)))
-    parts.append(('gnd: (%d,%d)' % (k, 1), (((k, 1), self.n2),)))
+    parts.append((Netlist_Line('+10', ((k, 0),)), (((k, 0), self.n1),)))
+    parts.append((Netlist_Line('gnd', ((k, 1),)), (((k, 1), self.n2),)))
     return k + 1
 
 class Current_Source(One_Port):
@@ -194,9 +207,9 @@ class Resistor(One_Port):
     # n1 - n2 = i * r
     return [(1, self.n1), (-1, self.n2), (-self.r, self.i)]
   def cmaxify(self, parts, k):
-    i1, i2, i3 = resistance_from_string(str(self.r))
-    parts.append(('resistor(%d,%d,%d): (%d,%d)--(%d,%d)' % (i1, i2, i3, k, 0, k,
-        1), (((k, 0), self.n1), ((k, 1), self.n2))))
+    parts.append((Netlist_Line('resistor', ((k, 0), (k, 1)),
+        resistance_from_string(str(self.r))), (((k, 0), self.n1), ((k, 1),
+        self.n2))))
     return k + 1
 
 class Voltage_Sensor(One_Port):
@@ -260,7 +273,7 @@ class Op_Amp(Component):
     self.voltage_sensor.KCL_update(KCL)
     self.vcvs.KCL_update(KCL)
   def cmaxify(self, parts, k):
-    parts.append(('opamp: (%d,%d)--(%d,%d)' % (k, 1, k, 0), (
+    parts.append((Netlist_Line('opamp', ((k, 1), (k, 0))), (
         ((k + 0, 0), self.na2),
         ((k + 1, 0), self.na1),
         ((k + 2, 0), GROUND),
@@ -323,7 +336,7 @@ class Pot(Component):
     self._resistor_1.KCL_update(KCL)
     self._resistor_2.KCL_update(KCL)
   def cmaxify(self, parts, k):
-    parts.append(('pot: (%d,%d)--(%d,%d)--(%d,%d)' % (k, 1, k + 1, 0, k + 2, 1),
+    parts.append((Netlist_Line('pot', ((k, 1), (k + 1, 0), (k + 2, 1))),
         (((k + 0, 1), self.n_top),
          ((k + 1, 0), self.n_middle),
          ((k + 2, 1), self.n_bottom))))
@@ -412,7 +425,7 @@ class Motor(Component):
   def KCL_update(self, KCL):
     self._resistor.KCL_update(KCL)
   def cmaxify(self, parts, k):
-    parts.append(('motor: (%d,%d)--(%d,%d)' % (k, 0, k + 5, 0), (
+    parts.append((Netlist_Line('motor', ((k, 0), (k + 5, 0))), (
         ((k + 4, 0), self.motor_plus),
         ((k + 5, 0), self.motor_minus))))
     return k + 6
@@ -583,7 +596,7 @@ class Head_Connector(Component):
     for component in self._present_components():
       component.KCL_update(KCL)
   def cmaxify(self, parts, k):
-    parts.append(('head: (%d,%d)--(%d,%d)' % (k, 0, k + 7, 0), (
+    parts.append((Netlist_Line('head', ((k, 0), (k + 7, 0))), (
       ((k + 0, 0), self.n_pot_top),
       ((k + 1, 0), self.n_pot_middle),
       ((k + 2, 0), self.n_pot_bottom),
@@ -609,7 +622,7 @@ class Probe(Component):
   def KCL_update(self, KCL):
     pass
   def cmaxify(self, parts, k):
-    parts.append(('%sprobe: (%d,%d)' % (self.sign, k, 0),
+    parts.append((Netlist_Line('%sprobe' % self.sign, ((k, 0),)),
         (((k, 0), self.node),)))
     return k + 1
 
@@ -624,6 +637,10 @@ class Circuit:
     """
     self.components = components
     self.gnd = gnd
+    # CMax netlist, computed when first needed
+    self._netlist = None
+    # result of the CMax simulation, if the circuit has been solved
+    self.simulation = None
     # try to solve the circuit
     if solve:
       try:
@@ -631,51 +648,138 @@ class Circuit:
       except:
         if DEBUG:
           print format_exc()
-  def _solve(self):
-    """
-    Solves this circuit and returns a dictionary mapping all the sampled times
-        to dictionaries mapping all the variables (i.e. voltages and currents)
-        to their values.
-    No longer used! Replaced by CMax simulator. Look at self._cmax_solve().
-    """
+  def _solve(self, num_samples=NUM_SAMPLES):
+    """
+    Solves this circuit from its component equations, and returns a dictionary
+        mapping all the sampled times to dictionaries mapping all the variables
+        (i.e. voltages and currents) to their values. A deterministic
+        alternative to the CMax simulator (see self._cmax_solve()), for the
+        first |num_samples| samples taken every T.
+    The equations are collected into an Equation_System once. At each later
+        sample, only the equations that changed (e.g. those of pots and
+        photodetectors) are set again, and the factorization is reused for as
+        long as only constants changed.
+    """
+    # component equations, and the rows they occupy in the system
+    component_equations = [component.equations() for component in
+        self.components]
+    equations = [equation for component_equation in component_equations for
+        equation in component_equation]
+    # one KCL equation per node in the circuit (excluding ground node)
+    KCL = {}
+    for component in self.components:
+      component.KCL_update(KCL)
+    equations.extend([KCL[node] for node in KCL if node is not self.gnd])
+    # assert that ground voltage is 0
+    equations.append([(1, self.gnd)])
+    system = Equation_System(equations)
     data = {}
-    for n in xrange(NUM_SAMPLES):
-      # accumulate and solve system of equations
-      # component equations
-      equations = reduce(list.__add__, (component.equations() for component in
-          self.components), [])
-      # one KCL equation per node in the circuit (excluding ground node)
-      KCL = {}
-      for component in self.components:
-        component.KCL_update(KCL)
-      equations.extend([KCL[node] for node in KCL if node is not self.gnd])
-      # assert that ground voltage is 0
-      equations.append([(1, self.gnd)])
-      # solve system of equations
-      data[n * T] = solve_equations(equations)
+    for n in xrange(num_samples):
+      if n:
+        # KCL and ground equations do not change, update the component ones
+        row = 0
+        for c, component in enumerate(self.components):
+          new_equations = component.equations()
+          for old_equation, new_equation in zip(component_equations[c],
+              new_equations):
+            if new_equation != old_equation:
+              system.set_equation(row, new_equation)
+            row += 1
+          component_equations[c] = new_equations
+      data[n * T] = system.solve()
       # step components, providing them the solution for the current time step
       for component in self.components:
         component.step(data[n * T])
     return data
-  def _ct_to_dt(self, ct_signal):
-    return Function_CT_Signal(lambda n: ct_signal.sample(n * T))
-  def _cmax_solve(self):
-    parts = []
-    k = 0
-    for component in self.components:
-      k = component.cmaxify(parts, k)
-    node_locations = defaultdict(list)
-    lines = []
-    for rep, nodes in parts:
-      lines.append(rep)
-      for loc, node in nodes:
-        node_locations[node].append(loc)
-    for node in node_locations:
-      if node:
-        for i in xrange(len(node_locations[node]) - 1):
-          x1, y1 = node_locations[node][i]
-          x2, y2 = node_locations[node][i + 1]
-          lines.append('wire: (%d,%d)--(%d,%d)' % (x1, y1, x2, y2))
+  def _sampled(self, ct_signal, num_samples, time_step=T):
+    """
+    Returns the DT signal made up of the first |num_samples| samples of
+        |ct_signal| taken every |time_step|, computed all at once where
+        possible.
+    """
+    return simulate.ListSignal(ct_signal.samples_array(0, time_step,
+        num_samples))
+  def cmax_netlist(self):
+    """
+    Returns the CMax netlist for this circuit as a list of Netlist_Lines: one
+        line per component, and a chain of wires connecting the locations of
+        each node. The netlist is computed once and cached.
+    """
+    if self._netlist is None:
+      parts = []
+      k = 0
+      for component in self.components:
+        k = component.cmaxify(parts, k)
+      node_locations = defaultdict(list)
+      self._netlist = []
+      for line, nodes in parts:
+        self._netlist.append(line)
+        for loc, node in nodes:
+          node_locations[node].append(loc)
+      for node in node_locations:
+        if node:
+          for i in xrange(len(node_locations[node]) - 1):
+            self._netlist.append(Netlist_Line('wire', (node_locations[node][i],
+                node_locations[node][i + 1])))
+    return self._netlist
+  def to_cmax(self):
+    """
+    Returns the CMax netlist for this circuit as text, one line per part.
+    """
+    return '\n'.join(map(str, self.cmax_netlist()))
+  def simulate(self, num_samples=NUM_SAMPLES, solver=SIMULATION_SOLVER,
+      instrument=False, time_step=T, integrator=MOTOR_INTEGRATOR, cache=None,
+      seed=None, deterministic=False):
+    """
+    Simulates |num_samples| time steps of this circuit with the CMax simulator,
+        using the given |solver|, and returns the simulate.SimulationResult.
+        If |instrument| is True, the result's stats hold the timings and solver
+        statistics of the run (see instrumentation.py). Steps are |time_step|
+        long, and motors and heads are stepped with the given |integrator|;
+        INTEGRATOR_RK4 stays accurate at much larger steps than the default.
+        The random draws of the relaxation solver are seeded with |seed|, or
+        left out altogether if |deterministic|, see simulate.makeRandom.
+        If a result_cache.Result_Cache |cache| is given, a stored result for
+        the same inputs is returned without simulating, and new results are
+        stored in it. Instrumented runs, and runs of the relaxation solver that
+        are neither seeded with a number nor deterministic, are never cached.
+        Does not display anything, so it is safe to call from worker threads or
+        processes.
+    """
+    args = self._simulation_args(num_samples, time_step)
+    if cache is not None and not instrument and (solver != SOLVER_RELAXATION
+        or deterministic or isinstance(seed, (int, long))):
+      key = result_key(args, num_samples, time_step, solver, integrator, seed,
+          deterministic)
+      result = cache.get(key)
+      if result is None:
+        result = simulate.solve(*args, nSamples=num_samples, deltaT=time_step,
+            solver=solver, integrator=integrator, seed=seed,
+            deterministic=deterministic)
+        cache.put(key, result)
+      return result
+    return simulate.solve(*args, nSamples=num_samples, deltaT=time_step,
+        solver=solver, instrument=instrument, integrator=integrator, seed=seed,
+        deterministic=deterministic)
+  def stream(self, num_samples=NUM_SAMPLES, solver=SIMULATION_SOLVER,
+      instrument=False, time_step=T, integrator=MOTOR_INTEGRATOR, seed=None,
+      deterministic=False):
+    """
+    Returns a simulate.SimulationStream that simulates |num_samples| time steps
+        of this circuit one at a time, without keeping them. See streaming.py
+        for packing its traces into arrays or memory-mapped files.
+    """
+    return simulate.SimulationStream(*self._simulation_args(num_samples,
+        time_step), nSamples=num_samples, deltaT=time_step, solver=solver,
+        instrument=instrument, integrator=integrator, seed=seed,
+        deterministic=deterministic)
+  def _simulation_args(self, num_samples, time_step=T):
+    """
+    Returns the positional arguments of simulate.solve for this circuit: its
+        netlist, the first |num_samples| samples of the signals of its pots and
+        heads taken every |time_step|, and the labels of its parts.
+    """
+    lines = self.cmax_netlist()
     pot_alpha_signals = []
     lamp_angle_signals = []
     lamp_distance_signals = []
@@ -685,20 +789,80 @@ class Circuit:
     motor_labels = []
     for component in self.components:
       if isinstance(component, Signalled_Pot):
-        pot_alpha_signals.append(self._ct_to_dt(component.signal if
-            component.signal else DEFAULT_POT_SIGNAL))
+        pot_alpha_signals.append(self._sampled(component.signal if
+            component.signal else DEFAULT_POT_SIGNAL, num_samples, time_step))
         pot_labels.append(component.label)
       elif isinstance(component, Head_Connector):
-        lamp_angle_signals.append(self._ct_to_dt(component.lamp_angle_signal if
-            component.lamp_angle_signal else DEFAULT_LAMP_ANGLE_SIGNAL))
-        lamp_distance_signals.append(self._ct_to_dt(
+        lamp_angle_signals.append(self._sampled(component.lamp_angle_signal if
+            component.lamp_angle_signal else DEFAULT_LAMP_ANGLE_SIGNAL,
+            num_samples, time_step))
+        lamp_distance_signals.append(self._sampled(
             component.lamp_distance_signal if component.lamp_distance_signal
-            else DEFAULT_LAMP_DISTANCE_SIGNAL))
+            else DEFAULT_LAMP_DISTANCE_SIGNAL, num_samples, time_step))
         lamp_labels.append(component.photo_label)
         head_motor_labels.append(component.motor_label)
       elif isinstance(component, Motor):
         motor_labels.append(component.label)
-    simulate.solve(lines, pot_alpha_signals, lamp_angle_signals,
-        lamp_distance_signals, pot_labels, lamp_labels, head_motor_labels,
-        motor_labels, deltaT=T)
-    print simulate.sim_output
+    return (lines, pot_alpha_signals, lamp_angle_signals, lamp_distance_signals,
+        pot_labels, lamp_labels, head_motor_labels, motor_labels)
+  def sweep(self, parameter, index, values):
+    """
+    Solves this circuit for each of the given |values| of a |parameter| of one
+        of its parts, see sweep.sweep. Returns a 2-D array of the probe voltage
+        differences, with one row per value.
+    """
+    return sweep(self.cmax_netlist(), parameter, index, values)
+  def _input_values(self, time=0):
+    """
+    Returns the alpha of each pot, and the lamp angle and lamp distance of each
+        head, of this circuit at the given |time|, in netlist order.
+    """
+    pot_alphas = []
+    lamp_angles = []
+    lamp_distances = []
+    for component in self.components:
+      if isinstance(component, Signalled_Pot):
+        pot_alphas.append((component.signal or DEFAULT_POT_SIGNAL)(time))
+      elif isinstance(component, Head_Connector):
+        lamp_angles.append((component.lamp_angle_signal or
+            DEFAULT_LAMP_ANGLE_SIGNAL)(time))
+        lamp_distances.append((component.lamp_distance_signal or
+            DEFAULT_LAMP_DISTANCE_SIGNAL)(time))
+    return pot_alphas, lamp_angles, lamp_distances
+  def operating_point(self, time=0):
+    """
+    Returns the DC operating point of this circuit with its pots and lamps at
+        their values at the given |time|, see small_signal.operating_point.
+    """
+    return operating_point(self.cmax_netlist(), *self._input_values(time))
+  def ac_sweep(self, source, index, frequencies, time=0, nodes=False):
+    """
+    Returns the small-signal response of this circuit to one of its inputs at
+        each of the given |frequencies|, linearized about its operating point
+        at the given |time|, see small_signal.ac_sweep.
+    """
+    pot_alphas, lamp_angles, lamp_distances = self._input_values(time)
+    return ac_sweep(self.cmax_netlist(), source, index, frequencies,
+        pot_alphas, lamp_angles, lamp_distances, nodes=nodes)
+  def monte_carlo(self, num_trials, num_samples=NUM_SAMPLES, seed=0,
+      num_processes=None):
+    """
+    Simulates |num_samples| time steps of |num_trials| variations of this
+        circuit, with part values drawn from their tolerances, see
+        monte_carlo.monte_carlo. Returns the percentile envelopes of the probe
+        voltage differences.
+    """
+    pot_alphas = [(component.signal or DEFAULT_POT_SIGNAL).samples_array(0, T,
+        num_samples) for component in self.components if isinstance(component,
+        Signalled_Pot)]
+    return monte_carlo(self.cmax_netlist(), pot_alphas, num_trials,
+        num_samples, seed=seed, num_processes=num_processes)
+  def _cmax_solve(self):
+    """
+    Simulates this circuit and stores the result in self.simulation, for the
+        plotting layer to display.
+    """
+    self.simulation = self.simulate(cache=RESULT_CACHE)
+    output = self.simulation.output(SIMULATION_LOG_LEVEL)
+    if output:
+      print output
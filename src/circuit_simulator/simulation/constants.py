@@ -30,6 +30,80 @@ PHOTODETECTOR_K = 5e-7
 NUM_SAMPLES = 100
 T = 0.02 # sampling periond
 
+# simulation solvers
+SOLVER_DIRECT = 'DIRECT' # LU factorization of the nodal matrix
+SOLVER_RELAXATION = 'RELAXATION' # Gauss-Seidel relaxation (original CMax)
+SOLVER_SOR = 'SOR' # successive over-relaxation of the nodal matrix
+SIMULATION_SOLVER = SOLVER_DIRECT
+# smallest circuit (in nodes) that the direct solver assembles and factorizes
+#     as a sparse matrix, see sparse_solver.py
+SPARSE_MIN_NODES = 200
+# tiny conductance from every free node to ground, keeps the nodal matrix
+#     nonsingular when parts of the circuit are left floating
+GMIN = 1e-12
+# successive over-relaxation, see sor_solver.py
+SOR_MAX_OMEGA = 1.95
+SOR_MAX_SWEEPS = 10000
+SOR_TOLERANCE = 1e-9 # KCL residual, relative to the largest driving current
+# most node values (voltages, currents, and conductances when instrumented)
+#     kept in the solutions of circuits without motors or heads, one per
+#     distinct setting of their pots, so fewer solutions for larger circuits
+SOLUTION_CACHE_VALUES = 1 << 20
+
+# integrators for the motor and head mechanics
+INTEGRATOR_EULER = 'EULER' # semi-implicit Euler, what the motor was fit with
+INTEGRATOR_RK4 = 'RK4' # classical Runge-Kutta, accurate at larger time steps
+MOTOR_INTEGRATOR = INTEGRATOR_EULER
+
+# parameters that can be swept, see sweep.py
+SWEEP_LAMP_DISTANCE = 'LAMP_DISTANCE'
+SWEEP_POT_ALPHA = 'POT_ALPHA'
+SWEEP_RESISTANCE = 'RESISTANCE'
+
+# inputs of the small-signal AC analysis, see small_signal.py
+INPUT_LAMP_ANGLE = 'LAMP_ANGLE'
+INPUT_LAMP_DISTANCE = 'LAMP_DISTANCE'
+INPUT_POT_ALPHA = 'POT_ALPHA'
+# step of the central differences that linearize the parts, relative to the
+#     value of the parameter (or absolute, below 1)
+SMALL_SIGNAL_STEP = 1e-6
+
+# Monte Carlo tolerance analysis, see monte_carlo.py
+MONTE_CARLO_CHUNK_SIZE = 500 # trials per worker task, each with its own seed
+MONTE_CARLO_PERCENTILES = (5, 50, 95)
+POT_TOLERANCE = 0.2
+RESISTOR_TOLERANCE = 0.05
+
+# phases of a simulation, in order, see instrumentation.py
+PHASE_PARSE = 'parse' # netlist parsing, node discovery
+PHASE_ASSEMBLE = 'assemble' # conductance matrices, factorizations
+PHASE_SOLVE = 'solve' # node voltages at each sample
+PHASE_UPDATE = 'update' # motors, heads, and probes after each sample
+PHASE_OUTPUT = 'output' # probe traces and signals
+PHASE_INSTRUMENT = 'instrument' # residuals and op amp states, when collected
+PHASES = (PHASE_PARSE, PHASE_ASSEMBLE, PHASE_SOLVE, PHASE_UPDATE, PHASE_OUTPUT,
+    PHASE_INSTRUMENT)
+
+# op amp output states
+SATURATION_LINEAR = 'linear'
+SATURATION_NEGATIVE = 'negative'
+SATURATION_POSITIVE = 'positive'
+
+# samples per chunk of a streamed simulation, see streaming.py
+STREAM_CHUNK_SIZE = 4096
+
+# on-disk cache of simulation results, see result_cache.py
+RESULT_CACHE_DIR = '.circuit_simulator_cache' # under the user's home directory
+RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024 # least recently used results go first
+
+# levels of the simulator's diagnostics, see diagnostics.py
+LOG_DEBUG = 10 # netlist, node, and signal dumps
+LOG_INFO = 20
+LOG_WARNING = 30
+LOG_ERROR = 40
+# lowest level printed after simulating a circuit
+SIMULATION_LOG_LEVEL = LOG_WARNING
+
 # default simulation signals
 DEFAULT_LAMP_ANGLE_SIGNAL = Constant_CT_Signal(0)
 DEFAULT_LAMP_DISTANCE_SIGNAL = Constant_CT_Signal(0.5)
@@ -0,0 +1,75 @@
+"""
+Buffered, leveled log of the diagnostics produced by the CMax simulator.
+Entries are stored unformatted, as a message and its arguments, and are only
+    formatted when the text is requested, so that simulations whose diagnostics
+    are never read do not pay for formatting them. A capacity turns the buffer
+    into a ring that keeps only the most recent entries.
+"""
+
+__author__ = 'mikemeko@mit.edu (Michael Mekonnen)'
+
+from collections import deque
+from constants import LOG_DEBUG
+from constants import LOG_ERROR
+from constants import LOG_INFO
+from constants import LOG_WARNING
+
+def _format(message, args):
+  """
+  Returns the text of an entry with the given |message| and |args|.
+  """
+  if callable(message):
+    return message(*args)
+  elif args:
+    return message % args
+  return str(message)
+
+class Diagnostics_Log:
+  """
+  Leveled buffer of diagnostic messages.
+  """
+  def __init__(self, capacity=None):
+    """
+    |capacity|: maximum number of entries to keep, the oldest entries are
+        dropped first. Unbounded by default.
+    """
+    self._entries = deque(maxlen=capacity)
+    # number of entries dropped because the buffer was full
+    self.dropped = 0
+  def log(self, level, message, *args):
+    """
+    Adds an entry with the given |level|. The text of the entry is
+        |message| % |args|, or |message|(*|args|) if |message| is callable, and
+        is only computed when requested.
+    """
+    if len(self._entries) == self._entries.maxlen:
+      self.dropped += 1
+    self._entries.append((level, message, args))
+  def debug(self, message, *args):
+    self.log(LOG_DEBUG, message, *args)
+  def info(self, message, *args):
+    self.log(LOG_INFO, message, *args)
+  def warning(self, message, *args):
+    self.log(LOG_WARNING, message, *args)
+  def error(self, message, *args):
+    self.log(LOG_ERROR, message, *args)
+  def __len__(self):
+    return len(self._entries)
+  def messages(self, level=LOG_DEBUG):
+    """
+    Returns the formatted text of the entries with at least the given |level|,
+        oldest first.
+    """
+    return [_format(message, args) for entry_level, message, args in
+        self._entries if entry_level >= level]
+  def __getstate__(self):
+    # callable messages cannot be pickled, so pickled entries are formatted
+    state = self.__dict__.copy()
+    state['_entries'] = deque(((level, _format(message, args), ()) for level,
+        message, args in self._entries), maxlen=self._entries.maxlen)
+    return state
+  def text(self, level=LOG_DEBUG):
+    """
+    Returns the formatted entries with at least the given |level|, one per line.
+    """
+    return ''.join('%s\n' % message for message in self.messages(level))
@@ -0,0 +1,82 @@
+"""
+Opt-in instrumentation for the CMax simulator.
+A Simulation_Stats collects the wall time spent in each phase of a simulation,
+    and, for every sample, the number of solver iterations, whether the solver
+    converged, the KCL residual of the solution, and the op amps that started or
+    stopped saturating. It is returned with the simulate.SimulationResult when
+    instrumentation is requested and can be dumped as JSON, so that runs can be
+    compared over time.
+"""
+
+__author__ = 'mikemeko@mit.edu (Michael Mekonnen)'
+
+from constants import PHASES
+from constants import SATURATION_LINEAR
+from json import dump
+from time import time
+
+class Simulation_Stats:
+  """
+  Statistics collected over one simulation.
+  """
+  def __init__(self, solver):
+    """
+    |solver|: the solver used for the simulation.
+    """
+    self.solver = solver
+    self.num_nodes = 0
+    self.phase_times = dict((phase, 0.) for phase in PHASES)
+    # per sample
+    self.iterations = []
+    self.converged = []
+    self.residuals = []
+    # (sample, op amp index, new state) each time an op amp changes state
+    self.saturation_events = []
+    self._op_amp_states = {}
+    self._last_lap = time()
+  def lap(self, phase):
+    """
+    Attributes the time elapsed since the previous call (or since this object
+        was created) to the given |phase|.
+    """
+    now = time()
+    self.phase_times[phase] += now - self._last_lap
+    self._last_lap = now
+  def record_sample(self, iterations, converged, residual):
+    """
+    Records the solver |iterations|, whether it |converged|, and the final KCL
+        |residual| for the next sample.
+    """
+    self.iterations.append(iterations)
+    self.converged.append(converged)
+    self.residuals.append(residual)
+  def record_op_amp(self, index, state):
+    """
+    Records the |state| of the op amp with the given |index| at the latest
+        sample, and a saturation event if it changed. Op amps start out linear.
+    """
+    if self._op_amp_states.get(index, SATURATION_LINEAR) != state:
+      self.saturation_events.append((len(self.residuals) - 1, index, state))
+    self._op_amp_states[index] = state
+  def to_dict(self):
+    """
+    Returns the statistics as a dictionary of plain values.
+    """
+    return {
+        'solver': self.solver,
+        'num_nodes': self.num_nodes,
+        'num_samples': len(self.iterations),
+        'phase_times': self.phase_times,
+        'total_time': sum(self.phase_times.values()),
+        'iterations': self.iterations,
+        'converged': self.converged,
+        'residuals': self.residuals,
+        'max_residual': max(self.residuals) if self.residuals else None,
+        'saturation_events': self.saturation_events}
+  def dump_json(self, file_name):
+    """
+    Writes the statistics to the file with the given |file_name| as JSON.
+    """
+    json_file = open(file_name, 'w')
+    dump(self.to_dict(), json_file, indent=2, sort_keys=True)
+    json_file.close()
@@ -0,0 +1,124 @@
+"""
+Monte Carlo tolerance analysis for CMax netlists.
+Every trial draws the resistance of each resistor and pot uniformly from within
+    its tolerance, and the probe traces of all the trials are summarized as
+    percentile envelopes. Trials are split into chunks of MONTE_CARLO_CHUNK_SIZE,
+    and chunk k draws from its own random state seeded with (seed, k), so the
+    results only depend on |seed|, not on how many processes are used, and
+    different seeds share no chunks. Within a chunk, each time step is one
+    batched solve over all of its trials (see sweep.py).
+Motors and heads are not supported, since their state would have to be carried
+    from one time step to the next for every trial.
+"""
+
+__author__ = 'mikemeko@mit.edu (Michael Mekonnen)'
+
+from constants import MONTE_CARLO_CHUNK_SIZE
+from constants import MONTE_CARLO_PERCENTILES
+from constants import NUM_SAMPLES
+from constants import POT_TOLERANCE
+from constants import RESISTOR_TOLERANCE
+from multiprocessing import cpu_count
+from multiprocessing import Pool
+from netlist import parse_netlist
+from numpy import array
+from numpy import clip
+from numpy import concatenate
+from numpy import percentile
+from numpy import tile
+from numpy import zeros
+from numpy.random import RandomState
+from simulate import NonexistentPart
+from simulate import SimulationError
+from sweep import connected_parts
+from sweep import constrain
+from sweep import probe_voltages
+from sweep import solve_systems
+from sweep import stamp
+
+def _run_trials(args):
+  """
+  Runs one chunk of trials. |args| is the tuple (lines, pot_alphas, num_trials,
+      resistor_tolerance, pot_tolerance, seed), where seed is anything
+      RandomState accepts. Returns an array of the probe
+      traces, indexed by trial, probe pair, and sample.
+  """
+  (lines, pot_alphas, num_trials, resistor_tolerance, pot_tolerance,
+      seed) = args
+  (n, resistors, pots, motor_pots, heads, motors, vsources, isources, op_amps,
+      probes) = connected_parts(lines)
+  random_state = RandomState(seed)
+  resistor_factors = random_state.uniform(1 - resistor_tolerance,
+      1 + resistor_tolerance, (num_trials, len(resistors)))
+  pot_factors = random_state.uniform(1 - pot_tolerance, 1 + pot_tolerance, (
+      num_trials, len(pots)))
+  # stamps that are the same for every trial and every time step
+  g_static = zeros((1, n, n))
+  for c in probes + op_amps + vsources:
+    if c.connected():
+      c.addConductance(g_static[0])
+  g_trials = tile(g_static, (num_trials, 1, 1))
+  for k, r in enumerate(resistors):
+    if r.connected():
+      stamp(g_trials, r.n1, r.n2, 1. / (r.resistance * resistor_factors[:, k]))
+  pot_resistances = [p.resistance * pot_factors[:, k] for k, p in
+      enumerate(pots)]
+  num_samples = pot_alphas.shape[1]
+  traces = None
+  for i in xrange(num_samples):
+    a_stack = g_trials.copy()
+    for k, p in enumerate(pots):
+      if p.connected():
+        alpha = clip(pot_alphas[k, i], 0.001, 0.999)
+        stamp(a_stack, p.n1, p.n2, 1. / ((1 - alpha) * pot_resistances[k]))
+        stamp(a_stack, p.n2, p.n3, 1. / (alpha * pot_resistances[k]))
+    b_stack = zeros((num_trials, n))
+    constrain(a_stack, b_stack, vsources, op_amps)
+    voltages = probe_voltages(solve_systems(a_stack, b_stack, op_amps), probes)
+    if traces is None:
+      traces = zeros((num_trials, voltages.shape[1], num_samples))
+    traces[:, :, i] = voltages
+  return traces
+
+def monte_carlo(lines, pot_alphas, num_trials, num_samples=NUM_SAMPLES,
+    resistor_tolerance=RESISTOR_TOLERANCE, pot_tolerance=POT_TOLERANCE,
+    percentiles=MONTE_CARLO_PERCENTILES, seed=0, num_processes=None):
+  """
+  |lines|: CMax netlist, strings or Netlist_Lines.
+  |pot_alphas|: for each pot (in netlist order), its alpha at each of the
+      |num_samples| samples.
+  |num_trials|: number of random circuits to simulate, at least 1.
+  |resistor_tolerance|, |pot_tolerance|: relative tolerances of the parts.
+  |percentiles|: the percentiles (0 to 100) of the envelopes to return.
+  |seed|: seed for the random draws.
+  |num_processes|: number of worker processes, one per core by default. With
+      1, the trials are run in this process.
+  Returns an array indexed by percentile, probe pair, and sample.
+  """
+  if num_trials < 1:
+    raise SimulationError('Monte Carlo analysis needs at least one trial, got '
+        '%d' % num_trials)
+  lines = parse_netlist(lines)
+  if any(line.kind in ('motor', 'head') for line in lines):
+    raise SimulationError('Monte Carlo analysis does not support motors or '
+        'heads')
+  num_pots = sum(1 for line in lines if line.kind == 'pot')
+  if len(pot_alphas) != num_pots:
+    raise NonexistentPart('Need alphas for %d pots, got %d' % (num_pots,
+        len(pot_alphas)))
+  pot_alphas = array(pot_alphas, dtype=float).reshape((num_pots,
+      num_samples))
+  tasks = [(lines, pot_alphas, min(MONTE_CARLO_CHUNK_SIZE, num_trials - start),
+      resistor_tolerance, pot_tolerance, [seed, k]) for k, start in enumerate(
+      xrange(0, num_trials, MONTE_CARLO_CHUNK_SIZE))]
+  num_processes = min(num_processes or cpu_count(), len(tasks))
+  if num_processes > 1:
+    pool = Pool(num_processes)
+    try:
+      chunks = pool.map(_run_trials, tasks)
+    finally:
+      pool.close()
+      pool.join()
+  else:
+    chunks = map(_run_trials, tasks)
+  return percentile(concatenate(chunks), percentiles, axis=0)
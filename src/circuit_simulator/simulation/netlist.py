@@ -0,0 +1,87 @@
+"""
+Parser for CMax netlists.
+Each line of a netlist is tokenized exactly once into a Netlist_Line record, so
+    that the phases of the simulator (node discovery, component construction,
+    printing) can share the work.
+Supported lines (x and y are non-negative integers, c1, c2, c3 are digits):
+    wire: (x,y)--(x,y)
+    resistor(c1,c2,c3): (x,y)--(x,y)
+    pot: (x,y)--(x,y)--(x,y)
+    opamp: (x,y)--(x,y)
+    robot: (x,y)--(x,y)
+    motor: (x,y)--(x,y)
+    head: (x,y)--(x,y)
+    +probe: (x,y)
+    -probe: (x,y)
+    +10: (x,y)
+    gnd: (x,y)
+Lines that do not match any of these forms are ignored.
+"""
+
+__author__ = 'mikemeko@mit.edu (Michael Mekonnen)'
+
+from re import compile
+
+# number of (x,y) points each kind of line needs
+NUM_POINTS = {'wire': 2, 'resistor': 2, 'pot': 3, 'opamp': 2, 'robot': 2,
+    'motor': 2, 'head': 2, '+probe': 1, '-probe': 1, '+10': 1, 'gnd': 1}
+
+_LINE = compile(r'(wire|resistor|pot|opamp|robot|motor|head|\+probe|-probe|'
+    r'\+10|gnd)(?:\((\d),(\d),(\d)\))?: (\(\d+,\d+\)(?:--\(\d+,\d+\))*)')
+_POINT = compile(r'\((\d+),(\d+)\)')
+
+class Netlist_Line:
+  """
+  Representation for one line of a CMax netlist.
+  """
+  def __init__(self, kind, points, code=None):
+    """
+    |kind|: the kind of part, one of the keys of NUM_POINTS.
+    |points|: tuple of the (x, y) points of the part.
+    |code|: for resistors, the 3-tuple (c1, c2, c3) encoding the resistance
+        (c1 * 10 + c2) * 10 ** c3, None otherwise.
+    """
+    assert kind in NUM_POINTS, 'unknown kind %s' % kind
+    assert len(points) >= NUM_POINTS[kind], 'not enough points for %s' % kind
+    assert (kind == 'resistor') == (code is not None), ('only resistors have a '
+        'code')
+    self.kind = kind
+    self.points = points
+    self.code = code
+  def __str__(self):
+    prefix = self.kind
+    if self.code:
+      prefix += '(%d,%d,%d)' % self.code
+    return '%s: %s' % (prefix, '--'.join('(%d,%d)' % point for point in
+        self.points))
+
+def parse_line(line):
+  """
+  Returns the Netlist_Line corresponding to the given CMax |line|, or None if
+      the line is not a recognized netlist line.
+  """
+  match = _LINE.match(line)
+  if not match:
+    return None
+  kind, c1, c2, c3, points = match.groups()
+  if (kind == 'resistor') != (c1 is not None):
+    return None
+  points = tuple((int(x), int(y)) for x, y in _POINT.findall(points))
+  if len(points) < NUM_POINTS[kind]:
+    return None
+  code = (int(c1), int(c2), int(c3)) if c1 is not None else None
+  return Netlist_Line(kind, points, code)
+
+def parse_netlist(lines):
+  """
+  Returns a list of Netlist_Lines for the given |lines|, each of which may be
+      a CMax string or an already parsed Netlist_Line. Unrecognized lines are
+      dropped.
+  """
+  parsed = []
+  for line in lines:
+    if not isinstance(line, Netlist_Line):
+      line = parse_line(line)
+    if line:
+      parsed.append(line)
+  return parsed
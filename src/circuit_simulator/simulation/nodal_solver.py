@@ -0,0 +1,129 @@
+"""
+Direct solver for the nodal equations assembled by the CMax simulator.
+The conductance matrix is split into the nodes whose voltages are known (set by
+    voltage sources and op amp outputs) and the free nodes. The known nodes are
+    eliminated as Dirichlet rows, and the free-free block is LU factorized once
+    so that it can be reused for any number of right hand sides. A tiny
+    conductance |GMIN| from every free node to ground ties down parts of the
+    circuit that are left floating (e.g. a motor connected to nothing else).
+Conductances that change between time steps (e.g. pots) are kept apart from the
+    static stamps. Changes relative to the factorized matrix are applied as a
+    low-rank (Woodbury) correction, so the factorization survives across time
+    steps.
+"""
+
+__author__ = 'mikemeko@mit.edu (Michael Mekonnen)'
+
+from constants import GMIN
+from numpy import array
+from numpy import array_equal
+from numpy import dot
+from numpy import eye
+from numpy import flatnonzero
+from numpy import ix_
+from numpy import newaxis
+from numpy import zeros
+from scipy.linalg import lu_factor
+from scipy.linalg import lu_solve
+
+class Nodal_Solver:
+  """
+  Solves G v = -i for the voltages of the free nodes, given the voltages of the
+      known nodes.
+  """
+  def __init__(self, g_matrix, known, branches=(), conductances=()):
+    """
+    |g_matrix|: N x N matrix of the static conductance stamps (list of lists or
+        numpy array).
+    |known|: list of N booleans, True for the nodes whose voltages are known.
+    |branches|: list of node pairs (n1, n2), the two-terminal conductances that
+        may change between solves.
+    |conductances|: the initial conductance of each of the |branches|.
+    Raises an Exception if the free-free block of the matrix is singular.
+    """
+    assert len(branches) == len(conductances), ('need one conductance per '
+        'branch')
+    self._g_matrix = array(g_matrix, dtype=float)
+    known = array(known, dtype=bool)
+    self._free = flatnonzero(~known)
+    self._fixed = flatnonzero(known)
+    # incidence matrix of the dynamic branches
+    self._u = zeros((len(known), len(branches)))
+    for b, (n1, n2) in enumerate(branches):
+      self._u[n1, b] += 1
+      self._u[n2, b] -= 1
+    self._u_free = self._u[self._free]
+    self._u_fixed = self._u[self._fixed]
+    self._conductances = None
+    self._factorize(array(conductances, dtype=float))
+  def _factorize(self, conductances):
+    """
+    Factorizes the free-free block of the matrix with the dynamic branches set
+        to the given |conductances|, which become the reference conductances.
+    """
+    g_matrix = self._g_matrix + dot(self._u * conductances, self._u.T)
+    self._reference = conductances
+    self._conductances = conductances
+    self._g_free_fixed = g_matrix[ix_(self._free, self._fixed)]
+    self._changed = []
+    self._lu = None
+    if len(self._free):
+      g_free = g_matrix[ix_(self._free, self._free)]
+      g_free.flat[::len(self._free) + 1] += GMIN
+      self._lu = lu_factor(g_free, check_finite=False)
+      if not self._lu[0].diagonal().all():
+        raise Exception('Singular conductance matrix')
+  def set_conductances(self, conductances):
+    """
+    Sets the current conductance of each of the dynamic branches. The cached
+        factorization is reused outright if nothing changed, updated with a
+        low-rank correction if only a few branches changed, and recomputed
+        otherwise.
+    """
+    conductances = array(conductances, dtype=float)
+    if array_equal(conductances, self._conductances):
+      return
+    self._conductances = conductances
+    deltas = conductances - self._reference
+    changed = flatnonzero(deltas)
+    if 2 * len(changed) >= len(self._free):
+      self._factorize(conductances)
+      return
+    self._changed = changed
+    self._deltas = deltas[changed]
+    if len(changed) and self._lu is not None:
+      u = self._u_free[:, changed]
+      self._z = lu_solve(self._lu, u, check_finite=False)
+      self._capacitance = lu_factor(eye(len(changed)) + self._deltas[:, None] *
+          dot(u.T, self._z), check_finite=False)
+  def conductance(self, n1, n2):
+    """
+    Returns the current entry (|n1|, |n2|) of the conductance matrix.
+    """
+    return self._g_matrix[n1, n2] + dot(self._u[n1] * self._u[n2],
+        self._conductances)
+  def solve(self, voltages, currents):
+    """
+    |voltages|: N voltages, only the entries for the known nodes are used.
+    |currents|: N currents injected into the nodes.
+    Returns a numpy array of all N node voltages. Several systems can be solved
+        at once by passing N x k arrays, one column per system.
+    """
+    v = array(voltages, dtype=float)
+    shape = v.shape
+    v = v.reshape((shape[0], -1))
+    if self._lu is not None:
+      rhs = -array(currents, dtype=float).reshape(v.shape)[self._free]
+      deltas = self._deltas[:, newaxis] if len(self._changed) else None
+      if len(self._fixed):
+        v_fixed = v[self._fixed]
+        rhs -= dot(self._g_free_fixed, v_fixed)
+        if len(self._changed):
+          rhs -= dot(self._u_free[:, self._changed], deltas * dot(
+              self._u_fixed[:, self._changed].T, v_fixed))
+      v_free = lu_solve(self._lu, rhs, check_finite=False)
+      if len(self._changed):
+        v_free -= dot(self._z, lu_solve(self._capacitance, deltas * dot(
+            self._u_free[:, self._changed].T, v_free), check_finite=False))
+      v[self._free] = v_free
+    return v.reshape(shape)
@@ -0,0 +1,195 @@
+"""
+Content-addressed on-disk cache of simulation results.
+A result is stored under a hash of everything that determines it: the netlist
+    lines, the sampled input signals, the part labels, the number of samples,
+    the time step, the solver, the integrator and the seed, as well as the
+    source of every module of the simulation package and of the disjoint set
+    forest it finds islands with, so that changes to the simulator never
+    return stale results. Results are pickled into one file per hash. Reading
+    a result marks it as recently used, and the least recently used results
+    are removed whenever the cache grows past its size limit.
+Unreadable or missing entries are treated as misses, and failures to write are
+    ignored, so the cache never stops a simulation from running.
+"""
+
+__author__ = 'mikemeko@mit.edu (Michael Mekonnen)'
+
+from constants import RESULT_CACHE_DIR
+from constants import RESULT_CACHE_MAX_BYTES
+from cPickle import dump
+from cPickle import HIGHEST_PROTOCOL
+from cPickle import load
+from core.data_structures import disjoint_set_forest
+from hashlib import sha1
+from numpy import asarray
+from os import getpid
+from os import listdir
+from os import makedirs
+from os import remove
+from os import rename
+from os import stat
+from os import utime
+from os.path import abspath
+from os.path import basename
+from os.path import dirname
+from os.path import expanduser
+from os.path import isdir
+from os.path import join
+from os.path import splitext
+
+# extension of the files holding the results
+RESULT_EXTENSION = '.result'
+
+_simulator_hash = None
+
+def _simulator_source_files():
+  """
+  Returns the source files whose contents are part of every key: all the
+      modules of the simulation package, then the disjoint set forest.
+  """
+  directory = dirname(abspath(__file__))
+  return [join(directory, file_name) for file_name in sorted(listdir(
+      directory)) if file_name.endswith('.py')] + [
+      splitext(disjoint_set_forest.__file__)[0] + '.py']
+
+def _simulator_source_hash():
+  """
+  Returns a hash of the source of the simulator, computed once.
+  """
+  global _simulator_hash
+  if _simulator_hash is None:
+    digest = sha1()
+    for source in _simulator_source_files():
+      digest.update(basename(source) + '\0')
+      source_file = open(source, 'rb')
+      digest.update(source_file.read())
+      source_file.close()
+    _simulator_hash = digest.hexdigest()
+  return _simulator_hash
+
+def result_key(simulation_args, num_samples, time_step, solver, integrator,
+    seed=None, deterministic=False):
+  """
+  Returns the key of the result of simulating the given |simulation_args| (the
+      positional arguments of simulate.solve, with each signal a
+      simulate.ListSignal) for |num_samples| steps of |time_step| with the
+      given |solver|, |integrator|, |seed| and |deterministic|.
+  """
+  (lines, pot_alpha_signals, lamp_angle_signals, lamp_distance_signals,
+      pot_labels, lamp_labels, head_motor_labels, motor_labels) = (
+      simulation_args)
+  digest = sha1(_simulator_source_hash())
+  digest.update('\n'.join(map(str, lines)))
+  for signals in (pot_alpha_signals, lamp_angle_signals,
+      lamp_distance_signals):
+    digest.update('\0%d' % len(signals))
+    for signal in signals:
+      digest.update('\0')
+      digest.update(asarray(signal.samples, dtype=float).tostring())
+  for labels in (pot_labels, lamp_labels, head_motor_labels, motor_labels):
+    digest.update('\0' + '\1'.join(map(str, labels)))
+  digest.update('\0%d\0%r\0%s\0%s\0%r\0%r' % (num_samples, time_step,
+      solver, integrator, seed, deterministic))
+  return digest.hexdigest()
+
+class Result_Cache:
+  """
+  Size-limited directory of simulation results.
+  """
+  def __init__(self, directory=None, max_bytes=RESULT_CACHE_MAX_BYTES):
+    """
+    |directory|: where to keep the results, RESULT_CACHE_DIR under the user's
+        home directory by default. Created when the first result is stored.
+    |max_bytes|: total size of the results to keep.
+    """
+    self.directory = directory or join(expanduser('~'), RESULT_CACHE_DIR)
+    self.max_bytes = max_bytes
+  def _path(self, key):
+    return join(self.directory, key + RESULT_EXTENSION)
+  def get(self, key):
+    """
+    Returns the result stored under the given |key|, or None if there is none.
+    """
+    path = self._path(key)
+    try:
+      result_file = open(path, 'rb')
+    except IOError:
+      return None
+    try:
+      try:
+        result = load(result_file)
+      finally:
+        result_file.close()
+      utime(path, None)
+      return result
+    except Exception:
+      # corrupt or from an incompatible version
+      self._remove(path)
+      return None
+  def put(self, key, result):
+    """
+    Stores the given |result| under the given |key|, then removes the least
+        recently used results until the cache fits in its size limit.
+    """
+    path = self._path(key)
+    temp_path = '%s.%d.tmp' % (path, getpid())
+    try:
+      if not isdir(self.directory):
+        makedirs(self.directory)
+      result_file = open(temp_path, 'wb')
+      try:
+        dump(result, result_file, HIGHEST_PROTOCOL)
+      finally:
+        result_file.close()
+      # the rename is atomic, so readers never see a partial result
+      rename(temp_path, path)
+    except Exception:
+      self._remove(temp_path)
+      return
+    self._evict()
+  def _entries(self):
+    """
+    Returns a list of (last use, size, path) for the stored results.
+    """
+    entries = []
+    try:
+      file_names = listdir(self.directory)
+    except OSError:
+      return entries
+    for file_name in file_names:
+      if file_name.endswith(RESULT_EXTENSION):
+        path = join(self.directory, file_name)
+        try:
+          info = stat(path)
+        except OSError:
+          continue
+        entries.append((info.st_mtime, info.st_size, path))
+    return entries
+  def _evict(self):
+    """
+    Removes the least recently used results until the cache fits in its size
+        limit.
+    """
+    entries = sorted(self._entries())
+    total = sum(size for last_use, size, path in entries)
+    for last_use, size, path in entries:
+      if total <= self.max_bytes:
+        break
+      self._remove(path)
+      total -= size
+  def _remove(self, path):
+    try:
+      remove(path)
+    except OSError:
+      pass
+  def size(self):
+    """
+    Returns the total size in bytes of the stored results.
+    """
+    return sum(size for last_use, size, path in self._entries())
+  def clear(self):
+    """
+    Removes all stored results.
+    """
+    for last_use, size, path in self._entries():
+      self._remove(path)
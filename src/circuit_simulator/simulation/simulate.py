@@ -1,68 +1,113 @@
-import re
 import math
-import lib601.sig as sig
-#import sig
-reload(sig)
-from lib601.plotWindow import PlotWindow
-
 import random
-import Tkinter
-tcl =Tkinter.Tcl()
-def reafter():
-        tcl.after(500,reafter)
-tcl.after(500,reafter)
-
-sim_output = ''
-sim_windows = set()
-
-def add_window(w):
-    global sim_windows
-    sim_windows.add(w)
-
-def close_all_windows():
-    global sim_windows
-    for win in sim_windows:
-        try:
-            win.destroy()
-        except:
-            pass
-    sim_windows = set()
+from core.data_structures.disjoint_set_forest import Array_Disjoint_Set_Forest
+from constants import INTEGRATOR_EULER
+from constants import INTEGRATOR_RK4
+from constants import LOG_DEBUG
+from constants import LOG_INFO
+from constants import LOG_WARNING
+from constants import PHASE_ASSEMBLE
+from constants import PHASE_INSTRUMENT
+from constants import PHASE_OUTPUT
+from constants import PHASE_PARSE
+from constants import PHASE_SOLVE
+from constants import PHASE_UPDATE
+from constants import SATURATION_LINEAR
+from constants import SATURATION_NEGATIVE
+from constants import SATURATION_POSITIVE
+from constants import SOLUTION_CACHE_VALUES
+from constants import SOLVER_DIRECT
+from constants import SOLVER_RELAXATION
+from constants import SOLVER_SOR
+from constants import SPARSE_MIN_NODES
+from diagnostics import Diagnostics_Log
+from instrumentation import Simulation_Stats
+from netlist import parse_netlist
+from nodal_solver import Nodal_Solver
+from numpy import array
+from numpy import asarray
+from numpy import dot
+from numpy import logical_not
+from numpy import eye
+from numpy import linalg
+from numpy import zeros
+from numpy.linalg import LinAlgError
+from scipy.sparse import coo_matrix
+from sor_solver import SOR_Solver
+from sparse_solver import Sparse_Solver
 
-def add_to_output(s):
-    global sim_output
-    sim_output += "%s\n" % s
+# Headless simulator: no module-level state, no display. solve() returns a
+# SimulationResult that a separate layer may plot (see main/plotters.py).
 
-def set_output(s=''):
-    global sim_output
-    sim_output = s
+class SimulationResult:
+    # everything produced by one simulation, as plain data
+    def __init__(self,nSamples,deltaT):
+        self.nSamples = nSamples
+        self.deltaT = deltaT
+        self.nodeNames = []     # name of each node
+        self.nodePins = []      # pin locations of each node
+        self.voltages = []      # per sample, the voltage of each node
+        self.probes = []        # per probe pair, +probe - -probe per sample
+        self.motors = {}        # motor label -> (angles, velocities)
+        self.signals = []       # (title, samples, y0, y1) per output signal
+        self.iterations = []    # per sample, solver iterations until settled
+        self.converged = []     # per sample, False if the solver gave up
+        self.log = Diagnostics_Log()    # diagnostics, formatted on demand
+        self.stats = None       # Simulation_Stats, if instrumented
+    def warn(self,message):
+        self.log.warning(message)
+    def output(self,level=LOG_DEBUG):
+        return self.log.text(level)
 
-def warn(message):
-    add_to_output(message)
+class ListSignal:
+    # samples of a list, 0 outside of it
+    def __init__(self,samples):
+        self.samples = samples
+    def sample(self,n):
+        if 0<=n<len(self.samples):
+            return self.samples[n]
+        return 0
 
-class SingularMatrix(Exception):
-    def __init__(self,value):
-        self.value = value
-    def __str__(self):
-        return repr(self.value)
+def sampleArray(signal,nSamples):
+    # samples 0 to nSamples-1 of the DT signal |signal| as a list of floats,
+    # read straight from the samples of a ListSignal
+    if isinstance(signal,ListSignal):
+        samples = asarray(signal.samples[:nSamples],dtype=float).tolist()
+        return samples+[0.]*(nSamples-len(samples))
+    return [float(signal.sample(n)) for n in xrange(nSamples)]
 
-class MultipleSources(Exception):
+class SimulationError(Exception):
     def __init__(self,value):
         self.value = value
+        self.log = None         # Diagnostics_Log of the failed simulation
+        self.messages = []      # its warnings and errors
     def __str__(self):
         return repr(self.value)
 
+class SingularMatrix(SimulationError):
+    pass
+
+class MultipleSources(SimulationError):
+    pass
+
 class Resistor:
     def __init__(self,resistance,n1,n2):
         self.resistance = resistance
         self.n1 = n1
         self.n2 = n2
     def __str__(self):
-        return 'Resistor ('+str(self.resistance)+' ohms): ' + chr(97 +self.n1)+'--'+chr(97 + self.n2)
+        return 'Resistor ('+str(self.resistance)+' ohms): ' + nodeName(self.n1)+'--'+nodeName(self.n2)
     def addConductance(self,gMatrix):
         gMatrix[self.n1][self.n1] += 1./self.resistance
         gMatrix[self.n1][self.n2] -= 1./self.resistance
         gMatrix[self.n2][self.n1] -= 1./self.resistance
         gMatrix[self.n2][self.n2] += 1./self.resistance
+    def links(self):
+        # node pairs joined through a conductance, see findIslands
+        return [(self.n1,self.n2)]
+    def grounds(self):
+        # nodes with a conductance to ground, see findIslands
+        return []
     def connected(self):
         return self.n1 != None and self.n2 != None
 
@@ -73,19 +118,23 @@ class Pot:
         self.n2 = n2
         self.n3 = n3
         self.alpha = 0.5
-        self.alphaSample = sig.ConstantSignal(0.5).sample
+        self.alphaSample = lambda n: 0.5
     def __str__(self):
-        return 'Pot ('+str(self.resistance)+' ohms): '+chr(97+self.n1)+'--'+chr(97+self.n2)+'--'+chr(97+self.n3)
-    def addConductance(self,gMatrix):
+        return 'Pot ('+str(self.resistance)+' ohms): '+nodeName(self.n1)+'--'+nodeName(self.n2)+'--'+nodeName(self.n3)
+    def branches(self):
+        # the two halves of the pot at the current alpha, as (n1,n2,conductance)
         a = min(max(self.alpha,0.001),0.999)
-        gMatrix[self.n1][self.n1] += 1./((1.0-a)*self.resistance)
-        gMatrix[self.n1][self.n2] -= 1./((1.0-a)*self.resistance)
-        gMatrix[self.n2][self.n1] -= 1./((1.0-a)*self.resistance)
-        gMatrix[self.n2][self.n2] += 1./((1.0-a)*self.resistance)
-        gMatrix[self.n2][self.n2] += 1./(a*self.resistance)
-        gMatrix[self.n2][self.n3] -= 1./(a*self.resistance)
-        gMatrix[self.n3][self.n2] -= 1./(a*self.resistance)
-        gMatrix[self.n3][self.n3] += 1./(a*self.resistance)
+        return [(self.n1,self.n2,1./((1.0-a)*self.resistance)),(self.n2,self.n3,1./(a*self.resistance))]
+    def addConductance(self,gMatrix):
+        for (n1,n2,g) in self.branches():
+            gMatrix[n1][n1] += g
+            gMatrix[n1][n2] -= g
+            gMatrix[n2][n1] -= g
+            gMatrix[n2][n2] += g
+    def links(self):
+        return [(self.n1,self.n2),(self.n2,self.n3)]
+    def grounds(self):
+        return []
     def connected(self):
         return sum([1 for n in [self.n1, self.n2, self.n3] if n!=None])>1
 
@@ -95,12 +144,16 @@ class PhotoResistor:
         self.n2 = n2
         self.resistance = resistance
     def __str__(self):
-        return 'PhotoResistor: '+chr(97+self.n1)+'--'+chr(97+self.n2)
+        return 'PhotoResistor: '+nodeName(self.n1)+'--'+nodeName(self.n2)
     def addConductance(self,gMatrix):
         gMatrix[self.n1][self.n1] += 1./self.resistance
         gMatrix[self.n1][self.n2] -= 1./self.resistance
         gMatrix[self.n2][self.n1] -= 1./self.resistance
         gMatrix[self.n2][self.n2] += 1./self.resistance
+    def links(self):
+        return [(self.n1,self.n2)]
+    def grounds(self):
+        return []
     def connected(self):
         return self.n1 != None and self.n2 != None
 
@@ -111,7 +164,7 @@ class PhotoDiode:
         self.resistance = 1e10
         self.current = 1e-7
     def __str__(self):
-        return 'PhotoDiode: '+chr(97+self.n1)+'--'+chr(97+self.n2)
+        return 'PhotoDiode: '+nodeName(self.n1)+'--'+nodeName(self.n2)
     def addConductance(self,gMatrix):
         gMatrix[self.n1][self.n1] += 1./self.resistance
         gMatrix[self.n1][self.n2] -= 1./self.resistance
@@ -120,6 +173,10 @@ class PhotoDiode:
     def setCurrent(self,currents):
         currents[self.n1] = self.current
         currents[self.n2] = -self.current
+    def links(self):
+        return [(self.n1,self.n2)]
+    def grounds(self):
+        return []
     def connected(self):
         return self.n1 != None and self.n2 != None
 
@@ -140,10 +197,10 @@ class Head:
         self.right = right
         self.phi = 0.0
         self.distance = 1
-        self.lampAngleSample = sig.ConstantSignal(0.).sample
-        self.lampDistanceSample = sig.ConstantSignal(1.).sample
+        self.lampAngleSample = lambda n: 0.
+        self.lampDistanceSample = lambda n: 1.
     def __str__(self):
-        return 'Motor: '+chr(97+self.n1)+'--'+chr(97+self.n2)
+        return 'Motor: '+nodeName(self.n1)+'--'+nodeName(self.n2)
     def addConductance(self,gMatrix):
 #        gMatrix[self.n1][self.n1] += 0.000001
 #        gMatrix[self.n1][self.n2] -= 0.000001
@@ -153,6 +210,10 @@ class Head:
         gMatrix[self.n1][self.n2] -= .2
         gMatrix[self.n2][self.n1] -= .2
         gMatrix[self.n2][self.n2] += .2
+    def links(self):
+        return [(self.n1,self.n2)]
+    def grounds(self):
+        return []
     def connected(self):
         return self.n1 != None and self.n2 != None
     def updatePhotoResistors(self):
@@ -188,9 +249,13 @@ class Head:
     def updatePot(self):
         if self.pot:
             self.pot.alpha = (self.theta/2./math.pi+0.5)%1.0
-    def update(self,voltages,T):
+    def derivatives(self,voltages):
+        # (dtheta/dt,domega/dt) with the given voltages across the motor
         tau = (voltages[self.n1]-voltages[self.n2]-self.Kb*self.omega)*self.Kt/self.Rm
-        omegaDot = (tau-self.B*self.omega)/self.J
+        return (self.omega,(tau-self.B*self.omega)/self.J)
+    def update(self,voltages,T):
+        # semi-implicit Euler step
+        omegaDot = self.derivatives(voltages)[1]
         omega = self.omega+T*omegaDot
         theta = self.theta+T*omega
         self.omega = omega
@@ -201,15 +266,18 @@ class VoltageSource:
         self.voltage = voltage
         self.n1 = n1
     def __str__(self):
-        return 'Source ('+str(self.voltage)+' volts): '+chr(97+self.n1)
+        return 'Source ('+str(self.voltage)+' volts): '+nodeName(self.n1)
     def setVoltage(self,voltages,knowns):
         if knowns[self.n1]:
-            warn('Voltage on node {0:d} set by multiple sources.'.format(self.n1))
             raise MultipleSources('Voltage on node {0:d} set by multiple sources.'.format(self.n1))
         voltages[self.n1] = self.voltage
         knowns[self.n1] = True
     def addConductance(self,gMatrix):
         gMatrix[self.n1][self.n1] += 1./0.000001
+    def links(self):
+        return []
+    def grounds(self):
+        return [self.n1]
     def connected(self):
         return self.n1 != None
 
@@ -222,18 +290,20 @@ class OpAmp:
         self.pM = pM
         self.K = 10000
         self.alpha = 0.0001
+        self.rng = random   # source of the random draws, see makeRandom
     def __str__(self):
-        return 'OpAmp: '+chr(97 + self.vO)+'--'+chr(97 + self.vP)+'--'+chr(97 + self.vM)+'--'+chr(97 + self.pP)+'--'+chr(97 + self.pM)
-    def initial(self,voltages,knowns):
+        return 'OpAmp: '+nodeName(self.vO)+'--'+nodeName(self.vP)+'--'+nodeName(self.vM)+'--'+nodeName(self.pP)+'--'+nodeName(self.pM)
+    def initial(self,voltages,knowns,warm=False):
+        # warm: keep the output already in voltages instead of a random guess
         if knowns[self.vO]:
-            warn('Voltage on node {0:d} set by multiple sources.'.format(self.vO))
             raise MultipleSources('Voltage on node {0:d} set by multiple sources.'.format(self.vO))
-        voltages[self.vO] = random.uniform(-1e-9,1e9)
+        if not warm:
+            voltages[self.vO] = self.rng.uniform(-1e-9,1e9)
         knowns[self.vO] = True
     def update(self,voltages,knowns):
         v = self.K*(voltages[self.vP]-voltages[self.vM])
         v = self.alpha*v+(1.-self.alpha)*voltages[self.vO]
-        v = v+random.uniform(-1e-9,1e-9)
+        v = v+self.rng.uniform(-1e-9,1e-9)
         if v>voltages[self.pP]:
             v = voltages[self.pP]
         if v<voltages[self.pM]:
@@ -244,55 +314,104 @@ class OpAmp:
         gMatrix[self.vO][self.vO] += 1./0.0001
         gMatrix[self.pP][self.pP] += 1./0.000001
         gMatrix[self.pM][self.pM] += 1./0.000001
+    def links(self):
+        # the inputs draw no current
+        return []
+    def grounds(self):
+        return [self.vO,self.pP,self.pM]
     def connected(self):
         return self.vP != None and self.vM != None
 
+class MidpointRandom:
+    # stands in for a random.Random in deterministic simulations, every draw
+    # is the middle of its range
+    def uniform(self,a,b):
+        return (a+b)/2.
+
+def makeRandom(seed=None,deterministic=False):
+    # Returns the source of the random draws of one simulation, isolated from
+    # the global random module: a random.Random seeded with |seed| (or |seed|
+    # itself if it already is one), or no randomness at all if |deterministic|.
+    if deterministic:
+        return MidpointRandom()
+    if isinstance(seed,random.Random):
+        return seed
+    return random.Random(seed)
+
 class Probe:
     def __init__(self,n1,sign):
         self.n1 = n1
         self.sign = sign
     def __str__(self):
-        return 'Probe ('+self.sign+'): '+chr(97 + self.n1)
+        return 'Probe ('+self.sign+'): '+nodeName(self.n1)
     def addConductance(self,gMatrix):
         gMatrix[self.n1][self.n1] += 0.000001
+    def links(self):
+        return []
+    def grounds(self):
+        return [self.n1]
     def connected(self):
         return self.n1 != None
 
+class Stamps:
+    # Conductance stamps collected as COO triplets for sparse assembly, through
+    # the same gMatrix[n1][n2] += g as a dense matrix: every entry reads as 0,
+    # so each stamp is recorded as its own increment, and the duplicates are
+    # summed when the matrix is built.
+    def __init__(self):
+        self.rows = []
+        self.cols = []
+        self.values = []
+    def __getitem__(self,n1):
+        return StampRow(self,n1)
+    def matrix(self,N):
+        return coo_matrix((self.values,(self.rows,self.cols)),shape=(N,N)).tocsc()
+
+class StampRow:
+    def __init__(self,stamps,n1):
+        self.stamps = stamps
+        self.n1 = n1
+    def __getitem__(self,n2):
+        return 0.
+    def __setitem__(self,n2,value):
+        self.stamps.rows.append(self.n1)
+        self.stamps.cols.append(n2)
+        self.stamps.values.append(value)
+
 def pin(x,y):
     # (mikemeko) hack to make CMax simulator to work with circuit simulator
     # For all (x,y) pairs, x may be any non-negative integer, but y will be
     #     either 0 or 1. No two different (x,y) pairs are considered connected.
     return  2 * x + y
-    if x < 1 or x > 63:
-        warn('Illegal pin %s,%s'%(x,y))
-        return False
-    if y == 1 and 2<x<62 and (x%6 != 2): return 201
-    if y == 2 and 2<x<62 and (x%6 != 2): return 202
-    if y == 19 and 2<x<62 and (x%6 != 2): return 203
-    if y == 20 and 2<x<62 and (x%6 != 2): return 204
-    if 4 < y < 10: return 300+x
-    if 11 < y < 17: return 400+x
-    warn('Illegal pin %s,%s'%(x,y))
-    return False
+
+def pinLabel(p):
+    # location of a pin, used to point at nodes in messages
+    return '({0:d},{1:d})'.format(p//2,p%2)
+
+def nodeName(n):
+    # a, b, ..., z, aa, ab, ... so that any number of nodes can be named
+    name = ''
+    n += 1
+    while n>0:
+        (n,r) = divmod(n-1,26)
+        name = chr(97+r)+name
+    return name
 
 def makeNodes(lines):
-    global nodes
-    nodes = 500*[None]
-    N = 0
-    connected = []
+    nodes = {}
+    forest = Array_Disjoint_Set_Forest()
     counts = []
+    def addPin(a):
+        if nodes.get(a)==None:
+            nodes[a] = forest.make_set()
+            counts.append(0)
+        return nodes[a]
     def addNode(x0,y0):
-        a = pin(x0,y0)
-        if nodes[a]==None:
-            nodes[a] = len(connected)
-            connected.append([a])
-            counts.append(1)
-        else:
-            counts[nodes[a]] += 1
+        counts[addPin(pin(x0,y0))] += 1
     for line in lines:
-        match = re.match(r'opamp: \((\d+),(\d+)\)--\((\d+),(\d+)\)',line)
-        if match:
-            (x0,y0,x1,y1) = [int(x) for x in match.groups()]
+        kind = line.kind
+        if kind=='opamp':
+            ((x0,y0),(x1,y1)) = line.points[:2]
             if y0<y1:
                 for i in range(4):
                     addNode(x0-i,y0)
@@ -301,104 +420,98 @@ def makeNodes(lines):
                 for i in range(4):
                     addNode(x0+i,y0)
                     addNode(x0+i,y1)
-        match = re.match(r'resistor\((\d),(\d),(\d)\): \((\d+),(\d+)\)--\((\d+),(\d+)\)',line)
-        if match:
-            (c1,c2,c3,x0,y0,x1,y1) = [int(x) for x in match.groups()]
+        elif kind=='resistor':
+            ((x0,y0),(x1,y1)) = line.points[:2]
             addNode(x0,y0)
             addNode(x1,y1)
-        match = re.match(r'pot: \((\d+),(\d+)\)--\((\d+),(\d+)\)--\((\d+),(\d+)\)',line)
-        if match:
-            (x0,y0,x1,y1,x2,y2) = [int(x) for x in match.groups()]
+        elif kind=='pot':
+            ((x0,y0),(x1,y1),(x2,y2)) = line.points[:3]
             addNode(x0,y0)
             addNode(x1,y1)
             addNode(x2,y2)
-        match = re.match(r'robot: \((\d+),(\d+)\)--\((\d+),(\d+)\)',line)
-        if match:
-            (x0,y0,x1,y1) = [int(x) for x in match.groups()]
+        elif kind=='robot':
+            ((x0,y0),(x1,y1)) = line.points[:2]
             if x0 < x1:
                 addNode(x0+1,y0)
                 addNode(x0+3,y0)
             else:
                 addNode(x0-1,y0)
                 addNode(x0-3,y0)
-        match = re.match(r'motor: \((\d+),(\d+)\)--\((\d+),(\d+)\)',line)
-        if match:
-            (x0,y0,x1,y1) = [int(x) for x in match.groups()]
+        elif kind=='motor':
+            ((x0,y0),(x1,y1)) = line.points[:2]
             if x0 < x1:
                 addNode(x0+4,y0)
                 addNode(x0+5,y0)
             else:
                 addNode(x0-4,y0)
                 addNode(x0-5,y0)
-        match = re.match(r'head: \((\d+),(\d+)\)--\((\d+),(\d+)\)',line)
-        if match:
-            (x0,y0,x1,y1) = [int(x) for x in match.groups()]
+        elif kind=='head':
+            ((x0,y0),(x1,y1)) = line.points[:2]
             if x0 < x1:
                 for i in range(8):
                     addNode(x0+i,y0)
             else:
                 for i in range(8):
                     addNode(x0-i,y0)
-        match = re.match(r'\+probe: \((\d+),(\d+)\)',line)
-        if match:
-            (x0,y0) = [int(x) for x in match.groups()]
-            addNode(x0,y0)
-        match = re.match(r'\-probe: \((\d+),(\d+)\)',line)
-        if match:
-            (x0,y0) = [int(x) for x in match.groups()]
-            addNode(x0,y0)
-        match = re.match(r'\+10: \((\d+),(\d+)\)',line)
-        if match:
-            (x0,y0) = [int(x) for x in match.groups()]
-            addNode(x0,y0)
-        match = re.match(r'gnd: \((\d+),(\d+)\)',line)
-        if match:
-            (x0,y0) = [int(x) for x in match.groups()]
+        elif kind in ('+probe','-probe','+10','gnd'):
+            (x0,y0) = line.points[0]
             addNode(x0,y0)
     for line in lines:
-        match = re.match(r'wire: \((\d+),(\d+)\)--\((\d+),(\d+)\)',line)
-        if match:
-            (x0,y0,x1,y1) = [int(x) for x in match.groups()]
-            a = pin(x0,y0)
-            b = pin(x1,y1)
-            if nodes[a]==None:
-                if nodes[b]==None:
-                    nodes[a] = len(connected)
-                    nodes[b] = len(connected)
-                    connected.append([a,b])
-                    counts.append(0)
-                else:
-                    connected[nodes[b]] += [a]
-                    nodes[a] = nodes[b]
-            else:
-                if nodes[b]==None:
-                    connected[nodes[a]] += [b]
-                    nodes[b] = nodes[a]
-                else:
-                    if nodes[a]!=nodes[b]:
-                        t = nodes[b]
-                        connected[nodes[a]] += connected[nodes[b]]
-                        counts[nodes[a]] += counts[nodes[b]]
-                        for c in connected[t]:
-                            nodes[c] = nodes[a]
-                        connected[t] = []
-                        counts[t] = 0
+        if line.kind=='wire':
+            ((x0,y0),(x1,y1)) = line.points[:2]
+            forest.union(addPin(pin(x0,y0)),addPin(pin(x1,y1)))
+    # a node is numbered by its first pin, and only kept if a part touches it
+    totals = [0]*len(counts)
+    for s in range(len(counts)):
+        totals[forest.find_set(s)] += counts[s]
     renum = {}
     i = 0
-    for n in range(len(connected)):
-        if counts[n]<1:
-            renum[n] = None
-        else:
-            renum[n] = i
-            i += 1
-    renum[None] = None
-    return ([renum[n] for n in nodes],i)
+    for s in range(len(counts)):
+        r = forest.find_set(s)
+        if r not in renum:
+            if totals[r]<1:
+                renum[r] = None
+            else:
+                renum[r] = i
+                i += 1
+    nodes = dict((a,renum[forest.find_set(s)]) for (a,s) in nodes.items())
+    nodePins = [[] for n in range(i)]
+    for a in sorted(nodes):
+        if nodes[a]!=None:
+            nodePins[nodes[a]].append(' '+pinLabel(a))
+    return (nodes,i,[''.join(labels) for labels in nodePins])
 
-def node(x,y):
-    global nodes
-    return nodes[pin(x,y)]
+def findIslands(N,parts):
+    # Connectivity pre-pass over the terminals of |parts|, run before any
+    # matrix is built. Nodes are joined by the conductances of the parts
+    # (links) and tied to ground by sources, op amps and probes (grounds).
+    # Returns (floating,islands): the nodes that no conductance touches, and
+    # the groups of nodes that are joined to each other but not to ground,
+    # over which the conductance matrix is singular.
+    forest = Array_Disjoint_Set_Forest(N)
+    touched = [False for i in range(N)]
+    parts = [c for c in parts if c.connected()]
+    for c in parts:
+        for (n1,n2) in c.links():
+            if n1!=None and n2!=None:
+                forest.union(n1,n2)
+                touched[n1] = touched[n2] = True
+    grounded = set()
+    for c in parts:
+        for n in c.grounds():
+            if n!=None:
+                touched[n] = True
+                grounded.add(forest.find_set(n))
+    floating = [i for i in range(N) if not touched[i]]
+    groups = {}
+    for i in range(N):
+        if touched[i] and forest.find_set(i) not in grounded:
+            groups.setdefault(forest.find_set(i),[]).append(i)
+    return (floating,sorted(groups.values()))
 
-def parseComponents(lines):
+def parseComponents(lines,nodes):
+    def node(x,y):
+        return nodes.get(pin(x,y))
     resistors = []
     pots = []
     motorPots = []
@@ -409,17 +522,16 @@ def parseComponents(lines):
     opAmps = []
     probes = []
     for line in lines:
-        match = re.match(r'resistor\((\d),(\d),(\d)\): \((\d+),(\d+)\)--\((\d+),(\d+)\)',line)
-        if match:
-            (c1,c2,c3,x0,y0,x1,y1) = [int(x) for x in match.groups()]
+        kind = line.kind
+        if kind=='resistor':
+            (c1,c2,c3) = line.code
+            ((x0,y0),(x1,y1)) = line.points[:2]
             resistors.append(Resistor((c1*10+c2)*(10**c3),node(x0,y0),node(x1,y1)))
-        match = re.match(r'pot: \((\d+),(\d+)\)--\((\d+),(\d+)\)--\((\d+),(\d+)\)',line)
-        if match:
-            (x0,y0,x1,y1,x2,y2) = [int(x) for x in match.groups()]
+        elif kind=='pot':
+            ((x0,y0),(x1,y1),(x2,y2)) = line.points[:3]
             pots.append(Pot(5000.,node(x0,y0),node(x1,y1),node(x2,y2)))
-        match = re.match(r'head: \((\d+),(\d+)\)--\((\d+),(\d+)\)',line)
-        if match:
-            (x0,y0,x1,y1) = [int(x) for x in match.groups()]
+        elif kind=='head':
+            ((x0,y0),(x1,y1)) = line.points[:2]
             if x0 < x1:
                 pot = Pot(10000.,node(x0,y0),node(x0+1,y0),node(x0+2,y0))
 #                left = PhotoResistor(10000.,node(x0+3,y0),node(x0+4,y0))
@@ -452,130 +564,302 @@ def parseComponents(lines):
                 def fromHead(n):
                     pot.alpha = (head.theta/2./math.pi+0.5)%1.0
                 pot.AlphaSample = fromHead
-        match = re.match(r'motor: \((\d+),(\d+)\)--\((\d+),(\d+)\)',line)
-        if match:
-            (x0,y0,x1,y1) = [int(x) for x in match.groups()]
+        elif kind=='motor':
+            ((x0,y0),(x1,y1)) = line.points[:2]
             if x0 < x1:
                 motors.append(Head(node(x0+4,y0),node(x0+5,y0),None,None,None))
             else:
                 motors.append(Head(node(x0-4,y0),node(x0-5,y0),None,None,None))
-        match = re.match(r'robot: \((\d+),(\d+)\)--\((\d+),(\d+)\)',line)
-        if match:
-            (x0,y0,x1,y1) = [int(x) for x in match.groups()]
+        elif kind=='robot':
+            ((x0,y0),(x1,y1)) = line.points[:2]
             if x0 < x1:
                 vsources.append(VoltageSource(10,node(x0+1,y0)))
                 vsources.append(VoltageSource(0,node(x0+3,y0)))
             else:
                 vsources.append(VoltageSource(10,node(x0-1,y0)))
                 vsources.append(VoltageSource(0,node(x0-3,y0)))
-        match = re.match(r'\+10: \((\d+),(\d+)\)',line)
-        if match:
-            (x0,y0) = [int(x) for x in match.groups()]
+        elif kind=='+10':
+            (x0,y0) = line.points[0]
             vsources.append(VoltageSource(10,node(x0,y0)))
-        match = re.match(r'gnd: \((\d+),(\d+)\)',line)
-        if match:
-            (x0,y0) = [int(x) for x in match.groups()]
+        elif kind=='gnd':
+            (x0,y0) = line.points[0]
             vsources.append(VoltageSource(0,node(x0,y0)))
-        match = re.match(r'opamp: \((\d+),(\d+)\)--\((\d+),(\d+)\)',line)
-        if match:
-            (x0,y0,x1,y1) = [int(x) for x in match.groups()]
+        elif kind=='opamp':
+            ((x0,y0),(x1,y1)) = line.points[:2]
             if y0<y1:
                 opAmps.append(OpAmp(node(x0,y0),node(x0-1,y1),node(x0,y1),node(x0-1,y0),node(x0-3,y0)))
                 opAmps.append(OpAmp(node(x0-2,y0),node(x0-2,y1),node(x0-3,y1),node(x0-1,y0),node(x0-3,y0)))
             else:
                 opAmps.append(OpAmp(node(x0,y0),node(x0+1,y1),node(x0,y1),node(x0+1,y0),node(x0+3,y0)))
                 opAmps.append(OpAmp(node(x0+2,y0),node(x0+2,y1),node(x0+3,y1),node(x0+1,y0),node(x0+3,y0)))
-        match = re.match(r'\+probe: \((\d+),(\d+)\)',line)
-        if match:
-            (x0,y0) = [int(x) for x in match.groups()]
+        elif kind=='+probe':
+            (x0,y0) = line.points[0]
             probes.append(Probe(node(x0,y0),'+'))
-        match = re.match(r'\-probe: \((\d+),(\d+)\)',line)
-        if match:
-            (x0,y0) = [int(x) for x in match.groups()]
+        elif kind=='-probe':
+            (x0,y0) = line.points[0]
             probes.append(Probe(node(x0,y0),'-'))
     return (resistors,pots,motorPots,heads,motors,vsources,isources,opAmps,probes)
 
 def printComponents(lines):
+    lines = parse_netlist(lines)
+    nodes = makeNodes(lines)[0]
+    def node(x,y):
+        return nodes.get(pin(x,y))
     for line in lines:
-        match = re.match(r'wire: \((\d+),(\d+)\)--\((\d+),(\d+)\)',line)
-        if match:
-            (x0,y0,x1,y1) = [int(x) for x in match.groups()]
-            print 'Wire:',chr(97+node(x0,y0)),chr(97+node(x1,y1))
-        match = re.match(r'opamp: \((\d+),(\d+)\)--\((\d+),(\d+)\)',line)
-        if match:
-            (x0,y0,x1,y1) = [int(x) for x in match.groups()]
+        kind = line.kind
+        if kind=='wire':
+            ((x0,y0),(x1,y1)) = line.points[:2]
+            print 'Wire:',nodeName(node(x0,y0)),nodeName(node(x1,y1))
+        elif kind=='opamp':
+            ((x0,y0),(x1,y1)) = line.points[:2]
             if y0<y1:
-                print 'OpAmp:',chr(97+node(x0,y0)),chr(97+node(x0-1,y1)),chr(97+node(x0,y1)),chr(97+node(x0-1,y0)),chr(97+node(x0-3,y0))
-                print 'OpAmp:',chr(97+node(x0-2,y0)),chr(97+node(x0-2,y1)),chr(97+node(x0-3,y1)),chr(97+node(x0-1,y0)),chr(97+node(x0-3,y0))
+                print 'OpAmp:',nodeName(node(x0,y0)),nodeName(node(x0-1,y1)),nodeName(node(x0,y1)),nodeName(node(x0-1,y0)),nodeName(node(x0-3,y0))
+                print 'OpAmp:',nodeName(node(x0-2,y0)),nodeName(node(x0-2,y1)),nodeName(node(x0-3,y1)),nodeName(node(x0-1,y0)),nodeName(node(x0-3,y0))
             else:
-                print 'OpAmp:',chr(97+node(x0,y0)),chr(97+node(x0+1,y1)),chr(97+node(x0,y1)),chr(97+node(x0+1,y0)),chr(97+node(x0+3,y0))
-                print 'OpAmp:',chr(97+node(x0+2,y0)),chr(97+node(x0+2,y1)),chr(97+node(x0+3,y1)),chr(97+node(x0+1,y0)),chr(97+node(x0+3,y0))
-        match = re.match(r'resistor\((\d),(\d),(\d)\): \((\d+),(\d+)\)--\((\d+),(\d+)\)',line)
-        if match:
-            (c1,c2,c3,x0,y0,x1,y1) = [int(x) for x in match.groups()]
-            print 'Resistor ({0:d}):'.format((c1*10+c2)*(10**c3)),chr(97+node(x0,y0)),chr(97+node(x1,y1))
-        match = re.match(r'pot: \((\d+),(\d+)\)--\((\d+),(\d+)\)--\((\d+),(\d+)\)',line)
-        if match:
-            (x0,y0,x1,y1,x2,y2) = [int(x) for x in match.groups()]
-            print 'Pot:',chr(97+node(x0,y0)),chr(97+node(x1,y1)),chr(97+node(x2,y2))
-        match = re.match(r'robot: \((\d+),(\d+)\)--\((\d+),(\d+)\)',line)
-        if match:
-            (x0,y0,x1,y1) = [int(x) for x in match.groups()]
+                print 'OpAmp:',nodeName(node(x0,y0)),nodeName(node(x0+1,y1)),nodeName(node(x0,y1)),nodeName(node(x0+1,y0)),nodeName(node(x0+3,y0))
+                print 'OpAmp:',nodeName(node(x0+2,y0)),nodeName(node(x0+2,y1)),nodeName(node(x0+3,y1)),nodeName(node(x0+1,y0)),nodeName(node(x0+3,y0))
+        elif kind=='resistor':
+            (c1,c2,c3) = line.code
+            ((x0,y0),(x1,y1)) = line.points[:2]
+            print 'Resistor ({0:d}):'.format((c1*10+c2)*(10**c3)),nodeName(node(x0,y0)),nodeName(node(x1,y1))
+        elif kind=='pot':
+            ((x0,y0),(x1,y1),(x2,y2)) = line.points[:3]
+            print 'Pot:',nodeName(node(x0,y0)),nodeName(node(x1,y1)),nodeName(node(x2,y2))
+        elif kind=='robot':
+            ((x0,y0),(x1,y1)) = line.points[:2]
             if x0 < x1:
-                print 'Robot:',[chr(97+node(x0+i,y0)) for i in range(8)]
-                print 'Power:',chr(97+node(x0+1,y0))
-                print 'Ground:',chr(97+node(x0+3,y0))
+                print 'Robot:',[nodeName(node(x0+i,y0)) for i in range(8)]
+                print 'Power:',nodeName(node(x0+1,y0))
+                print 'Ground:',nodeName(node(x0+3,y0))
             else:
-                print 'Robot:',[chr(97+node(x0-i,y0)) for i in range(8)]
-                print 'Power:',chr(97+node(x0-1,y0))
-                print 'Ground:',chr(97+node(x0-3,y0))
-        match = re.match(r'motor: \((\d+),(\d+)\)--\((\d+),(\d+)\)',line)
-        if match:
-            (x0,y0,x1,y1) = [int(x) for x in match.groups()]
+                print 'Robot:',[nodeName(node(x0-i,y0)) for i in range(8)]
+                print 'Power:',nodeName(node(x0-1,y0))
+                print 'Ground:',nodeName(node(x0-3,y0))
+        elif kind=='motor':
+            ((x0,y0),(x1,y1)) = line.points[:2]
             if x0 < x1:
-                print 'Motor:',[chr(97+node(x0+i,y0)) for i in range(6)]
+                print 'Motor:',[nodeName(node(x0+i,y0)) for i in range(6)]
             else:
-                print 'Motor:',[chr(97+node(x0-i,y0)) for i in range(6)]
-        match = re.match(r'head: \((\d+),(\d+)\)--\((\d+),(\d+)\)',line)
-        if match:
-            (x0,y0,x1,y1) = [int(x) for x in match.groups()]
+                print 'Motor:',[nodeName(node(x0-i,y0)) for i in range(6)]
+        elif kind=='head':
+            ((x0,y0),(x1,y1)) = line.points[:2]
             if x0 < x1:
-                print 'Head:',[chr(97+node(x0+i,y0)) for i in range(8)]
+                print 'Head:',[nodeName(node(x0+i,y0)) for i in range(8)]
             else:
-                print 'Head:',[chr(97+node(x0-i,y0)) for i in range(8)]
-        match = re.match(r'\+probe: \((\d+),(\d+)\)',line)
-        if match:
-            (x0,y0) = [int(x) for x in match.groups()]
-            print '+Probe:',chr(97+node(x0,y0))
-        match = re.match(r'\-probe: \((\d+),(\d+)\)',line)
-        if match:
-            (x0,y0) = [int(x) for x in match.groups()]
-            print '-Probe:',chr(97+node(x0,y0))
-        match = re.match(r'\+10: \((\d+),(\d+)\)',line)
-        if match:
-            (x0,y0) = [int(x) for x in match.groups()]
-            print 'Power:',chr(97+node(x0,y0))
-        match = re.match(r'gnd: \((\d+),(\d+)\)',line)
-        if match:
-            (x0,y0) = [int(x) for x in match.groups()]
-            print 'Ground:',chr(97+node(x0,y0))
-
-class NonexistentPart(Exception):
-    def __init__(self,value):
-        self.value = value
-    def __str__(self):
-        return repr(self.value)
+                print 'Head:',[nodeName(node(x0-i,y0)) for i in range(8)]
+        elif kind=='+probe':
+            (x0,y0) = line.points[0]
+            print '+Probe:',nodeName(node(x0,y0))
+        elif kind=='-probe':
+            (x0,y0) = line.points[0]
+            print '-Probe:',nodeName(node(x0,y0))
+        elif kind=='+10':
+            (x0,y0) = line.points[0]
+            print 'Power:',nodeName(node(x0,y0))
+        elif kind=='gnd':
+            (x0,y0) = line.points[0]
+            print 'Ground:',nodeName(node(x0,y0))
+
+class NonexistentPart(SimulationError):
+    pass
+
+def opAmpSensitivities(nodalSolver,opAmps,N):
+    # N x m matrix, column k holds the node voltages when the output of op amp
+    # k is at 1V and every other source (and op amp output) is at 0V
+    unit = zeros((N,len(opAmps)))
+    for (k,o) in enumerate(opAmps):
+        unit[o.vO,k] = 1.
+    return nodalSolver.solve(unit,zeros(unit.shape))
+
+def solveOpAmps(nodalSolver,sensitivities,opAmps,state,vArray,iArray):
+    # Modified nodal analysis with every op amp a VCVS of gain K, clipped to
+    # its rails. The node voltages are linear in the op amp outputs x,
+    # v = v0 + S x, leaving m equations in x that are linear once it is known
+    # which op amps are clipped. |state| (0 linear, 1 at the positive rail, -1
+    # at the negative rail) is updated in place by piecewise-linear Newton
+    # steps, starting from the previous time step's state, until it no longer
+    # changes. Returns the node voltages, the number of linear solves, and
+    # whether the states settled within the iteration limit (if not, the
+    # voltages are the last iterate and do not satisfy the op amp equations).
+    m = len(opAmps)
+    vArray = array(vArray,dtype=float)
+    for o in opAmps:
+        vArray[o.vO] = 0.
+    v0 = nodalSolver.solve(vArray,iArray)
+    if m==0:
+        return (v0.tolist(),1,True)
+    S = sensitivities
+    converged = False
+    for iteration in range(2*m+2):
+        A = eye(m)
+        b = zeros(m)
+        for (k,o) in enumerate(opAmps):
+            if state[k]==0:
+                A[k] -= o.K*(S[o.vP]-S[o.vM])
+                b[k] = o.K*(v0[o.vP]-v0[o.vM])
+            else:
+                rail = o.pP if state[k]==1 else o.pM
+                A[k] -= S[rail]
+                b[k] = v0[rail]
+        try:
+            v = v0+dot(S,linalg.solve(A,b))
+        except LinAlgError:
+            raise SingularMatrix('Op amp outputs cannot be solved for')
+        changed = False
+        for (k,o) in enumerate(opAmps):
+            target = o.K*(v[o.vP]-v[o.vM])
+            newState = 1 if target>v[o.pP] else -1 if target<v[o.pM] else 0
+            if newState!=state[k]:
+                state[k] = newState
+                changed = True
+        if not changed:
+            converged = True
+            break
+    return (v.tolist(),iteration+2,converged)
+
+def formatSignal(title,samples):
+    return str(title)+':'+''.join('{0:6.2f}'.format(s) for s in samples)
+
+def solve(lines,potAlphaSignals,lampAngleSignals,lampDistanceSignals,potLabels,lampLabels,headMotorLabels,motorLabels,nSamples=100,deltaT=0.02,solver=SOLVER_RELAXATION,instrument=False,integrator=INTEGRATOR_EULER,seed=None,deterministic=False):
+    # Simulates the netlist |lines| and returns a SimulationResult. Safe to call
+    # from several threads at once. On failure raises a SimulationError that
+    # carries the diagnostics collected up to that point. With
+    # |instrument|, result.stats is a Simulation_Stats for the run. Motors and
+    # heads are stepped with the given |integrator|. The op amps of the
+    # relaxation solver start from random outputs, drawn as given by |seed| and
+    # |deterministic| (see makeRandom), so that runs can be reproduced exactly.
+    result = SimulationResult(nSamples,deltaT)
+    if instrument:
+        result.stats = Simulation_Stats(solver)
+    try:
+        runSimulation(result,lines,potAlphaSignals,lampAngleSignals,lampDistanceSignals,potLabels,lampLabels,headMotorLabels,motorLabels,nSamples,deltaT,solver,integrator,makeRandom(seed,deterministic))
+    except SimulationError, e:
+        failed(result,e)
+        raise
+    return result
+
+def failed(result,e):
+    # attaches the diagnostics of |result| to the SimulationError |e|
+    result.log.error(e.value)
+    e.log = result.log
+    e.messages = result.log.messages(LOG_WARNING)
+
+class SimulationStream:
+    # Simulates like solve(), but yields the samples one at a time as they are
+    # computed instead of keeping them, so that long simulations run in
+    # bounded memory. Each sample is (voltages,probes,motors): the voltage of
+    # each node, the +probe - -probe difference of each probe pair, and the
+    # (angle,velocity) of each motor, in the order of self.motorLabels. The
+    # circuit is set up (and may raise a SimulationError) when the stream is
+    # made. self.result holds the node names, diagnostics, and stats, but no
+    # traces.
+    def __init__(self,lines,potAlphaSignals,lampAngleSignals,lampDistanceSignals,potLabels,lampLabels,headMotorLabels,motorLabels,nSamples=100,deltaT=0.02,solver=SOLVER_RELAXATION,instrument=False,integrator=INTEGRATOR_EULER,seed=None,deterministic=False):
+        self.result = SimulationResult(nSamples,deltaT)
+        if instrument:
+            self.result.stats = Simulation_Stats(solver)
+        self.motorLabels = headMotorLabels+motorLabels
+        self._samples = simulateSamples(self.result,lines,potAlphaSignals,lampAngleSignals,lampDistanceSignals,potLabels,lampLabels,headMotorLabels,motorLabels,nSamples,deltaT,solver,integrator,makeRandom(seed,deterministic))
+        self.numProbes = self._next()
+    def _next(self):
+        try:
+            return self._samples.next()
+        except SimulationError, e:
+            failed(self.result,e)
+            raise
+    def __iter__(self):
+        while True:
+            try:
+                (vArray,probeValues,motorValues,iterations,converged) = self._next()
+            except StopIteration:
+                return
+            yield (vArray,probeValues,motorValues)
+
+def runSimulation(result,lines,potAlphaSignals,lampAngleSignals,lampDistanceSignals,potLabels,lampLabels,headMotorLabels,motorLabels,nSamples,deltaT,solver,integrator,rng):
+    samples = simulateSamples(result,lines,potAlphaSignals,lampAngleSignals,lampDistanceSignals,potLabels,lampLabels,headMotorLabels,motorLabels,nSamples,deltaT,solver,integrator,rng)
+    result.probes = [[] for i in range(samples.next())]
+    motorTraces = [([],[]) for label in headMotorLabels+motorLabels]
+    for (vArray,probeValues,motorValues,iterations,converged) in samples:
+        result.voltages.append(vArray)
+        result.iterations.append(iterations)
+        result.converged.append(converged)
+        for (trace,value) in zip(result.probes,probeValues):
+            trace.append(value)
+        for ((thetas,omegas),(theta,omega)) in zip(motorTraces,motorValues):
+            thetas.append(theta)
+            omegas.append(omega)
+
+    def myPlot(samps,title,y0,y1):
+        result.signals.append((title,samps,y0,y1))
+        result.log.debug(formatSignal,title,samps)
 
-def solve(lines,potAlphaSignals,lampAngleSignals,lampDistanceSignals,potLabels,lampLabels,headMotorLabels,motorLabels,nSamples=100,deltaT=0.02):
-    global nodes,N
-    def makeGMatrix():
-        gMatrix = [[0.0 for x in range(N)] for y in range(N)]
-        for c in resistors+pots+motorPots+heads+motors+probes+opAmps+vsources+isources:
+    w = 0
+    for diff in result.probes:
+        myPlot(diff,'probe',0,.01)
+        w += 1
+    for (label,(thetas,omegas)) in zip(headMotorLabels+motorLabels,motorTraces):
+      result.motors[label] = (thetas,omegas)
+      myPlot(thetas,'Motor %s Angle' % label,0,0)
+      myPlot(omegas,'Motor %s Velocity' % label,0,0)
+      w += 1
+    #for h in heads+motors:
+    #    myPlot(ListSignal(h.thetaOutput),'Motor Angle',0,0)
+    #    myPlot(ListSignal(h.omegaOutput),'Motor Velocity',0,0)
+    #    w += 1
+    for i, label in enumerate(lampLabels):
+      if label:
+        myPlot(sampleArray(lampDistanceSignals[i],nSamples), 'Lamp %s Distance Signal' % label, 0, 1)
+        myPlot(sampleArray(lampAngleSignals[i],nSamples), 'Lamp %s Angle Signal' % label, -1./8, 1./8)
+        w += 2
+    #if lampDistanceSignal:
+    #    myPlot(lampDistanceSignal,'Lamp Distance Signal',0,1)
+    #    w += 1
+    #if lampAngleSignal:
+    #    myPlot(lampAngleSignal,'Lamp Angle Signal',-1./8.,1./8.)
+    #    w += 1
+    for i, label in enumerate(potLabels):
+      myPlot(sampleArray(potAlphaSignals[i],nSamples), 'Pot %s Alpha Signal' % label, 0, 1)
+      w += 1
+    #if potAlphaSignal:
+    #    myPlot(potAlphaSignal,'Pot Alpha Signal',0,1)
+    #    w += 1
+    #elif len(pots)>0:
+    #    myPlot(ListSignal([pots[0].alphaSample(n) for n in range(nSamples)]),'Pot Alpha Signal',0,1)
+    #    w += 1
+    if w==0:
+        result.warn('No output signals are specified. Do you want to add a Probe?')
+    if result.stats:
+        result.stats.lap(PHASE_OUTPUT)
+
+def simulateSamples(result,lines,potAlphaSignals,lampAngleSignals,lampDistanceSignals,potLabels,lampLabels,headMotorLabels,motorLabels,nSamples,deltaT,solver,integrator,rng):
+    # Generator that sets up the circuit, yields the number of probe pairs, and
+    # then yields (voltages,probes,motors,iterations,converged) for each
+    # sample, see SimulationStream. Only the previous sample is kept.
+    log = result.log
+    warn = log.warning
+    stats = result.stats
+    lap = stats.lap if stats else lambda phase: None
+    assert solver in (SOLVER_DIRECT, SOLVER_RELAXATION, SOLVER_SOR), 'Unknown solver %s' % solver
+    assert integrator in (INTEGRATOR_EULER, INTEGRATOR_RK4), 'Unknown integrator %s' % integrator
+    def makeGMatrix(parts=None):
+        # sparse for large circuits with the direct solver
+        if sparse:
+            gMatrix = Stamps()
+        elif solver != SOLVER_RELAXATION:
+            gMatrix = zeros((N,N))
+        else:
+            gMatrix = [[0.0 for x in range(N)] for y in range(N)]
+        if parts is None:
+            parts = resistors+pots+motorPots+heads+motors+probes+opAmps+vsources+isources
+        for c in parts:
                 if c.connected():
                     c.addConductance(gMatrix)
-        return gMatrix
-    def makeVoltages():
-        vArray = [0.0 for i in range(N)]
+        return gMatrix.matrix(N) if sparse else gMatrix
+    def dynamicBranches():
+        # conductances that change from one time step to the next
+        return [b for p in pots+motorPots if p.connected() for b in p.branches()]
+    def makeVoltages(previous=None):
+        # previous: solution of the last time step, used as the initial guess
+        vArray = previous[:] if previous else [0.0 for i in range(N)]
         vKnown = [False for i in range(N)]
         iArray = [0.0 for i in range(N)]
         for c in vsources:
@@ -583,40 +867,59 @@ def solve(lines,potAlphaSignals,lampAngleSignals,lampDistanceSignals,potLabels,l
         for c in isources:
             c.setCurrent(iArray)
         for c in opAmps:
-            c.initial(vArray,vKnown)
+            c.initial(vArray,vKnown,previous is not None)
         return (vArray,vKnown,iArray)
+    def instrumentSample(gMatrix,vArray,vKnown,iArray,iterations,converged):
+        # KCL residual at the free nodes, and whether each op amp is clipped
+        # (by the same test as solveOpAmps)
+        v = array(vArray)
+        free = logical_not(vKnown)
+        current = gMatrix*v if sparse else dot(array(gMatrix),v)
+        residual = abs(current+iArray)[free].max() if free.any() else 0.
+        stats.record_sample(iterations,converged,float(residual))
+        for (k,o) in enumerate(opAmps):
+            target = o.K*(v[o.vP]-v[o.vM])
+            if target>v[o.pP]:
+                stats.record_op_amp(k,SATURATION_POSITIVE)
+            elif target<v[o.pM]:
+                stats.record_op_amp(k,SATURATION_NEGATIVE)
+            else:
+                stats.record_op_amp(k,SATURATION_LINEAR)
 
-    (nodes,N) = makeNodes(lines)
-    (resistors,pots,motorPots,heads,motors,vsources,isources,opAmps,probes) = parseComponents(lines)
+    lines = parse_netlist(lines)
+    (nodes,N,nodePins) = makeNodes(lines)
+    sparse = solver==SOLVER_DIRECT and N>=SPARSE_MIN_NODES
+    (resistors,pots,motorPots,heads,motors,vsources,isources,opAmps,probes) = parseComponents(lines,nodes)
+    for o in opAmps:
+        o.rng = rng
+    result.nodeNames = [nodeName(i) for i in range(N)]
+    result.nodePins = nodePins
 
     assert len(pots) == len(potAlphaSignals) == len(potLabels)
     assert len(heads) == len(lampAngleSignals) == len(
         lampDistanceSignals) == len(lampLabels) == len(headMotorLabels)
     assert len(motors) == len(motorLabels)
 
-    nodePins = []
     for i in range(N):
-        msg = ''
-        if nodes[201]==i: msg += ' top-'
-        if nodes[202]==i: msg += ' top+'
-        if nodes[203]==i: msg += ' bottom-'
-        if nodes[204]==i: msg += ' bottom+'
-        for c in range(1,64):
-            if nodes[300+c]==i: msg += ' '+str(c)+'J'
-            if nodes[400+c]==i: msg += ' '+str(c)+'A'
-        nodePins.append(msg)
+        log.debug('node %s:%s',nodeName(i),nodePins[i])
+    for c in resistors+pots+motorPots+heads+motors+vsources+isources+opAmps+probes:
+        log.debug('%s',c)
+    if stats:
+        stats.num_nodes = N
 
-    for i in range(N):
-        warn('node '+chr(97+i)+':'+nodePins[i])
-    for c in resistors: warn(str(c))
-    for c in pots: warn(str(c))
-    for c in motorPots: warn(str(c))
-    for c in heads: warn(str(c))
-    for c in motors: warn(str(c))
-    for c in vsources: warn(str(c))
-    for c in isources: warn(str(c))
-    for c in opAmps: warn(str(c))
-    for c in probes: warn(str(c))
+    (floating,islands) = findIslands(N,resistors+pots+motorPots+heads+motors+probes+opAmps+vsources+isources)
+    for i in floating:
+        warn('Floating node at{0:s} must be connected - it is possible you have not connected the inputs of an opamp.'.format(nodePins[i]))
+    if floating:
+        raise SingularMatrix('Floating nodes must be connected')
+    opAmpInputs = set([o.vP for o in opAmps]+[o.vM for o in opAmps])
+    for island in islands:
+        # the voltages of the island are only known relative to each other,
+        #     hold its first node at 0V so that the rest can be solved for,
+        #     which only matters to the rest of the circuit through op amps
+        log.log(LOG_WARNING if opAmpInputs.intersection(island) else LOG_INFO,'Nodes at%s are not connected to ground or to a source - it is possible they are only connected to the inputs of an opamp. Holding the node at%s at 0V.',''.join([nodePins[i] for i in island]),nodePins[island[0]])
+        vsources.append(VoltageSource(0,island[0]))
+    lap(PHASE_PARSE)
 
     for h in heads:
         h.phi = h.lampAngleSample(0)*2.*math.pi
@@ -626,19 +929,29 @@ def solve(lines,potAlphaSignals,lampAngleSignals,lampDistanceSignals,potLabels,l
         h.updatePot()
     for p in pots:
         p.alpha = p.alphaSample(0)
-    gMatrix = makeGMatrix()
     (vArray,vKnown,iArray) = makeVoltages()
 
-    j = 0
-    for i in range(N):
-        if gMatrix[i][i]==0.0:
-            warn('Floating node at{0:s} must be connected - it is possible you have not connected the inputs of an opamp.'.format(nodePins[i]))
-            j += 1
-    if j>0:
-        raise SingularMatrix('Floating nodes must be connected')
+    if solver != SOLVER_RELAXATION:
+        # only the pots change between time steps, factorize the static stamps
+        #     once and let the solver apply the pot changes as low-rank updates
+        #     (the SOR solver iterates on the updated matrix instead)
+        branches = dynamicBranches()
+        try:
+            nodalSolver = (SOR_Solver if solver == SOLVER_SOR else Sparse_Solver if sparse else Nodal_Solver)(makeGMatrix(resistors+heads+motors+probes+opAmps+vsources+isources),vKnown,[(n1,n2) for (n1,n2,g) in branches],[g for (n1,n2,g) in branches])
+        except Exception:
+            warn('Singular circuit - check for parts of the circuit that are only connected through opamp inputs.')
+            raise SingularMatrix('Singular conductance matrix')
+
+        # op amp outputs are solved for separately, see solveOpAmps, with
+        #     their sensitivities cached for the conductances they were
+        #     computed for
+        cache = {'sensitivities':None,'conductances':None,'gMatrix':None}
+        opAmpState = [0 for o in opAmps]
+    lap(PHASE_ASSEMBLE)
 
+    # input signals are sampled ahead of the time step loop
     for i, pot in enumerate(pots):
-      pot.alphaSample = potAlphaSignals[i].sample
+      pot.alphaSamples = sampleArray(potAlphaSignals[i],nSamples)
 
     #if potAlphaSignal:
     #    if len(pots)<1:
@@ -652,8 +965,8 @@ def solve(lines,potAlphaSignals,lampAngleSignals,lampDistanceSignals,potLabels,l
     #        warn(warning)
 
     for i, head in enumerate(heads):
-      head.lampAngleSample = lampAngleSignals[i].sample
-      head.lampDistanceSample = lampDistanceSignals[i].sample
+      head.lampAngleSamples = sampleArray(lampAngleSignals[i],nSamples)
+      head.lampDistanceSamples = sampleArray(lampDistanceSignals[i],nSamples)
 
     #if lampAngleSignal:
     #    if len(heads)<1:
@@ -676,22 +989,29 @@ def solve(lines,potAlphaSignals,lampAngleSignals,lampDistanceSignals,potLabels,l
     #            warning += '{0:5.2f}'.format(lampDistanceSignal.sample(n))
     #        warn(warning)
 
-    for h in heads+motors:
-        h.thetaOutput = []
-        h.omegaOutput = []
-    for p in probes:
-        p.outputs = []
-    for n in range(nSamples):
-        for h in heads:
-            h.phi = h.lampAngleSample(n)*2.*math.pi
-            h.distance = h.lampDistanceSample(n)
-#            h.updatePhotoResistors()
-            h.updatePhotoDiodes()
-            h.updatePot()
-        for p in pots:
-            p.alpha = p.alphaSample(n)
-        gMatrix = makeGMatrix()
-        (vArray,vKnown,iArray) = makeVoltages()
+    pos = [p for p in probes if p.sign=='+']
+    neg = [p for p in probes if p.sign!='+']
+    pairs = zip(pos,neg)
+    yield len(pairs)
+
+    def solveCircuit(previous):
+        # solves the circuit in its current state, starting from the solution
+        # |previous|, returns (vArray,vKnown,iArray,gMatrix,iterations,converged)
+        if solver != SOLVER_RELAXATION:
+            if solver == SOLVER_SOR:
+                (sweeps,failures) = (nodalSolver.sweeps,nodalSolver.unconverged)
+            conductances = [g for (n1,n2,g) in dynamicBranches()]
+            if cache['sensitivities'] is None or conductances!=cache['conductances']:
+                nodalSolver.set_conductances(conductances)
+                cache['sensitivities'] = opAmpSensitivities(nodalSolver,opAmps,N)
+                cache['conductances'] = conductances
+                if stats:
+                    cache['gMatrix'] = makeGMatrix()
+            gMatrix = cache['gMatrix']
+        else:
+            gMatrix = makeGMatrix()
+        (vArray,vKnown,iArray) = makeVoltages(previous)
+        lap(PHASE_ASSEMBLE)
 
 #        print '---'
 #        for i in range(N):
@@ -703,97 +1023,119 @@ def solve(lines,potAlphaSignals,lampAngleSignals,lampDistanceSignals,potLabels,l
 #                    print 'gMatrix[{0:d}][{1:d}]={2:f}'.format(i,j,gMatrix[i][j])
 #        exit()
 
-        for o in opAmps:
-            gain = 0
-            if not vKnown[o.vP]:
-                gain += gMatrix[o.vP][o.vO]/gMatrix[o.vP][o.vP]
-            if not vKnown[o.vM]:
-                gain -= gMatrix[o.vM][o.vO]/gMatrix[o.vM][o.vM]
-            if gain!=0:
-                o.alpha = 1./gain/o.K
-            else:
-                o.alpha = 1./o.K
-        vArray0 = vArray[:]
-        for j in range(1000):
-            for nn in range(N):
-                if not vKnown[nn]:
-                    vArray[nn] = 0
-                    vArray[nn] = (-iArray[nn]-sum([gMatrix[nn][k]*vArray[k] for k in range(N)]))/gMatrix[nn][nn]
-            for c in opAmps:
-                c.update(vArray,vKnown)
-            if j%10==0:
-                error = math.sqrt(sum([(vArray[i]-vArray0[i])**2 for i in range(len(vArray))])/len(vArray))
-                if error<max([abs(v) for v in vArray])/1000.:
-                    break
-                vArray0 = vArray[:]
-#        print j,error
-        for h in heads+motors:
-            h.update(vArray,deltaT)
-            h.thetaOutput.append(h.theta)
-            h.omegaOutput.append(h.omega)
-        for p in probes:
-            p.outputs.append(vArray[p.n1])
-    pos = []
-    neg = []
-    for p in probes:
-        if p.sign=='+':
-            pos.append(p)
+        if solver != SOLVER_RELAXATION:
+            (vArray,iterations,converged) = solveOpAmps(nodalSolver,cache['sensitivities'],opAmps,opAmpState,vArray,iArray)
+            if solver == SOLVER_SOR:
+                iterations = nodalSolver.sweeps-sweeps
+                converged = converged and nodalSolver.unconverged==failures
         else:
-            neg.append(p)
-
-    def myPlot(s,title,y0,y1):
-        if nSamples>1:
-            samps = [s.sample(x) for x in xrange(nSamples)]
-            yy0 = min(samps)
-            yy1 = max(samps)
-            if float(yy1-y0)/float(y1-y0+.001)>0.9:
-                y1 = yy1
-            if float(y1-yy0)/float(y1-y0+.001)>0.9:
-                y0 = yy0
-            p = PlotWindow(title)
-            p.stem(range(nSamples),samps)
-            p.axis([0,nSamples,y0,y1])
-            add_window(p)
-        warning = str(title)+':'
-        for nn in range(nSamples):
-            warning += '{0:6.2f}'.format(s.sample(nn))
-        warn(warning)
+            for o in opAmps:
+                gain = 0
+                if not vKnown[o.vP]:
+                    gain += gMatrix[o.vP][o.vO]/gMatrix[o.vP][o.vP]
+                if not vKnown[o.vM]:
+                    gain -= gMatrix[o.vM][o.vO]/gMatrix[o.vM][o.vM]
+                if gain!=0:
+                    o.alpha = 1./gain/o.K
+                else:
+                    o.alpha = 1./o.K
+            vArray0 = vArray[:]
+            converged = False
+            for j in range(1000):
+                for nn in range(N):
+                    if not vKnown[nn]:
+                        vArray[nn] = 0
+                        vArray[nn] = (-iArray[nn]-sum([gMatrix[nn][k]*vArray[k] for k in range(N)]))/gMatrix[nn][nn]
+                for c in opAmps:
+                    c.update(vArray,vKnown)
+                # every 10 sweeps, the first a full 10 after the (warm) start
+                if j%10==9:
+                    error = math.sqrt(sum([(vArray[i]-vArray0[i])**2 for i in range(len(vArray))])/len(vArray))
+                    if error<max([abs(v) for v in vArray])/1000.:
+                        converged = True
+                        break
+                    vArray0 = vArray[:]
+#            print j,error
+            iterations = j+1
+        lap(PHASE_SOLVE)
+        return (vArray,vKnown,iArray,gMatrix,iterations,converged)
+    def rk4Step(v0):
+        # Classical Runge-Kutta step of the heads and motors from the solution
+        # |v0|. The circuit is solved again at every stage when there are heads,
+        # since their angles feed back through their photodiodes and pots.
+        # Returns the iterations of those solves, and whether they converged.
+        mechanics = heads+motors
+        states = [(h.theta,h.omega) for h in mechanics]
+        ks = [[h.derivatives(v0) for h in mechanics]]
+        (iterations,converged) = (0,True)
+        v = v0
+        for c in (deltaT/2.,deltaT/2.,deltaT):
+            for (h,(theta,omega),(thetaDot,omegaDot)) in zip(mechanics,states,ks[-1]):
+                h.theta = theta+c*thetaDot
+                h.omega = omega+c*omegaDot
+            if heads:
+                for h in heads:
+                    h.updatePhotoDiodes()
+                    h.updatePot()
+                (v,vKnown,iArray,gMatrix,stageIterations,stageConverged) = solveCircuit(v)
+                iterations += stageIterations
+                converged = converged and stageConverged
+            ks.append([h.derivatives(v) for h in mechanics])
+        for (h,(theta,omega),k1,k2,k3,k4) in zip(mechanics,states,*ks):
+            h.theta = theta+deltaT/6.*(k1[0]+2*k2[0]+2*k3[0]+k4[0])
+            h.omega = omega+deltaT/6.*(k1[1]+2*k2[1]+2*k3[1]+k4[1])
+        return (iterations,converged)
 
-    w = 0
-    for i in range(min(len(pos),len(neg))):
-        myPlot(sig.ListSignal([a-b for (a,b) in zip(pos[i].outputs,neg[i].outputs)]),'probe',0,.01)
-        w += 1
-    for i, label in enumerate(headMotorLabels):
-      myPlot(sig.ListSignal(heads[i].thetaOutput),'Motor %s Angle' % label,0,0)
-      myPlot(sig.ListSignal(heads[i].omegaOutput),'Motor %s Velocity' % label,0,0)
-      w += 1
-    for i, label in enumerate(motorLabels):
-      myPlot(sig.ListSignal(motors[i].thetaOutput),'Motor %s Angle' % label,0,0)
-      myPlot(sig.ListSignal(motors[i].omegaOutput),'Motor %s Velocity' % label,0,0)
-      w += 1
-    #for h in heads+motors:
-    #    myPlot(sig.ListSignal(h.thetaOutput),'Motor Angle',0,0)
-    #    myPlot(sig.ListSignal(h.omegaOutput),'Motor Velocity',0,0)
-    #    w += 1
-    for i, label in enumerate(lampLabels):
-      if label:
-        myPlot(lampDistanceSignals[i], 'Lamp %s Distance Signal' % label, 0, 1)
-        myPlot(lampAngleSignals[i], 'Lamp %s Angle Signal' % label, -1./8, 1./8)
-        w += 2
-    #if lampDistanceSignal:
-    #    myPlot(lampDistanceSignal,'Lamp Distance Signal',0,1)
-    #    w += 1
-    #if lampAngleSignal:
-    #    myPlot(lampAngleSignal,'Lamp Angle Signal',-1./8.,1./8.)
-    #    w += 1
-    for i, label in enumerate(potLabels):
-      myPlot(potAlphaSignals[i], 'Pot %s Alpha Signal' % label, 0, 1)
-      w += 1
-    #if potAlphaSignal:
-    #    myPlot(potAlphaSignal,'Pot Alpha Signal',0,1)
-    #    w += 1
-    #elif len(pots)>0:
-    #    myPlot(sig.ListSignal([pots[0].alphaSample(n) for n in range(nSamples)]),'Pot Alpha Signal',0,1)
-    #    w += 1
-    if w==0:
-        warn('No output signals are specified. Do you want to add a Probe?')
+    # without motors or heads nothing is carried from one sample to the next
+    #     (barring relaxed op amps, which start from random outputs) but the
+    #     clip state of the op amps, which the op amp solve starts from (so
+    #     that e.g. Schmitt triggers keep their hysteresis), so the solution
+    #     only depends on the pots and that state, and is kept for each of
+    #     their settings along with the state it leaves the op amps in; the
+    #     conductance matrix is only kept when it is instrumented
+    memoryless = not heads and not motors and not (opAmps and solver==SOLVER_RELAXATION)
+    solutions = {}
+    maxSolutions = SOLUTION_CACHE_VALUES//max(1,3*N+(N*N if stats else 0))
+    previous = None
+    unconverged = 0
+    for n in range(nSamples):
+        for h in heads:
+            h.phi = h.lampAngleSamples[n]*2.*math.pi
+            h.distance = h.lampDistanceSamples[n]
+#            h.updatePhotoResistors()
+            h.updatePhotoDiodes()
+            h.updatePot()
+        for p in pots:
+            p.alpha = p.alphaSamples[n]
+        if memoryless:
+            key = tuple([p.alpha for p in pots]+(opAmpState if opAmps else []))
+        if memoryless and key in solutions:
+            (vArray,vKnown,iArray,gMatrix,converged,state) = solutions[key]
+            vArray = vArray[:]
+            if opAmps:
+                opAmpState[:] = state
+            iterations = 0
+            lap(PHASE_SOLVE)
+        else:
+            (vArray,vKnown,iArray,gMatrix,iterations,converged) = solveCircuit(previous)
+            if memoryless and len(solutions)<maxSolutions:
+                solutions[key] = (vArray[:],vKnown,iArray,gMatrix if stats else None,converged,opAmpState[:] if opAmps else None)
+        if stats:
+            instrumentSample(gMatrix,vArray,vKnown,iArray,iterations,converged)
+            lap(PHASE_INSTRUMENT)
+        if integrator == INTEGRATOR_RK4:
+            (stageIterations,stagesConverged) = rk4Step(vArray)
+            iterations += stageIterations
+            converged = converged and stagesConverged
+        else:
+            for h in heads+motors:
+                h.update(vArray,deltaT)
+        if not converged:
+            if not unconverged:
+                firstUnconverged = n
+            unconverged += 1
+        previous = vArray
+        lap(PHASE_UPDATE)
+        yield (vArray,[vArray[p.n1]-vArray[m.n1] for (p,m) in pairs],[(h.theta,h.omega) for h in heads+motors],iterations,converged)
+    if unconverged:
+        warn('Solver did not converge at {0:d} of {1:d} samples, first at sample {2:d}'.format(unconverged,nSamples,firstUnconverged))
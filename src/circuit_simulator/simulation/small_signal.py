@@ -0,0 +1,262 @@
+"""
+DC operating point and small-signal AC analysis of CMax netlists.
+The operating point is the solution of the modified nodal system assembled from
+    the simulator's part stamps for one setting of the pots, lamps and head
+    angles, with op amps clipped to their rails as in sweep.py. It takes one
+    solve, where reading the steady state off a transient takes many.
+The parts of these circuits are all resistive, so the frequency response of a
+    circuit comes from its motors and heads: the angle of each one follows the
+    voltage across it through J s^2 + (B + Kt Kb / R) s, and the angle of each
+    head feeds back into the circuit through its pot and photodiodes. The AC
+    analysis linearizes the pots, photodiodes and op amps about the operating
+    point (the first two with central differences of the simulator's own part
+    models), and solves the resulting complex system for every frequency at
+    once in a single batched NumPy call.
+"""
+
+__author__ = 'mikemeko@mit.edu (Michael Mekonnen)'
+
+from constants import INPUT_LAMP_ANGLE
+from constants import INPUT_LAMP_DISTANCE
+from constants import INPUT_POT_ALPHA
+from constants import SATURATION_LINEAR
+from constants import SATURATION_NEGATIVE
+from constants import SATURATION_POSITIVE
+from constants import SMALL_SIGNAL_STEP
+from math import pi
+from numpy import array
+from numpy import empty
+from numpy import hstack
+from numpy import newaxis
+from numpy import zeros
+from numpy.linalg import LinAlgError
+from numpy.linalg import solve
+from simulate import NonexistentPart
+from simulate import SingularMatrix
+from sweep import connected_parts
+from sweep import constrain
+from sweep import probe_voltages
+from sweep import solve_systems
+
+class Operating_Point:
+  """
+  DC operating point of a circuit.
+  """
+  def __init__(self, voltages, probes, op_amp_states, speeds):
+    """
+    |voltages|: NumPy array of the voltage of each node.
+    |probes|: NumPy array of the voltage across each pair of (+probe, -probe).
+    |op_amp_states|: SATURATION_LINEAR, SATURATION_POSITIVE, or
+        SATURATION_NEGATIVE for each op amp.
+    |speeds|: the speed (rad/s) that each head, then each motor, settles to
+        with the voltage across it held at the operating point.
+    """
+    self.voltages = voltages
+    self.probes = probes
+    self.op_amp_states = op_amp_states
+    self.speeds = speeds
+
+def _set_inputs(pots, heads, pot_alphas, lamp_angles, lamp_distances,
+    head_angles):
+  """
+  Sets the alpha of each of the |pots|, and the lamp angle (in turns, as in the
+      simulator's lamp signals), lamp distance and angle of each of the
+      |heads|. Parameters given as None keep the simulator's initial values.
+  """
+  for values, parts in ((pot_alphas, pots), (lamp_angles, heads),
+      (lamp_distances, heads), (head_angles, heads)):
+    assert values is None or len(values) == len(parts), (
+        'need one value per part')
+  for i, pot in enumerate(pots):
+    if pot_alphas is not None:
+      pot.alpha = pot_alphas[i]
+  for i, head in enumerate(heads):
+    if lamp_angles is not None:
+      head.phi = lamp_angles[i] * 2 * pi
+    if lamp_distances is not None:
+      head.distance = lamp_distances[i]
+    if head_angles is not None:
+      head.theta = head_angles[i]
+  _update_heads(heads)
+
+def _update_heads(heads):
+  """
+  Updates the photodiodes and pots of the |heads| for their current lamps and
+      angles.
+  """
+  for head in heads:
+    head.updatePhotoDiodes()
+    head.updatePot()
+
+def _op_amp_states(voltages, op_amps):
+  """
+  Returns the state of each of the |op_amps| at the node |voltages|: 0 linear,
+      1 clipped to the positive rail, -1 clipped to the negative rail.
+  """
+  states = []
+  for c in op_amps:
+    target = c.K * (voltages[c.vP] - voltages[c.vM])
+    states.append(1 if target > voltages[c.pP] else -1 if target < voltages[
+        c.pM] else 0)
+  return states
+
+def _solve_operating_point(parts):
+  """
+  Solves the circuit made up of the given |parts| (see sweep.connected_parts)
+      in its current state. Returns the conductance matrix of its parts, and
+      the node voltages.
+  """
+  (n, resistors, pots, motor_pots, heads, motors, vsources, isources, op_amps,
+      probes) = parts
+  g_stack = zeros((1, n, n))
+  for c in resistors + pots + motor_pots + heads + motors + probes + op_amps + (
+      vsources + isources):
+    if c.connected():
+      c.addConductance(g_stack[0])
+  conductances = g_stack[0].copy()
+  currents = zeros((1, n))
+  for c in isources:
+    c.setCurrent(currents[0])
+  b_stack = -currents
+  constrain(g_stack, b_stack, vsources, op_amps)
+  return conductances, solve_systems(g_stack, b_stack, op_amps)[0]
+
+def operating_point(lines, pot_alphas=None, lamp_angles=None,
+    lamp_distances=None, head_angles=None):
+  """
+  |lines|: CMax netlist, strings or Netlist_Lines.
+  |pot_alphas|: the alpha of each pot (in netlist order).
+  |lamp_angles|, |lamp_distances|: the lamp angle (in turns, as in the
+      simulator's lamp signals) and distance of each head.
+  |head_angles|: the angle (rad) of each head.
+  Parameters given as None keep the simulator's initial values.
+  Returns the Operating_Point of the circuit.
+  """
+  parts = connected_parts(lines)
+  (n, resistors, pots, motor_pots, heads, motors, vsources, isources, op_amps,
+      probes) = parts
+  _set_inputs(pots, heads, pot_alphas, lamp_angles, lamp_distances,
+      head_angles)
+  voltages = _solve_operating_point(parts)[1]
+  states = {0: SATURATION_LINEAR, 1: SATURATION_POSITIVE,
+      -1: SATURATION_NEGATIVE}
+  speeds = []
+  for h in heads + motors:
+    voltage = voltages[h.n1] - voltages[h.n2] if h.connected() else 0.
+    speeds.append(h.Kt / h.Rm * voltage / (h.B + h.Kt * h.Kb / h.Rm))
+  return Operating_Point(voltages, probe_voltages(voltages[newaxis], probes)[0],
+      [states[state] for state in _op_amp_states(voltages, op_amps)], speeds)
+
+def _injected(n, pots, isources, voltages):
+  """
+  Returns the currents leaving each of the |n| nodes through the |pots| and
+      |isources| in their current state, at the node |voltages|.
+  """
+  currents = zeros(n)
+  for c in isources:
+    c.setCurrent(currents)
+  for pot in pots:
+    if pot.connected():
+      for n1, n2, g in pot.branches():
+        if n1 is not None and n2 is not None:
+          currents[n1] += g * (voltages[n1] - voltages[n2])
+          currents[n2] -= g * (voltages[n1] - voltages[n2])
+  return currents
+
+def _derivative(part, attribute, heads, injected):
+  """
+  Returns the derivative of |injected()| with respect to the given |attribute|
+      of the given |part|, by central differences. The |heads| are updated
+      after every change.
+  """
+  value = getattr(part, attribute)
+  step = SMALL_SIGNAL_STEP * max(1, abs(value))
+  def at(x):
+    setattr(part, attribute, x)
+    _update_heads(heads)
+    return injected()
+  derivative = (at(value + step) - at(value - step)) / (2 * step)
+  at(value)
+  return derivative
+
+def ac_sweep(lines, source, index, frequencies, pot_alphas=None,
+    lamp_angles=None, lamp_distances=None, head_angles=None, nodes=False):
+  """
+  |lines|: CMax netlist, strings or Netlist_Lines.
+  |source|: the input that is varied, one of INPUT_POT_ALPHA,
+      INPUT_LAMP_ANGLE (in turns), or INPUT_LAMP_DISTANCE.
+  |index|: which of the pots, or heads (in netlist order), is the source.
+  |frequencies|: the frequencies (Hz) to solve for. Free motors integrate, so
+      their angles only have a response at positive frequencies.
+  |pot_alphas|, |lamp_angles|, |lamp_distances|, |head_angles|: the operating
+      point to linearize about, see operating_point.
+  |nodes|: if True, returns the voltages of all the nodes instead of the probes.
+  Returns a 2-D complex NumPy array with one row per frequency: the response,
+      per unit of the source, of the voltage across each pair of (+probe,
+      -probe) (or of the voltage of each node if |nodes| is True), followed by
+      the angle and the angular velocity of each head, then each motor.
+  Raises SingularMatrix if the linearized circuit cannot be solved at one of
+      the frequencies.
+  """
+  parts = connected_parts(lines)
+  (n, resistors, pots, motor_pots, heads, motors, vsources, isources, op_amps,
+      probes) = parts
+  inputs = {INPUT_POT_ALPHA: pots, INPUT_LAMP_ANGLE: heads,
+      INPUT_LAMP_DISTANCE: heads}[source]
+  if not 0 <= index < len(inputs):
+    raise NonexistentPart('No part %d to vary %s' % (index, source))
+  _set_inputs(pots, heads, pot_alphas, lamp_angles, lamp_distances,
+      head_angles)
+  conductances, voltages = _solve_operating_point(parts)
+  mechanics = heads + motors
+  size = n + len(mechanics)
+  injected = lambda: _injected(n, pots + motor_pots, isources, voltages)
+  # system a0 + s a1 + s^2 a2, over the node voltages then the angles
+  a0, a1, a2 = zeros((size, size)), zeros((size, size)), zeros((size, size))
+  b = zeros(size)
+  g_stack = conductances[newaxis].copy()
+  constrain(g_stack, zeros((1, n)), vsources, op_amps)
+  a0[:n, :n] = g_stack[0]
+  for k, head in enumerate(heads):
+    a0[:n, n + k] = _derivative(head, 'theta', heads, injected)
+  if source == INPUT_POT_ALPHA:
+    b[:n] = -_derivative(inputs[index], 'alpha', heads, injected)
+  elif source == INPUT_LAMP_ANGLE:
+    b[:n] = -2 * pi * _derivative(inputs[index], 'phi', heads, injected)
+  else:
+    b[:n] = -_derivative(inputs[index], 'distance', heads, injected)
+  # nodes set by sources do not move, op amp outputs follow their inputs or
+  #     their rails
+  for c in vsources:
+    a0[c.n1, n:] = 0
+    b[c.n1] = 0
+  for c, state in zip(op_amps, _op_amp_states(voltages, op_amps)):
+    a0[c.vO] = 0
+    a0[c.vO, c.vO] = 1
+    if state == 0:
+      a0[c.vO, c.vP] -= c.K
+      a0[c.vO, c.vM] += c.K
+    else:
+      a0[c.vO, c.pP if state == 1 else c.pM] -= 1
+    b[c.vO] = 0
+  for k, h in enumerate(mechanics):
+    a2[n + k, n + k] = h.J
+    a1[n + k, n + k] = h.B + h.Kt * h.Kb / h.Rm
+    if h.connected():
+      a0[n + k, h.n1] -= h.Kt / h.Rm
+      a0[n + k, h.n2] += h.Kt / h.Rm
+  s = 2j * pi * array(frequencies, dtype=float)
+  a_stack = a0 + s[:, newaxis, newaxis] * a1 + (s ** 2)[:, newaxis, newaxis] * (
+      a2)
+  b_stack = zeros((len(s), size, 1), dtype=complex)
+  b_stack[:, :, 0] = b
+  try:
+    responses = solve(a_stack, b_stack)[:, :, 0]
+  except LinAlgError:
+    raise SingularMatrix('Small-signal system cannot be solved')
+  angles = empty((len(s), 2 * len(mechanics)), dtype=complex)
+  angles[:, 0::2] = responses[:, n:]
+  angles[:, 1::2] = s[:, newaxis] * responses[:, n:]
+  node_responses = responses[:, :n]
+  return hstack((node_responses if nodes else probe_voltages(node_responses,
+      probes), angles))
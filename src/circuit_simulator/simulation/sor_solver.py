@@ -0,0 +1,151 @@
+"""
+Iterative solver for the nodal equations assembled by the CMax simulator, an
+    alternative to the direct solver in nodal_solver.py with the same interface.
+The known nodes are eliminated exactly as in nodal_solver.py, and the free-free
+    block is solved by successive over-relaxation. Every sweep is one
+    triangular solve, so all of the free nodes (and all of the right hand sides)
+    are updated in vectorized NumPy code.
+The relaxation factor starts out at 1 (Gauss-Seidel) and is raised towards its
+    optimum as the rate at which the corrections shrink is observed, the
+    estimate carrying over from one solve to the next. Iteration stops once the
+    KCL residual (the net current into each free node) is below
+    |SOR_TOLERANCE| relative to the currents driving the system, or after
+    |SOR_MAX_SWEEPS| sweeps. Solves that hit the limit are counted so that slow
+    circuits can be found.
+"""
+
+__author__ = 'mikemeko@mit.edu (Michael Mekonnen)'
+
+from constants import GMIN
+from constants import SOR_MAX_OMEGA
+from constants import SOR_MAX_SWEEPS
+from constants import SOR_TOLERANCE
+from numpy import abs as np_abs
+from numpy import array
+from numpy import diag
+from numpy import dot
+from numpy import flatnonzero
+from numpy import ix_
+from numpy import maximum
+from numpy import sqrt
+from numpy import tril
+from numpy import triu
+from numpy import zeros
+from scipy.linalg import solve_triangular
+
+class SOR_Solver:
+  """
+  Solves G v = -i for the voltages of the free nodes, given the voltages of the
+      known nodes, by successive over-relaxation.
+  """
+  def __init__(self, g_matrix, known, branches=(), conductances=()):
+    """
+    |g_matrix|: N x N matrix of the static conductance stamps (list of lists or
+        numpy array).
+    |known|: list of N booleans, True for the nodes whose voltages are known.
+    |branches|: list of node pairs (n1, n2), the two-terminal conductances that
+        may change between solves.
+    |conductances|: the initial conductance of each of the |branches|.
+    Raises an Exception if a free node has no conductance at all.
+    """
+    assert len(branches) == len(conductances), ('need one conductance per '
+        'branch')
+    self._g_matrix = array(g_matrix, dtype=float)
+    known = array(known, dtype=bool)
+    self._free = flatnonzero(~known)
+    self._fixed = flatnonzero(known)
+    # incidence matrix of the dynamic branches
+    self._u = zeros((len(known), len(branches)))
+    for b, (n1, n2) in enumerate(branches):
+      self._u[n1, b] += 1
+      self._u[n2, b] -= 1
+    self._conductances = None
+    self._omega = 1.
+    # total number of sweeps, and of solves that did not converge
+    self.sweeps = 0
+    self.unconverged = 0
+    self.set_conductances(conductances)
+  def _split(self):
+    """
+    Splits the free-free block for the current relaxation factor, so that a
+        sweep is x <- M^-1 (omega * b - N x).
+    """
+    d = diag(self._g_free)
+    self._m = self._omega * tril(self._g_free, -1) + diag(d)
+    self._n = self._omega * triu(self._g_free, 1) + diag((self._omega - 1) * d)
+  def set_conductances(self, conductances):
+    """
+    Sets the current conductance of each of the dynamic branches.
+    """
+    conductances = array(conductances, dtype=float)
+    if self._conductances is not None and (conductances ==
+        self._conductances).all():
+      return
+    self._conductances = conductances
+    g_matrix = self._g_matrix + dot(self._u * conductances, self._u.T)
+    self._g_free_fixed = g_matrix[ix_(self._free, self._fixed)]
+    self._g_free = g_matrix[ix_(self._free, self._free)]
+    self._g_free.flat[::len(self._free) + 1] += GMIN
+    if (self._g_free.diagonal() <= 0).any():
+      raise Exception('Singular conductance matrix')
+    self._split()
+  def _adapt(self, ratio):
+    """
+    Updates the relaxation factor given the observed |ratio| between the sizes
+        of consecutive corrections. Returns True if it changed.
+    """
+    omega = self._omega
+    if not omega - 1 < ratio < 1:
+      return False
+    # estimate of the squared spectral radius of the Jacobi iteration
+    mu2 = min((ratio + omega - 1) ** 2 / (omega ** 2 * ratio), 1.)
+    new_omega = min(2. / (1 + sqrt(1 - mu2)), SOR_MAX_OMEGA)
+    if new_omega <= omega + 1e-3:
+      return False
+    self._omega = new_omega
+    self._split()
+    return True
+  def solve(self, voltages, currents):
+    """
+    |voltages|: N voltages, the entries for the known nodes are used as they
+        are, and those for the free nodes are the initial guess.
+    |currents|: N currents injected into the nodes.
+    Returns a numpy array of all N node voltages. Several systems can be solved
+        at once by passing N x k arrays, one column per system.
+    """
+    v = array(voltages, dtype=float)
+    shape = v.shape
+    v = v.reshape((shape[0], -1))
+    if not len(self._free):
+      return v.reshape(shape)
+    b = -array(currents, dtype=float).reshape(v.shape)[self._free]
+    if len(self._fixed):
+      b -= dot(self._g_free_fixed, v[self._fixed])
+    tolerance = SOR_TOLERANCE * maximum(np_abs(b).max(axis=0), GMIN)
+    x = v[self._free]
+    last_change = None
+    last_ratio = None
+    converged = False
+    for sweep in xrange(SOR_MAX_SWEEPS + 1):
+      if (np_abs(b - dot(self._g_free, x)).max(axis=0) <= tolerance).all():
+        converged = True
+        break
+      if sweep == SOR_MAX_SWEEPS:
+        break
+      new_x = solve_triangular(self._m, self._omega * b - dot(self._n, x),
+          lower=True, check_finite=False)
+      change = np_abs(new_x - x).max()
+      x = new_x
+      self.sweeps += 1
+      if last_change:
+        ratio = change / last_change
+        # adapt once the rate of convergence has settled
+        if last_ratio is not None and abs(ratio - last_ratio) < 0.01 * ratio:
+          if self._adapt(ratio):
+            change = None
+        last_ratio = ratio if change is not None else None
+      last_change = change
+    if not converged:
+      self.unconverged += 1
+    v[self._free] = x
+    return v.reshape(shape)
@@ -0,0 +1,158 @@
+"""
+Sparse direct solver for the nodal equations assembled by the CMax simulator,
+    for circuits too large for the dense factorization in nodal_solver.py. It
+    has the same interface, and takes the static stamps as a SciPy sparse
+    matrix (e.g. assembled from COO triplets).
+The known nodes are eliminated as in nodal_solver.py and the free-free block is
+    factorized with SuperLU. The sparsity pattern does not change between time
+    steps, so the fill-reducing ordering found by the first factorization is
+    kept and every later factorization reuses it, leaving only the numeric
+    work. As in nodal_solver.py, conductances that change between time steps
+    are applied as a low-rank (Woodbury) correction, so the factorization
+    itself survives across most time steps and each solve costs about as much
+    as the number of nonzeros in its factors.
+"""
+
+__author__ = 'mikemeko@mit.edu (Michael Mekonnen)'
+
+from constants import GMIN
+from numpy import argsort
+from numpy import array
+from numpy import array_equal
+from numpy import dot
+from numpy import empty
+from numpy import eye
+from numpy import flatnonzero
+from numpy import newaxis
+from scipy.linalg import lu_factor
+from scipy.linalg import lu_solve
+from scipy.sparse import csc_matrix
+from scipy.sparse import diags
+from scipy.sparse.linalg import splu
+
+class Sparse_Solver:
+  """
+  Solves G v = -i for the voltages of the free nodes, given the voltages of the
+      known nodes, with sparse LU factorization.
+  """
+  def __init__(self, g_matrix, known, branches=(), conductances=()):
+    """
+    |g_matrix|: N x N matrix of the static conductance stamps (SciPy sparse
+        matrix, or anything csc_matrix accepts).
+    |known|: list of N booleans, True for the nodes whose voltages are known.
+    |branches|: list of node pairs (n1, n2), the two-terminal conductances that
+        may change between solves.
+    |conductances|: the initial conductance of each of the |branches|.
+    Raises an Exception if the free-free block of the matrix is singular.
+    """
+    assert len(branches) == len(conductances), ('need one conductance per '
+        'branch')
+    g_matrix = csc_matrix(g_matrix, dtype=float)
+    known = array(known, dtype=bool)
+    self._free = flatnonzero(~known)
+    self._fixed = flatnonzero(known)
+    # incidence matrix of the dynamic branches
+    rows, columns, signs = [], [], []
+    for b, (n1, n2) in enumerate(branches):
+      rows.extend((n1, n2))
+      columns.extend((b, b))
+      signs.extend((1., -1.))
+    self._u = csc_matrix((signs, (rows, columns)), shape=(len(known),
+        len(branches)))
+    self._g_matrix = g_matrix
+    self._g_free = g_matrix[self._free][:, self._free].tocsc()
+    self._u_free = self._u[self._free].toarray()
+    self._u_fixed = self._u[self._fixed].toarray()
+    self._u_free_sparse = self._u[self._free].tocsc()
+    self._g_free_fixed = (g_matrix[self._free][:, self._fixed].tocsr(),
+        self._u[self._free].tocsr(), self._u[self._fixed].tocsr())
+    # symmetric ordering of the free nodes, set by the first factorization
+    self._order = None
+    self._conductances = None
+    self._factorize(array(conductances, dtype=float))
+  def _factorize(self, conductances):
+    """
+    Factorizes the free-free block of the matrix with the dynamic branches set
+        to the given |conductances|, which become the reference conductances.
+    """
+    self._reference = conductances
+    self._conductances = conductances
+    self._changed = []
+    self._lu = None
+    n = len(self._free)
+    if not n:
+      return
+    g_free = (self._g_free + self._u_free_sparse * diags(conductances) *
+        self._u_free_sparse.T + diags([GMIN] * n)).tocsc()
+    try:
+      if self._order is None:
+        self._order = argsort(splu(g_free).perm_c)
+      self._lu = splu(g_free[self._order][:, self._order].tocsc(),
+          permc_spec='NATURAL')
+    except RuntimeError:
+      raise Exception('Singular conductance matrix')
+  def _solve_free(self, rhs):
+    """
+    Solves the factorized free-free block for the n x k right hand sides |rhs|.
+    """
+    solution = empty(rhs.shape)
+    solution[self._order] = self._lu.solve(rhs[self._order])
+    return solution
+  def _fixed_currents(self, conductances, v_fixed):
+    """
+    Returns the currents into the free nodes from the known nodes, at
+        voltages |v_fixed|, with the dynamic branches at |conductances|.
+    """
+    g_free_fixed, u_free, u_fixed = self._g_free_fixed
+    return g_free_fixed * v_fixed + u_free * (conductances[:, newaxis] * (
+        u_fixed.T * v_fixed))
+  def set_conductances(self, conductances):
+    """
+    Sets the current conductance of each of the dynamic branches. The cached
+        factorization is reused outright if nothing changed, updated with a
+        low-rank correction if only a few branches changed, and recomputed
+        otherwise.
+    """
+    conductances = array(conductances, dtype=float)
+    if array_equal(conductances, self._conductances):
+      return
+    self._conductances = conductances
+    deltas = conductances - self._reference
+    changed = flatnonzero(deltas)
+    if 2 * len(changed) >= len(self._free):
+      self._factorize(conductances)
+      return
+    self._changed = changed
+    self._deltas = deltas[changed]
+    if len(changed) and self._lu is not None:
+      u = self._u_free[:, changed]
+      self._z = self._solve_free(u)
+      self._capacitance = lu_factor(eye(len(changed)) + self._deltas[:, None] *
+          dot(u.T, self._z), check_finite=False)
+  def conductance(self, n1, n2):
+    """
+    Returns the current entry (|n1|, |n2|) of the conductance matrix.
+    """
+    return self._g_matrix[n1, n2] + (self._u[n1].multiply(self._u[n2]) *
+        self._conductances)[0]
+  def solve(self, voltages, currents):
+    """
+    |voltages|: N voltages, only the entries for the known nodes are used.
+    |currents|: N currents injected into the nodes.
+    Returns a numpy array of all N node voltages. Several systems can be solved
+        at once by passing N x k arrays, one column per system.
+    """
+    v = array(voltages, dtype=float)
+    shape = v.shape
+    v = v.reshape((shape[0], -1))
+    if self._lu is not None:
+      rhs = -array(currents, dtype=float).reshape(v.shape)[self._free]
+      if len(self._fixed):
+        rhs -= self._fixed_currents(self._conductances, v[self._fixed])
+      v_free = self._solve_free(rhs)
+      if len(self._changed):
+        deltas = self._deltas[:, newaxis]
+        v_free -= dot(self._z, lu_solve(self._capacitance, deltas * dot(
+            self._u_free[:, self._changed].T, v_free), check_finite=False))
+      v[self._free] = v_free
+    return v.reshape(shape)
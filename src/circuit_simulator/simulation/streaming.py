@@ -0,0 +1,79 @@
+"""
+Long simulations in bounded memory.
+A simulate.SimulationStream yields one sample at a time. Here its traces (the
+    voltage across each probe pair, then the angle and velocity of each motor)
+    are packed into chunks of NumPy arrays, or written chunk by chunk into a
+    preallocated array or a memory-mapped .npy file, so that simulations with
+    millions of samples never hold more than one chunk of Python objects.
+"""
+
+__author__ = 'mikemeko@mit.edu (Michael Mekonnen)'
+
+from array import array
+from constants import STREAM_CHUNK_SIZE
+from numpy import empty
+from numpy import frombuffer
+from numpy.lib.format import open_memmap
+
+def num_traces(stream):
+  """
+  Returns the number of traces of the given simulate.SimulationStream
+      |stream|: one per probe pair, and two (angle and velocity) per motor.
+  """
+  return stream.numProbes + 2 * len(stream.motorLabels)
+
+def _chunk(buffer, num_samples, width):
+  """
+  Returns the samples packed in |buffer| as an array with |width| rows and
+      |num_samples| columns.
+  """
+  if not width:
+    # nothing to trace, frombuffer does not accept an empty buffer
+    return empty((0, num_samples))
+  return frombuffer(buffer).reshape((num_samples, width)).T.copy()
+
+def trace_chunks(stream, chunk_size=STREAM_CHUNK_SIZE):
+  """
+  Consumes the simulate.SimulationStream |stream| and yields (start, chunk)
+      for every |chunk_size| samples, where |chunk| is a NumPy array with one
+      row per trace (see num_traces) and one column per sample, starting at
+      sample |start|. The last chunk may be shorter.
+  """
+  width = num_traces(stream)
+  start = 0
+  num_samples = 0
+  buffer = array('d')
+  for voltages, probes, motors in stream:
+    buffer.extend(probes)
+    for theta, omega in motors:
+      buffer.append(theta)
+      buffer.append(omega)
+    num_samples += 1
+    if num_samples == chunk_size:
+      yield start, _chunk(buffer, num_samples, width)
+      start += chunk_size
+      num_samples = 0
+      buffer = array('d')
+  if num_samples:
+    yield start, _chunk(buffer, num_samples, width)
+
+def record_traces(stream, out=None, file_name=None,
+    chunk_size=STREAM_CHUNK_SIZE):
+  """
+  Consumes the simulate.SimulationStream |stream| and writes its traces into
+      an array with one row per trace (see num_traces) and one column per
+      sample: the preallocated array |out| if given, otherwise a new
+      memory-mapped .npy file |file_name| if given, otherwise a new array.
+      Returns the array.
+  """
+  shape = (num_traces(stream), stream.result.nSamples)
+  memory_mapped = out is None and file_name
+  if out is None:
+    out = open_memmap(file_name, mode='w+', shape=shape) if file_name else (
+        empty(shape))
+  assert out.shape == shape, 'out must have shape %s' % (shape,)
+  for start, chunk in trace_chunks(stream, chunk_size):
+    out[:, start:start + chunk.shape[1]] = chunk
+  if memory_mapped:
+    out.flush()
+  return out
@@ -0,0 +1,176 @@
+"""
+Parameter sweeps for CMax netlists.
+Rather than simulating the circuit once per value of a parameter (a pot's alpha,
+    a resistance, or a lamp's distance), the circuit is solved at its initial
+    state for all of the values at once: one modified nodal system is assembled
+    per value, and all of them are solved in a single batched NumPy call.
+Op amps are modeled as voltage-controlled voltage sources with the simulator's
+    gain, clipped to their supply rails. Clipping is resolved with an active set
+    iteration that updates all of the systems together. These batched building
+    blocks are shared with monte_carlo.py.
+"""
+
+__author__ = 'mikemeko@mit.edu (Michael Mekonnen)'
+
+from constants import GMIN
+from constants import SWEEP_LAMP_DISTANCE
+from constants import SWEEP_POT_ALPHA
+from constants import SWEEP_RESISTANCE
+from netlist import parse_netlist
+from numpy import arange
+from numpy import array
+from numpy import array_equal
+from numpy import newaxis
+from numpy import tile
+from numpy import zeros
+from numpy.linalg import solve
+from simulate import makeNodes
+from simulate import MultipleSources
+from simulate import NonexistentPart
+from simulate import parseComponents
+
+def stamp(g_stack, n1, n2, g):
+  """
+  Adds conductances |g| (one per system) between nodes |n1| and |n2| to the
+      stack of conductance matrices |g_stack|.
+  """
+  g_stack[:, n1, n1] += g
+  g_stack[:, n1, n2] -= g
+  g_stack[:, n2, n1] -= g
+  g_stack[:, n2, n2] += g
+
+def connected_parts(lines):
+  """
+  Parses the CMax netlist |lines| (strings or Netlist_Lines) and returns the
+      number of nodes, followed by the lists of parts made by
+      simulate.parseComponents. Sources and op amps that are not fully
+      connected are left out, since they do not constrain anything.
+  """
+  lines = parse_netlist(lines)
+  nodes, n = makeNodes(lines)[:2]
+  (resistors, pots, motor_pots, heads, motors, vsources, isources, op_amps,
+      probes) = parseComponents(lines, nodes)
+  vsources = [c for c in vsources if c.connected()]
+  isources = [c for c in isources if c.connected()]
+  op_amps = [c for c in op_amps if c.connected() and None not in (c.vO, c.pP,
+      c.pM)]
+  return (n, resistors, pots, motor_pots, heads, motors, vsources, isources,
+      op_amps, probes)
+
+def constrain(a_stack, b_stack, vsources, op_amps):
+  """
+  Turns the stack of conductance matrices |a_stack| and the stack of negated
+      injected currents |b_stack| into modified nodal systems: every node gets a
+      conductance of GMIN to ground, and the rows of the nodes set by the
+      |vsources| become fixed. The rows of the op amp outputs are filled in by
+      solve_systems. Raises MultipleSources if a node is set more than once.
+  """
+  n = a_stack.shape[1]
+  a_stack[:, arange(n), arange(n)] += GMIN
+  known = zeros(n, dtype=bool)
+  for c in vsources:
+    if known[c.n1]:
+      raise MultipleSources('Voltage on node %d set by multiple sources.' %
+          c.n1)
+    known[c.n1] = True
+    a_stack[:, c.n1, :] = 0
+    a_stack[:, c.n1, c.n1] = 1
+    b_stack[:, c.n1] = c.voltage
+  for c in op_amps:
+    if known[c.vO]:
+      raise MultipleSources('Voltage on node %d set by multiple sources.' %
+          c.vO)
+    known[c.vO] = True
+    b_stack[:, c.vO] = 0
+
+def solve_systems(a_stack, b_stack, op_amps):
+  """
+  Solves the stack of systems built by constrain, with the op amps modeled as
+      VCVSs clipped to their rails. Returns the stack of node voltages.
+  """
+  # active set iteration over the op amp outputs: 0 linear, 1 clipped to the
+  #     positive rail, -1 clipped to the negative rail
+  num_systems = a_stack.shape[0]
+  state = zeros((num_systems, len(op_amps)), dtype=int)
+  rows = arange(num_systems)
+  for iteration in xrange(2 * len(op_amps) + 2):
+    for k, c in enumerate(op_amps):
+      a_stack[:, c.vO, :] = 0
+      a_stack[:, c.vO, c.vO] = 1
+      linear = rows[state[:, k] == 0]
+      a_stack[linear, c.vO, c.vP] -= c.K
+      a_stack[linear, c.vO, c.vM] += c.K
+      a_stack[rows[state[:, k] == 1], c.vO, c.pP] -= 1
+      a_stack[rows[state[:, k] == -1], c.vO, c.pM] -= 1
+    voltages = solve(a_stack, b_stack[:, :, newaxis])[:, :, 0]
+    new_state = zeros(state.shape, dtype=int)
+    for k, c in enumerate(op_amps):
+      target = c.K * (voltages[:, c.vP] - voltages[:, c.vM])
+      new_state[target > voltages[:, c.pP], k] = 1
+      new_state[target < voltages[:, c.pM], k] = -1
+    if array_equal(new_state, state):
+      break
+    state = new_state
+  return voltages
+
+def probe_voltages(voltages, probes):
+  """
+  Returns the voltage differences across each pair of (+probe, -probe) for the
+      given stack of node |voltages|, one column per pair.
+  """
+  plus = [p.n1 for p in probes if p.sign == '+']
+  minus = [p.n1 for p in probes if p.sign == '-']
+  pairs = min(len(plus), len(minus))
+  return voltages[:, plus[:pairs]] - voltages[:, minus[:pairs]]
+
+def sweep(lines, parameter, index, values, nodes=False):
+  """
+  |lines|: CMax netlist, strings or Netlist_Lines.
+  |parameter|: the swept parameter, one of SWEEP_POT_ALPHA, SWEEP_RESISTANCE,
+      or SWEEP_LAMP_DISTANCE.
+  |index|: which of the pots, resistors, or heads (in netlist order) to sweep.
+  |values|: the values to give the parameter.
+  |nodes|: if True, returns the voltages of all the nodes instead of the probes.
+  Returns a 2-D NumPy array with one row per value: the voltage across each pair
+      of (+probe, -probe), or the voltage of each node if |nodes| is True.
+  """
+  (n, resistors, pots, motor_pots, heads, motors, vsources, isources, op_amps,
+      probes) = connected_parts(lines)
+  swept = {SWEEP_POT_ALPHA: pots, SWEEP_RESISTANCE: resistors,
+      SWEEP_LAMP_DISTANCE: heads}[parameter]
+  if not 0 <= index < len(swept):
+    raise NonexistentPart('No part %d to sweep %s' % (index, parameter))
+  part = swept[index]
+  values = array(values, dtype=float)
+  num_values = len(values)
+  # initial state of the circuit
+  for head in heads:
+    head.updatePhotoDiodes()
+    head.updatePot()
+  # conductances, the swept resistor or pot is stamped separately
+  g_stack = zeros((1, n, n))
+  for c in resistors + pots + motor_pots + heads + motors + probes + op_amps + (
+      vsources):
+    if c is not part and c.connected():
+      c.addConductance(g_stack[0])
+  g_stack = tile(g_stack, (num_values, 1, 1))
+  if parameter == SWEEP_RESISTANCE and part.connected():
+    stamp(g_stack, part.n1, part.n2, 1. / values)
+  elif parameter == SWEEP_POT_ALPHA and part.connected():
+    alphas = values.clip(0.001, 0.999)
+    stamp(g_stack, part.n1, part.n2, 1. / ((1 - alphas) * part.resistance))
+    stamp(g_stack, part.n2, part.n3, 1. / (alphas * part.resistance))
+  # injected currents, only the lamp distance changes them
+  currents = zeros((num_values, n))
+  for i in xrange(num_values if parameter == SWEEP_LAMP_DISTANCE else 1):
+    if parameter == SWEEP_LAMP_DISTANCE:
+      part.distance = values[i]
+      part.updatePhotoDiodes()
+    for c in isources:
+      c.setCurrent(currents[i])
+  if parameter != SWEEP_LAMP_DISTANCE:
+    currents[1:] = currents[0]
+  b_stack = -currents
+  constrain(g_stack, b_stack, vsources, op_amps)
+  voltages = solve_systems(g_stack, b_stack, op_amps)
+  return voltages if nodes else probe_voltages(voltages, probes)
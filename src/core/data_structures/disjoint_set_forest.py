@@ -72,3 +72,49 @@ class Disjoint_Set_Forest:
   def __hash__(self):
     return hash((frozenset(self._parent.items()), frozenset(
         self._rank.items())))
+
+class Array_Disjoint_Set_Forest:
+  """
+  Disjoint set forest over the integers 0, 1, 2, ..., backed by lists rather
+      than dictionaries. Suited to elements that are already dense indices.
+  """
+  def __init__(self, size=0):
+    """
+    |size|: number of singleton sets (0 through |size| - 1) to start with.
+    """
+    self._parent = range(size)
+    self._rank = [0] * size
+  def __len__(self):
+    return len(self._parent)
+  def make_set(self):
+    """
+    Makes a new singleton set and returns its element, the next unused integer.
+    """
+    x = len(self._parent)
+    self._parent.append(x)
+    self._rank.append(0)
+    return x
+  def union(self, x, y):
+    """
+    Unites the sets containing |x| and |y|.
+    """
+    x = self.find_set(x)
+    y = self.find_set(y)
+    if x == y:
+      return
+    if self._rank[x] > self._rank[y]:
+      self._parent[y] = x
+    else:
+      self._parent[x] = y
+      if self._rank[x] == self._rank[y]:
+        self._rank[y] += 1
+  def find_set(self, x):
+    """
+    Returns the representative of the set containing |x|. Iterative (with path
+        halving), so long chains do not hit the recursion limit.
+    """
+    parent = self._parent
+    while parent[x] != x:
+      parent[x] = parent[parent[x]]
+      x = parent[x]
+    return x
@@ -6,6 +6,11 @@ __author__ = 'mikemeko@mit.edu (Michael Mekonnen)'
 
 from core.util.util import is_callable
 from core.util.util import is_number
+from numpy import arange
+from numpy import asarray
+from numpy import errstate
+from numpy import fromiter
+from numpy import full
 
 class CT_Signal:
   """
@@ -23,6 +28,13 @@ class CT_Signal:
         units of time starting from (and including) |t0|.
     """
     return [self.sample(t0 + n * T) for n in xrange(num_samples)]
+  def samples_array(self, t0, T, num_samples):
+    """
+    Returns the same samples as samples, as a NumPy array of floats.
+        Subclasses may compute all of the samples at once.
+    """
+    return fromiter((self.sample(t0 + n * T) for n in xrange(num_samples)),
+        float, num_samples)
   def __call__(self, t):
     return self.sample(t)
 
@@ -38,6 +50,8 @@ class Constant_CT_Signal(CT_Signal):
     self.k = k
   def sample(self, t):
     return self.k
+  def samples_array(self, t0, T, num_samples):
+    return full(num_samples, self.k, dtype=float)
 
 class Function_CT_Signal(CT_Signal):
   """
@@ -51,3 +65,22 @@ class Function_CT_Signal(CT_Signal):
     self.f = f
   def sample(self, t):
     return self.f(t)
+  def samples_array(self, t0, T, num_samples):
+    """
+    Calls the underlying function once with the array of sample times, which
+        works for functions made up of arithmetic, comparisons, and NumPy
+        calls. Falls back to sampling one time at a time if that fails or does
+        not return one value per sample time (e.g. a function that ignores its
+        argument, and may return a different value on every call), including
+        when NumPy runs into a floating point error that sampling one time at a
+        time would have raised.
+    """
+    t = t0 + arange(num_samples) * T
+    try:
+      with errstate(all='raise'):
+        values = asarray(self.f(t), dtype=float)
+      if values.shape == (num_samples,):
+        return values
+    except Exception:
+      pass
+    return CT_Signal.samples_array(self, t0, T, num_samples)
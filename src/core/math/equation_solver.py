@@ -4,8 +4,117 @@ Solver for linear systems of equations.
 
 __author__ = 'mikemeko@mit.edu (Michael Mekonnen)'
 
-from numpy import matrix
-from numpy.linalg import solve
+from numpy import dot
+from numpy import eye
+from numpy import zeros
+from scipy.linalg import lu_factor
+from scipy.linalg import lu_solve
+
+def _terms(equation, var_index):
+  """
+  Returns (coeffs, const) for the given |equation|: a dictionary mapping the
+      index of each of its variables to its total coefficient, and its total
+      constant moved to the right hand side.
+  """
+  coeffs, const = {}, 0
+  for coeff, var in equation:
+    if var:
+      if var not in var_index:
+        raise Exception('Unknown variable %s' % var)
+      index = var_index[var]
+      coeffs[index] = coeffs.get(index, 0) + coeff
+    else:
+      const -= coeff
+  return coeffs, const
+
+class Equation_System:
+  """
+  System of equations whose variables are fixed but whose coefficients may
+      change between solves, e.g. the equations of a circuit at successive
+      time steps. The variable index and the matrix are built once, and
+      setting an equation rewrites only its own row. The factorization of the
+      matrix is kept for as long as only the constants change, and rows that
+      change are applied to it as a low-rank (Woodbury) correction until more
+      than half of them differ from the factorized matrix.
+  """
+  def __init__(self, equations):
+    """
+    |equations|: list of lists of terms summing to 0, see solve_equations.
+    """
+    # variables in the order they first appear
+    self.var_list = []
+    self._var_index = {}
+    for equation in equations:
+      for coeff, var in equation:
+        if var and var not in self._var_index:
+          self._var_index[var] = len(self.var_list)
+          self.var_list.append(var)
+    self._A = zeros((len(equations), len(self.var_list)))
+    self._b = zeros(len(equations))
+    # coefficients of each row, as set in the matrix
+    self._rows = [{} for equation in equations]
+    # factorization of the matrix as it was when last factorized
+    self._lu = None
+    self._changed = set()
+    self._correction = None
+    for index, equation in enumerate(equations):
+      self.set_equation(index, equation)
+  def set_equation(self, index, equation):
+    """
+    Replaces the equation at the given |index| with |equation|, which may only
+        use the variables of the original equations.
+    """
+    coeffs, const = _terms(equation, self._var_index)
+    self._b[index] = const
+    if coeffs != self._rows[index]:
+      self._A[index, self._rows[index].keys()] = 0
+      self._A[index, coeffs.keys()] = coeffs.values()
+      self._rows[index] = coeffs
+      self._changed.add(index)
+      self._correction = None
+  def _factorize(self):
+    """
+    Factorizes the matrix as it is now, or raises an Exception if it is
+        singular.
+    """
+    self._lu = None
+    self._changed = set()
+    self._correction = None
+    if self._A.shape[0] != self._A.shape[1]:
+      raise Exception('Could not solve system of equations')
+    lu = lu_factor(self._A, check_finite=False)
+    if not lu[0].diagonal().all():
+      raise Exception('Could not solve system of equations')
+    self._lu = lu
+    self._factorized = self._A.copy()
+  def _correct(self):
+    """
+    Sets up the low-rank correction of the factorization for the rows that
+        changed since it was computed, or raises an Exception if the matrix
+        has become singular.
+    """
+    rows = sorted(self._changed)
+    deltas = self._A[rows] - self._factorized[rows]
+    z = lu_solve(self._lu, eye(len(self._A))[:, rows], check_finite=False)
+    capacitance = lu_factor(eye(len(rows)) + dot(deltas, z),
+        check_finite=False)
+    if not capacitance[0].diagonal().all():
+      raise Exception('Could not solve system of equations')
+    self._correction = (deltas, z, capacitance)
+  def solve(self):
+    """
+    Returns a dictionary mapping the variables to their values, or raises an
+        Exception if the system cannot be solved.
+    """
+    if self._lu is None or 2 * len(self._changed) > len(self._A):
+      self._factorize()
+    elif self._changed and self._correction is None:
+      self._correct()
+    x = lu_solve(self._lu, self._b, check_finite=False)
+    if self._changed:
+      deltas, z, capacitance = self._correction
+      x -= dot(z, lu_solve(capacitance, dot(deltas, x), check_finite=False))
+    return dict(zip(self.var_list, x))
 
 def solve_equations(equations):
   """
@@ -17,28 +126,4 @@ def solve_equations(equations):
       their respective values, or raises an Exception if the system cannot be
       solved.
   """
-  # variables in the system of equations
-  var_list = list(reduce(set.union, (set(var for coeff, var in eqn if var)
-      for eqn in equations)))
-  # number of variables
-  num_vars = len(var_list)
-  # the index of each variable in |var_list|
-  var_index = dict(zip(var_list, range(num_vars)))
-  # matrices to solve system (Ax = b)
-  A, b = [], []
-  # populate matrices
-  for equation in equations:
-    coeffs, const = [0] * num_vars, 0
-    for coeff, var in equation:
-      if var:
-        coeffs[var_index[var]] += coeff
-      else:
-        const -= coeff
-    A.append(coeffs)
-    b.append([const])
-  try:
-    # solve system
-    x = solve(matrix(A), matrix(b))
-    return dict(zip(var_list, [x[i, 0] for i in xrange(num_vars)]))
-  except:
-    raise Exception('Could not solve system of equations')
+  return Equation_System(equations).solve()
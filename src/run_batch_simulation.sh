@@ -0,0 +1,2 @@
+# Script to simulate a directory of schematic files across all cores.
+python -m circuit_simulator.simulation.batch $1 $2 $3
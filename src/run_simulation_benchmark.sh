@@ -0,0 +1,2 @@
+# Script to run the circuit simulator benchmark on large generated circuits.
+python -m circuit_simulator.simulation.benchmark "$@"
@@ -4,8 +4,23 @@ python -m tests.circuit_simulator.proto_board.circuit_to_circuit_pieces_test
 python -m tests.circuit_simulator.proto_board.proto_board_test
 python -m tests.circuit_simulator.proto_board.util_test
 python -m tests.circuit_simulator.proto_board.wire_test
+python -m tests.circuit_simulator.simulation.circuit_test
+python -m tests.circuit_simulator.simulation.diagnostics_test
+python -m tests.circuit_simulator.simulation.instrumentation_test
+python -m tests.circuit_simulator.simulation.monte_carlo_test
+python -m tests.circuit_simulator.simulation.netlist_test
+python -m tests.circuit_simulator.simulation.nodal_solver_test
+python -m tests.circuit_simulator.simulation.result_cache_test
+python -m tests.circuit_simulator.simulation.simulate_test
+python -m tests.circuit_simulator.simulation.small_signal_test
+python -m tests.circuit_simulator.simulation.sor_solver_test
+python -m tests.circuit_simulator.simulation.sparse_solver_test
+python -m tests.circuit_simulator.simulation.streaming_test
+python -m tests.circuit_simulator.simulation.sweep_test
+python -m tests.core.data_structures.disjoint_set_forest_test
 python -m tests.core.data_structures.priority_queue_test
 python -m tests.core.gui.util_test
+python -m tests.core.math.CT_signal_test
 python -m tests.core.math.equation_solver_test
 python -m tests.core.math.line_segments_test
 python -m tests.core.search.search_test
@@ -0,0 +1,41 @@
+"""
+Unittests for circuit.py.
+"""
+
+__author__ = 'mikemeko@mit.edu (Michael Mekonnen)'
+
+from circuit_simulator.simulation.circuit import Circuit
+from circuit_simulator.simulation.circuit import Resistor
+from circuit_simulator.simulation.circuit import Signalled_Pot
+from circuit_simulator.simulation.circuit import Voltage_Source
+from circuit_simulator.simulation.constants import T
+from core.math.CT_signal import Function_CT_Signal
+from unittest import main
+from unittest import TestCase
+
+class Circuit_Test(TestCase):
+  """
+  Tests for circuit_simulator/simulation/circuit.
+  """
+  def _pot_circuit(self):
+    # 10V across a 1k resistor in series with a 1k pot, alpha rising with time
+    return Circuit([Voltage_Source('pwr', 'gnd', 'i_s', 10),
+        Resistor('pwr', 'top', 'i_r', 1000),
+        Signalled_Pot('top', 'mid', 'gnd', 'i_tm', 'i_mb', 1000,
+            Function_CT_Signal(lambda t: t))], 'gnd', solve=False)
+  def test_solve(self):
+    data = self._pot_circuit()._solve(10)
+    self.assertEqual(len(data), 10)
+    for n in xrange(10):
+      # pots step to the alpha for the time they leave
+      alpha = max(n - 1, 0) * T
+      solution = data[n * T]
+      self.assertAlmostEqual(solution['gnd'], 0)
+      self.assertAlmostEqual(solution['pwr'], 10)
+      self.assertAlmostEqual(solution['top'], 5)
+      self.assertAlmostEqual(solution['mid'], 5 * alpha)
+      self.assertAlmostEqual(solution['i_r'], 0.005)
+      self.assertAlmostEqual(solution['i_s'], -0.005)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,58 @@
+"""
+Unittests for diagnostics.py.
+"""
+
+__author__ = 'mikemeko@mit.edu (Michael Mekonnen)'
+
+from circuit_simulator.simulation.constants import LOG_ERROR
+from circuit_simulator.simulation.constants import LOG_WARNING
+from circuit_simulator.simulation.diagnostics import Diagnostics_Log
+from cPickle import dumps
+from cPickle import loads
+from unittest import main
+from unittest import TestCase
+
+class Diagnostics_Log_Test(TestCase):
+  """
+  Tests for circuit_simulator/simulation/diagnostics.
+  """
+  def test_levels(self):
+    log = Diagnostics_Log()
+    log.debug('node %s:%s', 'a', '(0,0)')
+    log.warning('floating node')
+    log.error('singular')
+    assert log.messages() == ['node a:(0,0)', 'floating node', 'singular']
+    assert log.messages(LOG_WARNING) == ['floating node', 'singular']
+    assert log.messages(LOG_ERROR) == ['singular']
+    assert log.text(LOG_WARNING) == 'floating node\nsingular\n'
+  def test_lazy_formatting(self):
+    calls = []
+    def format_samples(samples):
+      calls.append(samples)
+      return ' '.join(map(str, samples))
+    log = Diagnostics_Log()
+    log.debug(format_samples, [1, 2])
+    assert calls == []
+    assert log.messages(LOG_WARNING) == []
+    assert calls == []
+    assert log.messages() == ['1 2']
+    assert calls == [[1, 2]]
+  def test_capacity(self):
+    log = Diagnostics_Log(2)
+    for i in xrange(5):
+      log.info('%d', i)
+    assert len(log) == 2
+    assert log.dropped == 3
+    assert log.messages() == ['3', '4']
+  def test_pickle(self):
+    log = Diagnostics_Log(2)
+    log.info('%d', 1)
+    log.warning(lambda samples: ' '.join(map(str, samples)), [1, 2])
+    copy = loads(dumps(log, 2))
+    assert copy.messages() == ['1', '1 2']
+    assert copy.messages(LOG_WARNING) == ['1 2']
+    copy.info('%d', 3)
+    assert copy.messages() == ['1 2', '3']
+
+if __name__ == '__main__':
+  main()
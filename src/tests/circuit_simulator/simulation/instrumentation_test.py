@@ -0,0 +1,59 @@
+"""
+Unittests for instrumentation.py.
+"""
+
+__author__ = 'mikemeko@mit.edu (Michael Mekonnen)'
+
+from circuit_simulator.simulation.constants import PHASE_SOLVE
+from circuit_simulator.simulation.constants import PHASES
+from circuit_simulator.simulation.constants import SATURATION_LINEAR
+from circuit_simulator.simulation.constants import SATURATION_POSITIVE
+from circuit_simulator.simulation.instrumentation import Simulation_Stats
+from json import load
+from os import close
+from os import remove
+from tempfile import mkstemp
+from unittest import main
+from unittest import TestCase
+
+class Simulation_Stats_Test(TestCase):
+  """
+  Tests for circuit_simulator/simulation/instrumentation.
+  """
+  def test_laps(self):
+    stats = Simulation_Stats('DIRECT')
+    stats.lap(PHASE_SOLVE)
+    stats.lap(PHASE_SOLVE)
+    assert sorted(stats.phase_times) == sorted(PHASES)
+    assert stats.phase_times[PHASE_SOLVE] >= 0
+    assert all(stats.phase_times[phase] == 0 for phase in PHASES if phase !=
+        PHASE_SOLVE)
+  def test_saturation_events(self):
+    stats = Simulation_Stats('DIRECT')
+    for state in (SATURATION_LINEAR, SATURATION_POSITIVE, SATURATION_POSITIVE,
+        SATURATION_LINEAR):
+      stats.record_sample(1, True, 0.)
+      stats.record_op_amp(0, state)
+    assert stats.saturation_events == [(1, 0, SATURATION_POSITIVE), (3, 0,
+        SATURATION_LINEAR)]
+  def test_dump_json(self):
+    stats = Simulation_Stats('SOR')
+    stats.record_sample(3, True, 1e-12)
+    stats.record_sample(10000, False, 1e-3)
+    handle, file_name = mkstemp()
+    close(handle)
+    try:
+      stats.dump_json(file_name)
+      json_file = open(file_name)
+      dumped = load(json_file)
+      json_file.close()
+    finally:
+      remove(file_name)
+    assert dumped['solver'] == 'SOR'
+    assert dumped['num_samples'] == 2
+    assert dumped['iterations'] == [3, 10000]
+    assert dumped['converged'] == [True, False]
+    assert dumped['max_residual'] == 1e-3
+
+if __name__ == '__main__':
+  main()
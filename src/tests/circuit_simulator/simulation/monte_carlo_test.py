@@ -0,0 +1,47 @@
+"""
+Unittests for monte_carlo.py.
+"""
+
+__author__ = 'mikemeko@mit.edu (Michael Mekonnen)'
+
+from circuit_simulator.simulation.monte_carlo import monte_carlo
+from circuit_simulator.simulation.simulate import SimulationError
+from numpy import array_equal
+from tests.circuit_simulator.simulation.util import DIVIDER
+from tests.circuit_simulator.simulation.util import POT_DIVIDER
+from unittest import main
+from unittest import TestCase
+
+class Monte_Carlo_Test(TestCase):
+  """
+  Tests for circuit_simulator/simulation/monte_carlo.
+  """
+  def test_divider(self):
+    envelopes = monte_carlo(DIVIDER, [], 2000, num_samples=3,
+        num_processes=1)
+    assert envelopes.shape == (3, 1, 3)
+    low, median, high = envelopes[:, 0, 0]
+    assert 4.75 < low < median < high < 5.25
+    assert abs(median - 5) < 0.05
+  def test_deterministic(self):
+    first = monte_carlo(DIVIDER, [], 1200, num_samples=2, seed=3,
+        num_processes=1)
+    second = monte_carlo(DIVIDER, [], 1200, num_samples=2, seed=3,
+        num_processes=2)
+    assert array_equal(first, second)
+  def test_no_trials(self):
+    self.assertRaises(SimulationError, monte_carlo, DIVIDER, [], 0)
+  def test_pot(self):
+    alphas = [0.1 * i for i in xrange(10)]
+    envelopes = monte_carlo(POT_DIVIDER, [alphas], 100, num_samples=10,
+        num_processes=1)
+    for i, alpha in enumerate(alphas):
+      # the tolerance of a (nearly) unloaded pot barely changes its ratio
+      assert abs(envelopes[0, 0, i] - envelopes[2, 0, i]) < 0.01
+      assert abs(envelopes[1, 0, i] - 10 * max(alpha, 0.001)) < 0.01
+  def test_motors_not_supported(self):
+    self.assertRaises(SimulationError, monte_carlo, DIVIDER + [
+        'motor: (10,0)--(15,0)'], [], 10)
+
+if __name__ == '__main__':
+  main()
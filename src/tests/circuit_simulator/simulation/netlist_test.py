@@ -0,0 +1,50 @@
+"""
+Unittests for netlist.py.
+"""
+
+__author__ = 'mikemeko@mit.edu (Michael Mekonnen)'
+
+from circuit_simulator.simulation.netlist import Netlist_Line
+from circuit_simulator.simulation.netlist import parse_line
+from circuit_simulator.simulation.netlist import parse_netlist
+from unittest import main
+from unittest import TestCase
+
+class Netlist_Test(TestCase):
+  """
+  Tests for circuit_simulator/simulation/netlist.
+  """
+  def test_parse_resistor(self):
+    line = parse_line('resistor(1,0,3): (4,0)--(4,1)')
+    assert line.kind == 'resistor'
+    assert line.code == (1, 0, 3)
+    assert line.points == ((4, 0), (4, 1))
+  def test_parse_pot(self):
+    line = parse_line('pot: (7,1)--(8,0)--(9,1)')
+    assert line.kind == 'pot'
+    assert line.code is None
+    assert line.points == ((7, 1), (8, 0), (9, 1))
+  def test_parse_single_point(self):
+    for kind in ('+probe', '-probe', '+10', 'gnd'):
+      line = parse_line('%s: (12,0)' % kind)
+      assert line.kind == kind
+      assert line.points == ((12, 0),)
+  def test_parse_invalid(self):
+    assert parse_line('resistor: (4,0)--(4,1)') is None
+    assert parse_line('pot: (7,1)--(8,0)') is None
+    assert parse_line('opamp: (3,1)') is None
+    assert parse_line('capacitor: (1,0)--(2,0)') is None
+    assert parse_line('') is None
+  def test_round_trip(self):
+    for text in ('wire: (0,0)--(10,1)', 'resistor(2,2,1): (4,0)--(4,1)',
+        'pot: (7,1)--(8,0)--(9,1)', 'opamp: (3,1)--(3,0)', '-probe: (2,0)'):
+      assert str(parse_line(text)) == text
+  def test_parse_netlist(self):
+    resistor = Netlist_Line('resistor', ((0, 0), (0, 1)), (1, 0, 2))
+    lines = parse_netlist([resistor, 'wire: (0,1)--(1,0)', 'garbage',
+        'gnd: (1,0)'])
+    assert [line.kind for line in lines] == ['resistor', 'wire', 'gnd']
+    assert lines[0] is resistor
+
+if __name__ == '__main__':
+  main()
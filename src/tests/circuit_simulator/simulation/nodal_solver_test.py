@@ -0,0 +1,70 @@
+"""
+Unittests for nodal_solver.py.
+"""
+
+__author__ = 'mikemeko@mit.edu (Michael Mekonnen)'
+
+from circuit_simulator.simulation.nodal_solver import Nodal_Solver
+from tests.circuit_simulator.simulation.util import conductance_matrix
+from unittest import main
+from unittest import TestCase
+
+class Nodal_Solver_Test(TestCase):
+  """
+  Tests for circuit_simulator/simulation/nodal_solver.
+  """
+  def test_voltage_divider(self):
+    # 10V -- 1k -- node 1 -- 3k -- 0V
+    g_matrix = conductance_matrix(3, [(1000., 0, 1), (3000., 1, 2)])
+    solver = Nodal_Solver(g_matrix, [True, False, True])
+    v = solver.solve([10, 0, 0], [0, 0, 0])
+    self.assertAlmostEqual(v[0], 10)
+    self.assertAlmostEqual(v[1], 7.5)
+    self.assertAlmostEqual(v[2], 0)
+  def test_reuse_factorization(self):
+    g_matrix = conductance_matrix(3, [(1000., 0, 1), (1000., 1, 2)])
+    solver = Nodal_Solver(g_matrix, [True, False, True])
+    self.assertAlmostEqual(solver.solve([10, 0, 0], [0, 0, 0])[1], 5)
+    self.assertAlmostEqual(solver.solve([4, 0, 2], [0, 0, 0])[1], 3)
+  def test_multiple_systems(self):
+    g_matrix = conductance_matrix(3, [(1000., 0, 1), (1000., 1, 2)])
+    solver = Nodal_Solver(g_matrix, [True, False, True])
+    v = solver.solve([[10, 4], [0, 0], [0, 2]], [[0, 0]] * 3)
+    assert v.shape == (3, 2)
+    self.assertAlmostEqual(v[1, 0], 5)
+    self.assertAlmostEqual(v[1, 1], 3)
+  def test_current_injection(self):
+    # 1mA leaving node 1 through 1k to ground
+    g_matrix = conductance_matrix(2, [(1000., 0, 1)])
+    solver = Nodal_Solver(g_matrix, [True, False])
+    self.assertAlmostEqual(solver.solve([0, 0], [0, -0.001])[1], 1)
+  def test_floating_nodes(self):
+    # nodes 2 and 3 are not connected to any known node
+    g_matrix = conductance_matrix(4, [(1000., 0, 1), (5.26, 2, 3)])
+    solver = Nodal_Solver(g_matrix, [True, False, False, False])
+    v = solver.solve([10, 0, 0, 0], [0, 0, 0, 0])
+    self.assertAlmostEqual(v[1], 10)
+    self.assertAlmostEqual(v[2], 0)
+    self.assertAlmostEqual(v[3], 0)
+  def test_dynamic_conductances(self):
+    # ladder of 10 free nodes between 10V (node 0) and 0V (node 11), with two
+    #     pot-like branches that change
+    static = [(1000., i, i + 1) for i in xrange(11)]
+    branches = [(2, 7), (5, 11)]
+    known = [True] + [False] * 10 + [True]
+    solver = Nodal_Solver(conductance_matrix(12, static), known, branches,
+        [1e-3, 1e-3])
+    for conductances in ([1e-3, 1e-3], [5e-3, 1e-3], [1e-2, 2e-4],
+        [1e-2, 2e-4], [1e-3, 1e-3]):
+      solver.set_conductances(conductances)
+      full = conductance_matrix(12, static + [(1. / g, n1, n2) for (n1, n2), g
+          in zip(branches, conductances)])
+      expected = Nodal_Solver(full, known).solve([10] + [0] * 11, [0] * 12)
+      actual = solver.solve([10] + [0] * 11, [0] * 12)
+      for i in xrange(12):
+        self.assertAlmostEqual(actual[i], expected[i])
+      self.assertAlmostEqual(solver.conductance(5, 11), -conductances[1])
+      self.assertAlmostEqual(solver.conductance(2, 2), 2e-3 + conductances[0])
+
+if __name__ == '__main__':
+  main()
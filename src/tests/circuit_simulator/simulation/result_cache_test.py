@@ -0,0 +1,98 @@
+"""
+Unittests for result_cache.py.
+"""
+
+__author__ = 'mikemeko@mit.edu (Michael Mekonnen)'
+
+from circuit_simulator.simulation.constants import INTEGRATOR_EULER
+from circuit_simulator.simulation.constants import SOLVER_DIRECT
+from circuit_simulator.simulation.constants import SOLVER_RELAXATION
+from circuit_simulator.simulation.result_cache import Result_Cache
+from circuit_simulator.simulation.result_cache import RESULT_EXTENSION
+from circuit_simulator.simulation.result_cache import result_key
+from circuit_simulator.simulation.result_cache import _simulator_source_files
+from circuit_simulator.simulation.simulate import ListSignal
+from os import listdir
+from os import utime
+from os.path import basename
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from tests.circuit_simulator.simulation.util import DIVIDER
+from tests.circuit_simulator.simulation.util import non_inverting_amplifier
+from tests.circuit_simulator.simulation.util import solve_divider
+from unittest import main
+from unittest import TestCase
+
+def _args(alpha=0.5):
+  return (DIVIDER, [ListSignal([alpha] * 5)], [], [], ['pot'], [], [], [])
+
+def _key(args, num_samples=5):
+  return result_key(args, num_samples, 0.02, SOLVER_DIRECT, INTEGRATOR_EULER)
+
+class Result_Cache_Test(TestCase):
+  """
+  Tests for circuit_simulator/simulation/result_cache.
+  """
+  def setUp(self):
+    self.directory = mkdtemp()
+  def tearDown(self):
+    rmtree(self.directory)
+  def test_key(self):
+    assert _key(_args()) == _key(_args())
+    assert _key(_args()) != _key(_args(0.6))
+    assert _key(_args()) != _key(_args(), 6)
+  def test_get_put(self):
+    cache = Result_Cache(self.directory)
+    key = _key(_args())
+    assert cache.get(key) is None
+    result = solve_divider(SOLVER_DIRECT)
+    cache.put(key, result)
+    stored = cache.get(key)
+    assert stored.probes == result.probes
+    assert stored.output() == result.output()
+    # unreadable results are misses
+    corrupt_file = open(join(self.directory, listdir(self.directory)[0]), 'wb')
+    corrupt_file.write('not a result')
+    corrupt_file.close()
+    assert cache.get(key) is None
+    assert cache.size() == 0
+  def test_evict(self):
+    cache = Result_Cache(self.directory)
+    result = solve_divider(SOLVER_DIRECT)
+    keys = [_key(_args(alpha)) for alpha in (0.1, 0.2, 0.3)]
+    # last used in order, long before the reads and writes below
+    for i, key in enumerate(keys):
+      cache.put(key, result)
+      utime(join(self.directory, key + RESULT_EXTENSION), (i + 1, i + 1))
+    size = cache.size() / 3
+    cache.get(keys[0])
+    cache.max_bytes = 3 * size
+    cache.put(_key(_args(0.4)), result)
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[2]) is not None
+    cache.clear()
+    assert cache.size() == 0
+  def test_source_files(self):
+    file_names = map(basename, _simulator_source_files())
+    for file_name in ('diagnostics.py', 'instrumentation.py', 'simulate.py',
+        'sparse_solver.py', 'disjoint_set_forest.py'):
+      assert file_name in file_names
+  def test_simulate(self):
+    cache = Result_Cache(self.directory)
+    circuit = non_inverting_amplifier()
+    first = circuit.simulate(solver=SOLVER_DIRECT, cache=cache)
+    assert len(listdir(self.directory)) == 1
+    second = circuit.simulate(solver=SOLVER_DIRECT, cache=cache)
+    assert second is not first
+    assert second.probes == first.probes
+    # relaxation results are random, and are only cached when reproducible
+    circuit.simulate(solver=SOLVER_RELAXATION, cache=cache)
+    assert len(listdir(self.directory)) == 1
+    circuit.simulate(solver=SOLVER_RELAXATION, cache=cache, seed=1)
+    circuit.simulate(solver=SOLVER_RELAXATION, cache=cache, deterministic=True)
+    assert len(listdir(self.directory)) == 3
+
+if __name__ == '__main__':
+  main()
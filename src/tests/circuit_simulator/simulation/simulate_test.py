@@ -0,0 +1,229 @@
+"""
+Unittests for simulate.py.
+"""
+
+__author__ = 'mikemeko@mit.edu (Michael Mekonnen)'
+
+from circuit_simulator.simulation.constants import INTEGRATOR_EULER
+from circuit_simulator.simulation.constants import INTEGRATOR_RK4
+from circuit_simulator.simulation.benchmark import ladder_circuit
+from circuit_simulator.simulation.constants import LOG_WARNING
+from circuit_simulator.simulation.constants import SPARSE_MIN_NODES
+from circuit_simulator.simulation.constants import SOLVER_DIRECT
+from circuit_simulator.simulation.constants import SOLVER_RELAXATION
+from circuit_simulator.simulation.constants import SOLVER_SOR
+from circuit_simulator.simulation import simulate
+from circuit_simulator.simulation.simulate import findIslands
+from circuit_simulator.simulation.simulate import ListSignal
+from circuit_simulator.simulation.simulate import MultipleSources
+from circuit_simulator.simulation.simulate import OpAmp
+from circuit_simulator.simulation.simulate import Resistor
+from circuit_simulator.simulation.simulate import VoltageSource
+from circuit_simulator.simulation.simulate import solve
+from circuit_simulator.simulation.simulate import solveOpAmps
+from circuit_simulator.simulation.simulate import Stamps
+from math import cos
+from math import pi
+from numpy import array
+from random import getstate
+from threading import Thread
+from tests.circuit_simulator.simulation.util import DIVIDER
+from tests.circuit_simulator.simulation.util import MOTOR
+from tests.circuit_simulator.simulation.util import non_inverting_amplifier
+from tests.circuit_simulator.simulation.util import POT_DIVIDER
+from tests.circuit_simulator.simulation.util import schmitt_trigger
+from tests.circuit_simulator.simulation.util import solve_divider
+from tests.circuit_simulator.simulation.util import spin_motor
+from unittest import main
+from unittest import TestCase
+
+# two pots in series across the supply, their wipers tied together by 10 ohms,
+#     probed at the top wiper; slow to relax
+COUPLED_POTS = ['+10: (0,0)', 'gnd: (0,1)', 'pot: (1,1)--(2,0)--(3,1)',
+    'pot: (3,1)--(5,0)--(6,1)', 'resistor(1,0,0): (2,0)--(5,0)',
+    'wire: (0,0)--(1,1)', 'wire: (0,1)--(6,1)', '+probe: (2,0)',
+    '-probe: (0,1)']
+
+class Fixed_Solver:
+  """
+  Nodal solver that always returns the same voltages.
+  """
+  def __init__(self, voltages):
+    self.voltages = array(voltages)
+  def solve(self, voltages, currents):
+    return self.voltages
+
+class Simulate_Test(TestCase):
+  """
+  Tests for circuit_simulator/simulation/simulate.
+  """
+  def test_divider(self):
+    for solver in (SOLVER_DIRECT, SOLVER_RELAXATION, SOLVER_SOR):
+      result = solve_divider(solver)
+      assert result.nodeNames == ['a', 'b', 'c']
+      assert len(result.voltages) == 5
+      assert result.converged == [True] * 5
+      assert len(result.probes) == 1
+      assert all(abs(v - 5) < 0.05 for v in result.probes[0])
+      assert [title for title, samples, y0, y1 in result.signals] == ['probe']
+      assert result.output().endswith('probe:  4.98  4.98  4.98  4.98  4.98\n')
+      assert result.output(LOG_WARNING) == ''
+  def test_warm_start(self):
+    # every step after the first starts from the previous solution, and still
+    #     relaxes to the same answer as the direct solver
+    alphas = ListSignal([0.5 + 0.5 * cos(pi * k / 25) for k in xrange(50)])
+    args = (COUPLED_POTS, [alphas, alphas], [], [], ['p', 'q'], [], [], [])
+    direct = solve(*args, nSamples=50, solver=SOLVER_DIRECT)
+    relaxed = solve(*args, nSamples=50, solver=SOLVER_RELAXATION)
+    assert relaxed.iterations[1] < relaxed.iterations[0]
+    assert all(abs(v - w) < 0.5 for v, w in zip(direct.probes[0],
+        relaxed.probes[0]))
+  def test_repeated_inputs(self):
+    # inputs that do not change are only solved for once
+    for solver in (SOLVER_DIRECT, SOLVER_RELAXATION, SOLVER_SOR):
+      result = solve_divider(solver)
+      assert result.iterations[0] > 0
+      assert result.iterations[1:] == [0] * 4
+      assert result.voltages[1:] == result.voltages[:-1]
+      assert result.voltages[1] is not result.voltages[0]
+    # motors carry state from one sample to the next
+    result = solve(MOTOR, [], [], [], [], [], [], ['m'], nSamples=5,
+        solver=SOLVER_DIRECT)
+    assert all(result.iterations)
+  def test_solution_cache_size(self):
+    # the number of solutions kept shrinks with the size of the circuit
+    alphas = ListSignal([0.2, 0.5, 0.2, 0.5])
+    num_nodes = len(solve(POT_DIVIDER, [alphas], [], [], ['p'], [], [], [],
+        nSamples=4, solver=SOLVER_DIRECT).nodeNames)
+    values = simulate.SOLUTION_CACHE_VALUES
+    simulate.SOLUTION_CACHE_VALUES = 3 * num_nodes
+    try:
+      result = solve(POT_DIVIDER, [alphas], [], [], ['p'], [], [], [],
+          nSamples=4, solver=SOLVER_DIRECT)
+    finally:
+      simulate.SOLUTION_CACHE_VALUES = values
+    assert result.iterations[2] == 0
+    assert result.iterations[3] > 0
+    assert result.probes[0][1] == result.probes[0][3]
+  def test_hysteresis(self):
+    # the same pot setting gives either output, depending on the one before
+    for solver in (SOLVER_DIRECT, SOLVER_SOR):
+      result = solve(schmitt_trigger(), [ListSignal([0.2, 0.5, 0.8, 0.5, 0.2,
+          0.5])], [], [], ['p'], [], [], [], nSamples=6, solver=solver)
+      assert [round(v, 6) for v in result.probes[0]] == [0, 0, 10, 10, 0, 0]
+      # only revisiting both the pot setting and the op amp state is free
+      assert result.iterations[5] == 0
+      assert all(result.iterations[:5])
+  def test_integrators(self):
+    angle, speed = spin_motor(0.001, INTEGRATOR_RK4)
+    # Euler is the default
+    assert spin_motor(0.05) == spin_motor(0.05, INTEGRATOR_EULER)
+    assert abs(spin_motor(0.05)[0] - angle) > 0.1
+    # RK4 stays accurate at much larger steps
+    rk4_angle, rk4_speed = spin_motor(0.05, INTEGRATOR_RK4)
+    assert abs(rk4_angle - angle) < 1e-6
+    assert abs(rk4_speed - speed) < 1e-6
+  def test_op_amp(self):
+    # 15V is out of the rails, the output clips to the positive rail
+    amplifier = non_inverting_amplifier().cmax_netlist()
+    first = solve(amplifier, [], [], [], [], [], [], [], nSamples=3,
+        solver=SOLVER_DIRECT)
+    assert all(abs(v - 10) < 1e-6 for v in first.probes[0])
+    assert first.converged == [True] * 3
+    second = solve(amplifier, [], [], [], [], [], [], [], nSamples=3,
+        solver=SOLVER_DIRECT)
+    assert first.probes == second.probes
+  def test_op_amps_unconverged(self):
+    # two coupled op amps whose clip states keep changing: node 0 is the
+    #     positive rail, node 1 the negative one, nodes 2 and 3 the outputs
+    sensitivities = array([[0, 0], [0, 0], [1, 0], [0, 1], [0, 2], [2, -1],
+        [0, 0], [2, 0]], dtype=float)
+    op_amps = [OpAmp(2, 4, 5, 0, 1), OpAmp(3, 6, 7, 0, 1)]
+    solver = Fixed_Solver([10, 0, 0, 0, 0.5, -2, -1, 1])
+    voltages, iterations, converged = solveOpAmps(solver, sensitivities,
+        op_amps, [0, 0], [0.] * 8, [0.] * 8)
+    assert not converged
+    voltages, iterations, converged = solveOpAmps(solver, sensitivities[:, :1],
+        op_amps[:1], [0], [0.] * 8, [0.] * 8)
+    assert converged
+  def test_instrument(self):
+    assert solve_divider(SOLVER_DIRECT).stats is None
+    for solver in (SOLVER_DIRECT, SOLVER_RELAXATION, SOLVER_SOR):
+      stats = solve(DIVIDER, [], [], [], [], [], [], [], nSamples=5,
+          solver=solver, instrument=True).stats
+      assert stats.num_nodes == 3
+      assert len(stats.residuals) == 5
+      assert max(stats.residuals) < 1e-5
+    stats = solve(non_inverting_amplifier().cmax_netlist(), [], [], [], [], [],
+        [], [], nSamples=3, solver=SOLVER_DIRECT, instrument=True).stats
+    assert stats.saturation_events == [(0, 0, 'positive')]
+  def test_seed(self):
+    amplifier = non_inverting_amplifier().cmax_netlist()
+    def run(**kwargs):
+      return solve(amplifier, [], [], [], [], [], [], [], nSamples=3,
+          solver=SOLVER_RELAXATION, **kwargs).voltages
+    state = getstate()
+    assert run(seed=1) == run(seed=1)
+    assert run(seed=1) != run(seed=2)
+    assert run(deterministic=True) == run(deterministic=True)
+    # the global random state is left alone
+    run()
+    assert getstate() == state
+  def test_results_are_independent(self):
+    first = solve_divider(SOLVER_DIRECT)
+    second = solve_divider(SOLVER_DIRECT)
+    assert first.log.messages() == second.log.messages()
+    assert first.log is not second.log
+  def test_find_islands(self):
+    # 0 and 1 are driven, 2 and 3 only reach the op amp's input, 4 is left out
+    parts = [VoltageSource(10, 0), Resistor(1000, 0, 1), Resistor(1000, 2, 3),
+        OpAmp(1, 2, 1, 0, 0)]
+    assert findIslands(5, parts) == ([4], [[2, 3]])
+    assert findIslands(4, parts[:2]) == ([2, 3], [])
+  def test_island(self):
+    # a resistor that is connected to nothing else is held at 0V, quietly
+    for solver in (SOLVER_DIRECT, SOLVER_RELAXATION, SOLVER_SOR):
+      result = solve(DIVIDER + ['resistor(1,0,3): (5,0)--(6,0)'], [], [], [],
+          [], [], [], [], nSamples=3, solver=solver)
+      assert result.output(LOG_WARNING) == ''
+      assert any(message.endswith('Holding the node at (5,0) at 0V.') for
+          message in result.log.messages())
+      assert result.probes == solve_divider(solver, 3).probes
+      assert [v[3:] for v in result.voltages] == [[0., 0.]] * 3
+  def test_stamps(self):
+    stamps = Stamps()
+    Resistor(1000, 0, 1).addConductance(stamps)
+    Resistor(500, 1, 2).addConductance(stamps)
+    VoltageSource(10, 0).addConductance(stamps)
+    assert stamps.matrix(3).toarray().tolist() == [[1e6 + 1e-3, -1e-3, 0],
+        [-1e-3, 3e-3, -2e-3], [0, -2e-3, 2e-3]]
+  def test_sparse(self):
+    # large circuits are assembled and solved as sparse matrices
+    ladder = ladder_circuit(SPARSE_MIN_NODES).cmax_netlist()
+    sparse = solve(ladder, [], [], [], [], [], [], [], nSamples=2,
+        solver=SOLVER_DIRECT, instrument=True)
+    assert len(sparse.nodeNames) >= SPARSE_MIN_NODES
+    assert max(sparse.stats.residuals) < 1e-9
+    relaxed = solve(ladder, [], [], [], [], [], [], [], nSamples=2,
+        solver=SOLVER_SOR)
+    assert max(abs(a - b) for a, b in zip(sparse.voltages[-1],
+        relaxed.voltages[-1])) < 1e-6
+  def test_multiple_sources(self):
+    try:
+      solve(['+10: (0,0)', 'gnd: (0,0)'], [], [], [], [], [], [], [])
+      self.fail('expected MultipleSources')
+    except MultipleSources, e:
+      assert e.messages[-1] == 'Voltage on node 0 set by multiple sources.'
+  def test_threads(self):
+    results = [None] * 4
+    def run(i):
+      results[i] = solve_divider(SOLVER_DIRECT, 20)
+    threads = [Thread(target=run, args=(i,)) for i in xrange(len(results))]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    assert all(result.probes == results[0].probes for result in results)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,96 @@
+"""
+Unittests for small_signal.py.
+"""
+
+__author__ = 'mikemeko@mit.edu (Michael Mekonnen)'
+
+from circuit_simulator.simulation.constants import INPUT_LAMP_ANGLE
+from circuit_simulator.simulation.constants import INPUT_POT_ALPHA
+from circuit_simulator.simulation.constants import INTEGRATOR_RK4
+from circuit_simulator.simulation.constants import SATURATION_POSITIVE
+from circuit_simulator.simulation.simulate import NonexistentPart
+from circuit_simulator.simulation.small_signal import ac_sweep
+from circuit_simulator.simulation.small_signal import operating_point
+from math import pi
+from tests.circuit_simulator.simulation.util import MOTOR
+from tests.circuit_simulator.simulation.util import non_inverting_amplifier
+from tests.circuit_simulator.simulation.util import POT_DIVIDER
+from tests.circuit_simulator.simulation.util import spin_motor
+from unittest import main
+from unittest import TestCase
+
+# motor driven by the wiper of a pot across the supply
+POT_MOTOR = POT_DIVIDER + ['motor: (10,0)--(16,0)', 'wire: (3,0)--(14,0)',
+    'wire: (1,0)--(15,0)']
+
+# head turned by its motor until the wiper of its pot matches that of a pot
+HEAD_SERVO = POT_DIVIDER + ['head: (20,0)--(27,0)', 'wire: (0,0)--(20,0)',
+    'wire: (1,0)--(22,0)', 'wire: (3,0)--(26,0)', 'wire: (21,0)--(27,0)']
+
+# head photodiode across a 10M resistor, probed across the resistor
+PHOTODIODE = ['gnd: (1,0)', 'head: (20,0)--(27,0)', 'wire: (1,0)--(24,0)',
+    'resistor(1,0,6): (23,0)--(1,0)', '+probe: (23,0)', '-probe: (1,0)']
+
+class Small_Signal_Test(TestCase):
+  """
+  Tests for circuit_simulator/simulation/small_signal.
+  """
+  def test_operating_point(self):
+    point = operating_point(POT_DIVIDER, pot_alphas=[0.3])
+    assert point.voltages.shape == (3,)
+    assert abs(point.probes[0] - 3) < 0.01
+    assert point.speeds == []
+    point = non_inverting_amplifier().operating_point()
+    assert abs(point.probes[0] - 10) < 1e-6
+    assert point.op_amp_states[0] == SATURATION_POSITIVE
+  def test_motor_speed(self):
+    # the speed the transient settles to
+    speed = operating_point(MOTOR).speeds[0]
+    assert abs(speed - spin_motor(0.001, INTEGRATOR_RK4)[1]) < 1e-6
+  def test_resistive(self):
+    # no motors, the response is flat
+    result = ac_sweep(POT_DIVIDER, INPUT_POT_ALPHA, 0, [0, 1, 100],
+        pot_alphas=[0.3])
+    assert result.shape == (3, 1)
+    assert abs(result[0, 0] - 10) < 0.05
+    assert abs(result[2, 0] - result[0, 0]) < 1e-9
+    result = ac_sweep(POT_DIVIDER, INPUT_POT_ALPHA, 0, [1], nodes=True)
+    assert result.shape == (1, 3)
+  def test_motor(self):
+    frequencies = [1e-3, 1, 10]
+    result = ac_sweep(POT_MOTOR, INPUT_POT_ALPHA, 0, frequencies,
+        pot_alphas=[0.3])
+    assert result.shape == (3, 3)
+    # probe, then the angle and velocity of the motor
+    step = 1e-5
+    low = operating_point(POT_MOTOR, pot_alphas=[0.3 - step])
+    high = operating_point(POT_MOTOR, pot_alphas=[0.3 + step])
+    probe = (high.probes[0] - low.probes[0]) / (2 * step)
+    speed = (high.speeds[0] - low.speeds[0]) / (2 * step)
+    assert abs(result[0, 0] - probe) < 1e-6
+    assert abs(result[0, 2] - speed) < 1e-5
+    for frequency, (probe, angle, velocity) in zip(frequencies, result):
+      self.assertAlmostEqual(velocity, 2j * pi * frequency * angle)
+    # the motor's inertia filters out fast inputs
+    assert abs(result[2, 2]) < abs(result[1, 2]) < abs(result[0, 2])
+  def test_head_servo(self):
+    # at low frequencies the head turns its pot to follow the other pot, by
+    #     one turn per unit of alpha
+    result = ac_sweep(HEAD_SERVO, INPUT_POT_ALPHA, 0, [1e-7])
+    assert result.shape == (1, 3)
+    assert abs(result[0, 0] - 10) < 0.05
+    assert abs(result[0, 1] - 2 * pi) < 0.05
+  def test_lamp_angle(self):
+    result = ac_sweep(PHOTODIODE, INPUT_LAMP_ANGLE, 0, [1], lamp_angles=[0.1])
+    step = 1e-5
+    low = operating_point(PHOTODIODE, lamp_angles=[0.1 - step]).probes[0]
+    high = operating_point(PHOTODIODE, lamp_angles=[0.1 + step]).probes[0]
+    assert high != low
+    assert abs(result[0, 0] - (high - low) / (2 * step)) < 1e-6 * abs(
+        result[0, 0])
+  def test_nonexistent_part(self):
+    self.assertRaises(NonexistentPart, ac_sweep, POT_DIVIDER,
+        INPUT_LAMP_ANGLE, 0, [1])
+
+if __name__ == '__main__':
+  main()
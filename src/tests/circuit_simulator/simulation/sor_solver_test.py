@@ -0,0 +1,61 @@
+"""
+Unittests for sor_solver.py.
+"""
+
+__author__ = 'mikemeko@mit.edu (Michael Mekonnen)'
+
+from circuit_simulator.simulation.nodal_solver import Nodal_Solver
+from circuit_simulator.simulation.sor_solver import SOR_Solver
+from tests.circuit_simulator.simulation.util import conductance_matrix
+from unittest import main
+from unittest import TestCase
+
+class SOR_Solver_Test(TestCase):
+  """
+  Tests for circuit_simulator/simulation/sor_solver.
+  """
+  def test_voltage_divider(self):
+    # 10V -- 1k -- node 1 -- 3k -- 0V
+    g_matrix = conductance_matrix(3, [(1000., 0, 1), (3000., 1, 2)])
+    solver = SOR_Solver(g_matrix, [True, False, True])
+    v = solver.solve([10, 0, 0], [0, 0, 0])
+    self.assertAlmostEqual(v[0], 10)
+    self.assertAlmostEqual(v[1], 7.5)
+    self.assertAlmostEqual(v[2], 0)
+    assert solver.unconverged == 0
+  def test_multiple_systems(self):
+    g_matrix = conductance_matrix(3, [(1000., 0, 1), (1000., 1, 2)])
+    solver = SOR_Solver(g_matrix, [True, False, True])
+    v = solver.solve([[10, 4], [0, 0], [0, 2]], [[0, 0]] * 3)
+    assert v.shape == (3, 2)
+    self.assertAlmostEqual(v[1, 0], 5)
+    self.assertAlmostEqual(v[1, 1], 3)
+  def test_warm_start(self):
+    g_matrix = conductance_matrix(3, [(1000., 0, 1), (1000., 1, 2)])
+    solver = SOR_Solver(g_matrix, [True, False, True])
+    solver.solve([10, 5, 0], [0, 0, 0])
+    assert solver.sweeps == 0
+  def test_ladder(self):
+    # ladder of 50 free nodes between 10V (node 0) and 0V (node 51), with two
+    #     pot-like branches that change, against the direct solver
+    static = [(1000., i, i + 1) for i in xrange(51)] + [(1e5, i, 51) for i in
+        xrange(1, 51)]
+    branches = [(2, 37), (25, 51)]
+    known = [True] + [False] * 50 + [True]
+    solver = SOR_Solver(conductance_matrix(52, static), known, branches,
+        [1e-3, 1e-3])
+    guess = [10] + [0] * 51
+    for conductances in ([1e-3, 1e-3], [5e-3, 1e-3], [1e-2, 2e-4]):
+      solver.set_conductances(conductances)
+      full = conductance_matrix(52, static + [(1. / g, n1, n2) for (n1, n2), g
+          in zip(branches, conductances)])
+      expected = Nodal_Solver(full, known).solve([10] + [0] * 51, [0] * 52)
+      guess = solver.solve(guess, [0] * 52)
+      for i in xrange(52):
+        self.assertAlmostEqual(guess[i], expected[i], places=5)
+    assert solver.unconverged == 0
+    # the relaxation factor has moved away from Gauss-Seidel
+    assert solver._omega > 1.5
+
+if __name__ == '__main__':
+  main()
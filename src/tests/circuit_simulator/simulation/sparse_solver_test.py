@@ -0,0 +1,67 @@
+"""
+Unittests for sparse_solver.py.
+"""
+
+__author__ = 'mikemeko@mit.edu (Michael Mekonnen)'
+
+from circuit_simulator.simulation.nodal_solver import Nodal_Solver
+from circuit_simulator.simulation.sparse_solver import Sparse_Solver
+from scipy.sparse import csr_matrix
+from tests.circuit_simulator.simulation.util import conductance_matrix
+from unittest import main
+from unittest import TestCase
+
+class Sparse_Solver_Test(TestCase):
+  """
+  Tests for circuit_simulator/simulation/sparse_solver.
+  """
+  def test_voltage_divider(self):
+    # 10V -- 1k -- node 1 -- 3k -- 0V
+    g_matrix = conductance_matrix(3, [(1000., 0, 1), (3000., 1, 2)])
+    solver = Sparse_Solver(csr_matrix(g_matrix), [True, False, True])
+    v = solver.solve([10, 0, 0], [0, 0, 0])
+    self.assertAlmostEqual(v[0], 10)
+    self.assertAlmostEqual(v[1], 7.5)
+    self.assertAlmostEqual(v[2], 0)
+  def test_multiple_systems(self):
+    g_matrix = conductance_matrix(3, [(1000., 0, 1), (1000., 1, 2)])
+    solver = Sparse_Solver(g_matrix, [True, False, True])
+    v = solver.solve([[10, 4], [0, 0], [0, 2]], [[0, 0]] * 3)
+    assert v.shape == (3, 2)
+    self.assertAlmostEqual(v[1, 0], 5)
+    self.assertAlmostEqual(v[1, 1], 3)
+  def test_floating_nodes(self):
+    # nodes 2 and 3 are not connected to any known node
+    g_matrix = conductance_matrix(4, [(1000., 0, 1), (5.26, 2, 3)])
+    solver = Sparse_Solver(g_matrix, [True, False, False, False])
+    v = solver.solve([10, 0, 0, 0], [0, 0.001, 0, 0])
+    self.assertAlmostEqual(v[1], 9)
+    self.assertAlmostEqual(v[2], 0)
+    self.assertAlmostEqual(v[3], 0)
+  def test_matches_nodal_solver(self):
+    # ladder of 60 free nodes between 10V (node 0) and 0V (node 61), with
+    #     rungs to ground and three pot-like branches that change, so that both
+    #     the low-rank updates and the refactorizations are exercised
+    N = 62
+    static = [(1000., i, i + 1) for i in xrange(N - 1)] + [(1e5, i, N - 1) for
+        i in xrange(1, N - 1, 3)]
+    branches = [(2, 7), (5, 61), (30, 45)]
+    known = [True] + [False] * (N - 2) + [True]
+    g_matrix = conductance_matrix(N, static)
+    sparse = Sparse_Solver(csr_matrix(g_matrix), known, branches, [1e-3] * 3)
+    dense = Nodal_Solver(g_matrix, known, branches, [1e-3] * 3)
+    voltages = [[10, 3]] + [[0, 0]] * (N - 1)
+    currents = [[0, 0]] * N
+    currents[20] = [1e-3, -1e-3]
+    for conductances in ([1e-3, 1e-3, 1e-3], [5e-3, 1e-3, 1e-3],
+        [1e-2, 2e-4, 1e-3], [1e-4, 1e-4, 1e-4], [1e-3, 1e-3, 1e-3]):
+      sparse.set_conductances(conductances)
+      dense.set_conductances(conductances)
+      expected = dense.solve(voltages, currents)
+      actual = sparse.solve(voltages, currents)
+      assert abs(actual - expected).max() < 1e-9
+      self.assertAlmostEqual(sparse.conductance(5, 61), -conductances[1])
+      self.assertAlmostEqual(sparse.conductance(2, 2), 2e-3 + conductances[0])
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,71 @@
+"""
+Unittests for streaming.py.
+"""
+
+__author__ = 'mikemeko@mit.edu (Michael Mekonnen)'
+
+from circuit_simulator.simulation.constants import SOLVER_DIRECT
+from circuit_simulator.simulation.simulate import SimulationStream
+from circuit_simulator.simulation.streaming import num_traces
+from circuit_simulator.simulation.streaming import record_traces
+from circuit_simulator.simulation.streaming import trace_chunks
+from numpy import load
+from numpy import zeros
+from os import close
+from os import remove
+from tempfile import mkstemp
+from tests.circuit_simulator.simulation.util import DIVIDER
+from tests.circuit_simulator.simulation.util import solve_divider
+from unittest import main
+from unittest import TestCase
+
+def _divider_stream(n_samples):
+  return SimulationStream(DIVIDER, [], [], [], [], [], [], [],
+      nSamples=n_samples, solver=SOLVER_DIRECT)
+
+class Streaming_Test(TestCase):
+  """
+  Tests for circuit_simulator/simulation/streaming.
+  """
+  def test_stream(self):
+    stream = _divider_stream(7)
+    assert stream.numProbes == 1
+    assert stream.motorLabels == []
+    assert stream.result.nodeNames == ['a', 'b', 'c']
+    samples = list(stream)
+    assert [probes for voltages, probes, motors in samples] == [[p] for p in
+        solve_divider(SOLVER_DIRECT, 7).probes[0]]
+    assert stream.result.voltages == []
+  def test_trace_chunks(self):
+    stream = _divider_stream(10)
+    assert num_traces(stream) == 1
+    chunks = list(trace_chunks(stream, 4))
+    assert [start for start, chunk in chunks] == [0, 4, 8]
+    assert [chunk.shape for start, chunk in chunks] == [(1, 4), (1, 4), (1, 2)]
+  def test_no_traces(self):
+    # nothing probed and no motors
+    stream = SimulationStream(DIVIDER[:3], [], [], [], [], [], [], [],
+        nSamples=5, solver=SOLVER_DIRECT)
+    assert num_traces(stream) == 0
+    chunks = list(trace_chunks(stream, 4))
+    assert [(start, chunk.shape) for start, chunk in chunks] == [(0, (0, 4)),
+        (4, (0, 1))]
+  def test_record_traces(self):
+    expected = solve_divider(SOLVER_DIRECT, 10).probes
+    out = zeros((1, 10))
+    assert record_traces(_divider_stream(10), out, chunk_size=3) is out
+    assert out.tolist() == expected
+    # a preallocated array is filled in, even with a file name
+    out = zeros((1, 10))
+    record_traces(_divider_stream(10), out, file_name='unused.npy')
+    assert out.tolist() == expected
+    handle, file_name = mkstemp(suffix='.npy')
+    close(handle)
+    try:
+      record_traces(_divider_stream(10), file_name=file_name, chunk_size=3)
+      assert load(file_name).tolist() == expected
+    finally:
+      remove(file_name)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,40 @@
+"""
+Unittests for sweep.py.
+"""
+
+__author__ = 'mikemeko@mit.edu (Michael Mekonnen)'
+
+from circuit_simulator.simulation.constants import SWEEP_POT_ALPHA
+from circuit_simulator.simulation.constants import SWEEP_RESISTANCE
+from circuit_simulator.simulation.simulate import NonexistentPart
+from circuit_simulator.simulation.sweep import sweep
+from tests.circuit_simulator.simulation.util import non_inverting_amplifier
+from tests.circuit_simulator.simulation.util import POT_DIVIDER
+from unittest import main
+from unittest import TestCase
+
+class Sweep_Test(TestCase):
+  """
+  Tests for circuit_simulator/simulation/sweep.
+  """
+  def test_pot_alpha(self):
+    alphas = [0.1, 0.25, 0.5, 0.9]
+    result = sweep(POT_DIVIDER, SWEEP_POT_ALPHA, 0, alphas)
+    assert result.shape == (4, 1)
+    for alpha, voltage in zip(alphas, result[:, 0]):
+      assert abs(voltage - 10 * alpha) < 0.01
+  def test_nodes(self):
+    result = sweep(POT_DIVIDER, SWEEP_POT_ALPHA, 0, [0.5, 0.7], nodes=True)
+    assert result.shape == (2, 3)
+  def test_op_amp_clipping(self):
+    result = non_inverting_amplifier().sweep(SWEEP_RESISTANCE, 0, [9000, 4000,
+        1000])
+    assert result.shape == (3, 1)
+    for expected, voltage in zip([3, 6, 10], result[:, 0]):
+      assert abs(voltage - expected) < 0.01
+  def test_nonexistent_part(self):
+    self.assertRaises(NonexistentPart, sweep, POT_DIVIDER, SWEEP_RESISTANCE,
+        0, [1000])
+
+if __name__ == '__main__':
+  main()
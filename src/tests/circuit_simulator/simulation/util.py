@@ -0,0 +1,82 @@
+"""
+Utilities for testing.
+"""
+
+__author__ = 'mikemeko@mit.edu (Michael Mekonnen)'
+
+from circuit_simulator.main.constants import GROUND
+from circuit_simulator.main.constants import POWER
+from circuit_simulator.simulation.circuit import Circuit
+from circuit_simulator.simulation.circuit import Op_Amp
+from circuit_simulator.simulation.circuit import Probe
+from circuit_simulator.simulation.circuit import Resistor
+from circuit_simulator.simulation.circuit import Signalled_Pot
+from circuit_simulator.simulation.circuit import Voltage_Source
+from circuit_simulator.simulation.constants import INTEGRATOR_EULER
+from circuit_simulator.simulation.constants import SOLVER_DIRECT
+from circuit_simulator.simulation.simulate import solve
+
+# 10V across two 1k resistors in series, probed across the bottom one
+DIVIDER = ['+10: (0,0)', 'gnd: (1,0)', 'resistor(1,0,3): (0,0)--(2,0)',
+    'resistor(1,0,3): (2,0)--(1,0)', '+probe: (2,0)', '-probe: (1,0)']
+
+# pot across the supply, probed at its wiper
+POT_DIVIDER = ['+10: (0,0)', 'gnd: (1,0)', 'pot: (2,1)--(3,0)--(4,1)',
+    'wire: (0,0)--(2,1)', 'wire: (1,0)--(4,1)', '+probe: (3,0)',
+    '-probe: (1,0)']
+
+# motor spun up by 10V
+MOTOR = ['+10: (4,0)', 'gnd: (5,0)', 'motor: (0,0)--(6,0)']
+
+def conductance_matrix(N, resistors):
+  """
+  Returns the N x N conductance matrix for the given |resistors|, a list of
+      tuples of the form (r, n1, n2).
+  """
+  g_matrix = [[0.0] * N for i in xrange(N)]
+  for r, n1, n2 in resistors:
+    g_matrix[n1][n1] += 1. / r
+    g_matrix[n1][n2] -= 1. / r
+    g_matrix[n2][n1] -= 1. / r
+    g_matrix[n2][n2] += 1. / r
+  return g_matrix
+
+def solve_divider(solver, n_samples=5):
+  return solve(DIVIDER, [], [], [], [], [], [], [], nSamples=n_samples,
+      solver=solver)
+
+def spin_motor(time_step, integrator=INTEGRATOR_EULER, duration=1.):
+  """
+  Returns the (angle, speed) of the motor after |duration| seconds.
+  """
+  angles, speeds = solve(MOTOR, [], [], [], [], [], [], ['m'],
+      nSamples=int(round(duration / time_step)), deltaT=time_step,
+      solver=SOLVER_DIRECT, integrator=integrator).motors['m']
+  return angles[-1], speeds[-1]
+
+def non_inverting_amplifier():
+  """
+  Returns a Circuit that amplifies the output of a divider (the first resistor
+      is the top of the divider) by 3.
+  """
+  return Circuit([Voltage_Source(POWER, GROUND, 'i', 10),
+      Resistor(POWER, 'in', 'i1', 1000), Resistor('in', GROUND, 'i2', 1000),
+      Op_Amp('in', 'minus', 'ia', 'out', GROUND, 'ib'),
+      Resistor('out', 'minus', 'i3', 2000),
+      Resistor('minus', GROUND, 'i4', 1000), Probe('+', 'out'),
+      Probe('-', GROUND)], GROUND, solve=False)
+
+def schmitt_trigger():
+  """
+  Returns the CMax netlist of a non-inverting Schmitt trigger driven by a pot,
+      whose output goes high above a wiper voltage of about 5.5V and low again
+      below about 4.5V.
+  """
+  return Circuit([Voltage_Source(POWER, GROUND, 'i', 10),
+      Signalled_Pot(POWER, 'wiper', GROUND, 'i1', 'i2', 5000, None),
+      Resistor('wiper', 'plus', 'i3', 1000),
+      Resistor('out', 'plus', 'i4', 10000),
+      Resistor(POWER, 'minus', 'i5', 1000),
+      Resistor('minus', GROUND, 'i6', 1000),
+      Op_Amp('plus', 'minus', 'ia', 'out', GROUND, 'ib'), Probe('+', 'out'),
+      Probe('-', GROUND)], GROUND, solve=False).cmax_netlist()
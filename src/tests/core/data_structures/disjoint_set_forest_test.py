@@ -0,0 +1,48 @@
+"""
+Unittests for disjoint_set_forest.py.
+"""
+
+__author__ = 'mikemeko@mit.edu (Michael Mekonnen)'
+
+from core.data_structures.disjoint_set_forest import Array_Disjoint_Set_Forest
+from core.data_structures.disjoint_set_forest import Disjoint_Set_Forest
+from unittest import main
+from unittest import TestCase
+
+class Disjoint_Set_Forest_Test(TestCase):
+  """
+  Tests for core/data_structures/disjoint_set_forest.
+  """
+  def test_disjoint_set_forest(self):
+    forest = Disjoint_Set_Forest()
+    assert forest.find_set('a') is None
+    for x in 'abcd':
+      forest.make_set(x)
+    forest.union('a', 'b')
+    forest.union('c', 'd')
+    assert forest.find_set('a') == forest.find_set('b')
+    assert forest.find_set('a') != forest.find_set('c')
+    forest.union('b', 'd')
+    assert len(set(map(forest.find_set, 'abcd'))) == 1
+  def test_array_disjoint_set_forest(self):
+    forest = Array_Disjoint_Set_Forest(2)
+    assert forest.make_set() == 2
+    assert forest.make_set() == 3
+    assert len(forest) == 4
+    forest.union(0, 3)
+    assert forest.find_set(0) == forest.find_set(3)
+    assert forest.find_set(1) == 1
+    assert forest.find_set(2) == 2
+    forest.union(3, 0)
+    forest.union(1, 2)
+    assert forest.find_set(1) != forest.find_set(0)
+  def test_array_long_chain(self):
+    n = 100000
+    forest = Array_Disjoint_Set_Forest(n)
+    for x in xrange(n - 1):
+      forest.union(x, x + 1)
+    root = forest.find_set(0)
+    assert all(forest.find_set(x) == root for x in xrange(n))
+
+if __name__ == '__main__':
+  main()
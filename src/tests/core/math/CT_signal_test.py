@@ -0,0 +1,46 @@
+"""
+Unittests for CT_signal.py.
+"""
+
+__author__ = 'mikemeko@mit.edu (Michael Mekonnen)'
+
+from core.math.CT_signal import Constant_CT_Signal
+from core.math.CT_signal import Function_CT_Signal
+from math import cos
+from unittest import main
+from unittest import TestCase
+
+class CT_Signal_Test(TestCase):
+  """
+  Tests for core/math/CT_signal.
+  """
+  def _check_samples_array(self, signal):
+    samples = signal.samples_array(0.1, 0.02, 50)
+    assert samples.dtype == float
+    assert samples.tolist() == signal.samples(0.1, 0.02, 50)
+  def test_constant(self):
+    self._check_samples_array(Constant_CT_Signal(0.5))
+  def test_vectorized(self):
+    self._check_samples_array(Function_CT_Signal(lambda t: 0.1 * (t >= 0.5)))
+    self._check_samples_array(Function_CT_Signal(lambda t: t / 2 + 1))
+  def test_fallback(self):
+    self._check_samples_array(Function_CT_Signal(lambda t: cos(10 * t)))
+    self._check_samples_array(Function_CT_Signal(lambda t: 1 if t < 0.5 else
+        0))
+    self._check_samples_array(Function_CT_Signal(lambda t: 3))
+  def test_stateful(self):
+    # functions that ignore their argument are called once per sample, after
+    #     the call with the array of sample times is discarded
+    calls = []
+    def count(t):
+      calls.append(t)
+      return 0.1 * len(calls)
+    samples = Function_CT_Signal(count).samples_array(0, 0.02, 5)
+    assert [round(sample, 6) for sample in samples] == [0.2, 0.3, 0.4, 0.5,
+        0.6]
+  def test_floating_point_errors(self):
+    signal = Function_CT_Signal(lambda t: 1 / t)
+    self.assertRaises(ZeroDivisionError, signal.samples_array, 0, 0.02, 10)
+
+if __name__ == '__main__':
+  main()
@@ -4,6 +4,7 @@ Unittests for equation_solver.py.
 
 __author__ = 'mikemeko@mit.edu (Michael Mekonnen)'
 
+from core.math.equation_solver import Equation_System
 from core.math.equation_solver import solve_equations
 from unittest import main
 from unittest import TestCase
@@ -19,6 +20,10 @@ class Equation_Solver_Test(TestCase):
     for key in dict_1:
       assert key in dict_2
       assert dict_1[key] == dict_2[key]
+  def _assert_dict_almost_equal(self, dict_1, dict_2):
+    self.assertEqual(set(dict_1), set(dict_2))
+    for key in dict_1:
+      self.assertAlmostEqual(dict_1[key], dict_2[key])
   def test_simple_equation(self):
     solution = solve_equations([[(1, 'x')]])
     self._assert_dict_equal(solution, {'x': 0})
@@ -32,6 +37,23 @@ class Equation_Solver_Test(TestCase):
     self._assert_dict_equal(solution, {'x': 3, 'y': 6})
   def test_fail(self):
     self.assertRaises(Exception, solve_equations, [[(1, 'x'), (1, 'y')]])
+  def test_set_equation(self):
+    system = Equation_System([[(5, 'x'), (-2, 'y'), (-3, None)],
+        [(3, 'x'), (4, 'y'), (-33, None)]])
+    self._assert_dict_almost_equal(system.solve(), {'x': 3, 'y': 6})
+    # only the constant changes, the factorization is kept
+    lu = system._lu
+    system.set_equation(1, [(3, 'x'), (4, 'y'), (-7, None)])
+    self._assert_dict_almost_equal(system.solve(), {'x': 1, 'y': 1})
+    assert system._lu is lu
+    # a coefficient changes, the factorization is corrected
+    system.set_equation(1, [(3, 'x'), (-1, 'y'), (-3, None)])
+    self._assert_dict_almost_equal(system.solve(), {'x': 3, 'y': 6})
+    assert system._lu is lu
+    self.assertRaises(Exception, system.set_equation, 0, [(1, 'z')])
+  def test_singular(self):
+    system = Equation_System([[(1, 'x'), (1, 'y')], [(2, 'x'), (2, 'y')]])
+    self.assertRaises(Exception, system.solve)
 
 if __name__ == '__main__':
   main()